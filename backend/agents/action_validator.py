@@ -0,0 +1,262 @@
+"""
+Action validation
+Checks the Executor's actions before they are sent to the extension.
+Deterministic pre-checks (known action type, selector present among the
+page's elements, usable values) settle most actions without a model call;
+only the ambiguous rest go to ReasoningChains, in one batched call or in
+concurrent validate_action calls capped by a limit.
+"""
+
+from typing import TYPE_CHECKING, Any, Dict, List, Optional, Tuple
+from contextlib import nullcontext
+import asyncio
+import re
+import time
+
+from agents.admission import Overloaded, get_admission_controller
+from agents.context_encoder import encode_elements
+from agents.json_parser import ActionVerdictsSchema, parse_json_response
+
+if TYPE_CHECKING:
+    from chains.reasoning_chains import ReasoningChains
+
+
+# Action types the extension's executeAction understands
+KNOWN_ACTION_TYPES = {"click", "type", "scroll", "navigate", "wait", "extract"}
+
+# Read-only or page-level actions that cannot do harm on their own
+_SAFE_TYPES = {"scroll", "extract"}
+
+_TYPEABLE = {"input", "textarea", "select"}
+_ID_SELECTOR = re.compile(r'^#([\w-]+)$')
+_NAME_SELECTOR = re.compile(r'^[a-z]*\[name=["\']?([^"\'\]]+)["\']?\]$')
+_VERDICT = re.compile(r'VERDICT:\s*(VALID|INVALID)', re.IGNORECASE)
+_MAX_WAIT_MS = 30000
+
+MODES = ("precheck", "batch", "concurrent")
+
+
+class ActionValidator:
+    """
+    Validates generated actions against the page
+    
+    mode "precheck" runs only the deterministic checks and keeps ambiguous
+    actions; "batch" sends the ambiguous ones to the model in one call;
+    "concurrent" validates them one per call, at most max_concurrency at a
+    time. Model failures keep the action (validation fails open). Model
+    calls take admission slots like the agents' calls.
+    """
+    
+    def __init__(self, chains: Optional["ReasoningChains"] = None, mode: str = "batch",
+                 max_concurrency: int = 4, element_limit: int = 30):
+        if mode not in MODES:
+            raise ValueError(f"Unknown action validation mode: {mode}")
+        if mode != "precheck" and chains is None:
+            raise ValueError(f"Action validation mode {mode} needs reasoning chains")
+        self.chains = chains
+        self.mode = mode
+        self.max_concurrency = max_concurrency
+        self.element_limit = element_limit
+    
+    def precheck(self, action: Dict[str, Any], page_data: Dict,
+                 elements: Optional[List[Dict[str, Any]]] = None) -> Tuple[Optional[bool], str]:
+        """
+        Deterministic verdict for one action
+        
+        elements are the page elements selectors may refer to (default: the
+        page's interactiveElements).
+        
+        Returns:
+            (valid, reason) - valid is None when the checks cannot decide
+        """
+        action_type = action.get('type')
+        selector = (action.get('selector') or '').strip()
+        value = action.get('value')
+        
+        if action_type not in KNOWN_ACTION_TYPES:
+            return False, f"unknown action type {action_type!r}"
+        if action_type in _SAFE_TYPES:
+            return True, "read-only action"
+        if action_type == "wait":
+            try:
+                waited = float(value or 0)
+            except (TypeError, ValueError):
+                return False, f"wait needs milliseconds, got {value!r}"
+            return (True, "bounded wait") if 0 <= waited <= _MAX_WAIT_MS else (False, "wait out of range")
+        if action_type == "navigate":
+            return self._check_url(str(value or '').strip(), page_data)
+        
+        # click and type act on an element
+        if not selector:
+            return False, f"{action_type} without a selector"
+        if action_type == "type" and (value is None or str(value) == ""):
+            return False, "type without a value"
+        if elements is None:
+            elements = page_data.get('interactiveElements', [])
+        element = _find_element(selector, elements)
+        if element is None:
+            if _ID_SELECTOR.match(selector) or _NAME_SELECTOR.match(selector):
+                return False, f"selector {selector} matches no element on the page"
+            return None, "selector not among the page's elements"
+        if action_type == "type" and element.get('type') not in _TYPEABLE:
+            return False, f"cannot type into a {element.get('type')} element"
+        return True, "selector matches a page element"
+    
+    def validate(self, actions: List[Dict[str, Any]], page_data: Dict, task: str,
+                 elements: Optional[List[Dict[str, Any]]] = None) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """
+        Validate actions, dropping the invalid ones
+        
+        Returns:
+            (kept actions, report for agent_insights)
+        """
+        started = time.perf_counter()
+        verdicts, ambiguous = self._prechecks(actions, page_data, elements)
+        if ambiguous and self.mode == "batch":
+            self._apply_batch(verdicts, ambiguous, self._safe_call(
+                lambda: self.chains.validate_actions([actions[i] for i in ambiguous], self._context(page_data, task))
+            ))
+        elif ambiguous and self.mode == "concurrent":
+            context = self._context(page_data, task)
+            for index in ambiguous:
+                verdicts[index] = _parse_verdict(self._safe_call(
+                    lambda: self.chains.validate_action(actions[index], context)
+                ))
+        return self._finish(actions, verdicts, len(ambiguous), started)
+    
+    async def avalidate(self, actions: List[Dict[str, Any]], page_data: Dict, task: str,
+                        elements: Optional[List[Dict[str, Any]]] = None) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Async variant of validate; concurrent mode runs its calls in parallel"""
+        started = time.perf_counter()
+        verdicts, ambiguous = self._prechecks(actions, page_data, elements)
+        if ambiguous and self.mode == "batch":
+            self._apply_batch(verdicts, ambiguous, await self._asafe_call(
+                lambda: self.chains.avalidate_actions([actions[i] for i in ambiguous], self._context(page_data, task))
+            ))
+        elif ambiguous and self.mode == "concurrent":
+            context = self._context(page_data, task)
+            semaphore = asyncio.Semaphore(self.max_concurrency)
+            
+            async def check(index: int) -> Tuple[Optional[bool], str]:
+                async with semaphore:
+                    return _parse_verdict(await self._asafe_call(
+                        lambda: self.chains.avalidate_action(actions[index], context)
+                    ))
+            
+            for index, verdict in zip(ambiguous, await asyncio.gather(*(check(i) for i in ambiguous))):
+                verdicts[index] = verdict
+        return self._finish(actions, verdicts, len(ambiguous), started)
+    
+    def _prechecks(self, actions: List[Dict[str, Any]], page_data: Dict,
+                   elements: Optional[List[Dict[str, Any]]] = None):
+        """Pre-check verdicts for every action, and the indices left to the model"""
+        verdicts = [self.precheck(action, page_data, elements) for action in actions]
+        ambiguous = [index for index, (valid, _) in enumerate(verdicts) if valid is None]
+        if self.mode == "precheck":
+            ambiguous = []
+        return verdicts, ambiguous
+    
+    def _apply_batch(self, verdicts: List[Tuple[Optional[bool], str]], ambiguous: List[int],
+                     response: Optional[str]):
+        """Fill in the model's verdicts, which index into the ambiguous actions"""
+        data, _ = parse_json_response(response, ActionVerdictsSchema) if response else (None, None)
+        for verdict in (data or {}).get('verdicts', []):
+            if 0 <= verdict['index'] < len(ambiguous):
+                verdicts[ambiguous[verdict['index']]] = (verdict['valid'], verdict['reason'] or "model verdict")
+    
+    def _context(self, page_data: Dict, task: str) -> Dict[str, Any]:
+        return {
+            "task": task,
+            "url": page_data.get('url'),
+            "title": page_data.get('title'),
+            "elements": encode_elements(page_data.get('interactiveElements', [])[:self.element_limit])
+        }
+    
+    def _safe_call(self, call) -> Optional[str]:
+        try:
+            with self._admission_slot():
+                return call()
+        except Overloaded:
+            raise
+        except Exception as e:
+            print(f"[Validator] Model validation failed, keeping actions: {e}")
+            return None
+    
+    async def _asafe_call(self, call) -> Optional[str]:
+        try:
+            async with self._admission_slot(asynchronous=True):
+                return await call()
+        except Overloaded:
+            raise
+        except Exception as e:
+            print(f"[Validator] Model validation failed, keeping actions: {e}")
+            return None
+    
+    def _admission_slot(self, asynchronous: bool = False):
+        """Admission slot for one validation call (a no-op context when admission control is off)"""
+        admission = get_admission_controller()
+        if admission is None:
+            return nullcontext()
+        llm = self.chains.llm
+        model = getattr(llm, 'model_name', None) or getattr(llm, 'model', None) or type(llm).__name__
+        return admission.aslot(model) if asynchronous else admission.slot(model)
+    
+    @staticmethod
+    def _finish(actions: List[Dict[str, Any]], verdicts: List[Tuple[Optional[bool], str]],
+                model_checked: int, started: float) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+        """Keep actions not found invalid (undecided ones included) and summarize"""
+        kept = [action for action, (valid, _) in zip(actions, verdicts) if valid is not False]
+        rejected = [
+            {"index": index, "type": action.get('type'), "selector": action.get('selector'), "reason": reason}
+            for index, (action, (valid, reason)) in enumerate(zip(actions, verdicts)) if valid is False
+        ]
+        report = {
+            "actions_in": len(actions),
+            "actions_kept": len(kept),
+            "model_checked": model_checked,
+            "unverified": sum(1 for valid, _ in verdicts if valid is None),
+            "rejected": rejected,
+            "elapsed_ms": round((time.perf_counter() - started) * 1000, 1)
+        }
+        if rejected:
+            print(f"[Validator] Rejected {len(rejected)} of {len(actions)} actions")
+        return kept, report
+    
+    @staticmethod
+    def _check_url(url: str, page_data: Dict) -> Tuple[Optional[bool], str]:
+        if not url:
+            return False, "navigate without a URL"
+        if re.match(r'^(javascript|data|file):', url, re.IGNORECASE):
+            return False, f"unsafe URL scheme in {url[:40]}"
+        hrefs = {link.get('href') for link in page_data.get('links', []) or [] if isinstance(link, dict)}
+        if url in hrefs:
+            return True, "URL is linked from the page"
+        return None, "URL not linked from the page"
+
+
+def _find_element(selector: str, elements: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """The page element a selector refers to: same selector, or a matching id or name"""
+    id_match = _ID_SELECTOR.match(selector)
+    name_match = _NAME_SELECTOR.match(selector)
+    for element in elements:
+        if not isinstance(element, dict):
+            continue
+        if element.get('selector') == selector:
+            return element
+        attributes = element.get('attributes') or {}
+        if id_match and (attributes.get('id') or element.get('id')) == id_match.group(1):
+            return element
+        if name_match and (attributes.get('name') or element.get('name')) == name_match.group(1):
+            return element
+    return None
+
+
+def _parse_verdict(response: Optional[str]) -> Tuple[Optional[bool], str]:
+    """Verdict from a validate_action response; None when there is none"""
+    if not response:
+        return None, "model validation unavailable"
+    matches = _VERDICT.findall(response)
+    if not matches:
+        return None, "model gave no verdict"
+    valid = matches[-1].upper() == "VALID"
+    return valid, "model verdict" if valid else response.strip().splitlines()[0][:200]
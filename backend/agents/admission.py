@@ -0,0 +1,287 @@
+"""
+Admission control for calls to the model server
+Caps concurrent LLM calls globally and per model, queues the overflow in a
+bounded FIFO and sheds calls that cannot start before their deadline, so
+load beyond what the server can serve fails fast instead of slowing every
+request down together
+"""
+
+from typing import Any, Deque, Dict, Iterator, Optional
+from collections import deque
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+import asyncio
+import math
+import threading
+import time
+
+from agents.metrics import ADMISSION_WAIT_SECONDS, ADMISSION_SHED
+from config import Config
+
+
+# Monotonic time by which the current request must have all its LLM calls admitted
+_request_deadline: ContextVar[Optional[float]] = ContextVar("admission_deadline", default=None)
+
+
+class Overloaded(Exception):
+    """
+    An LLM call was shed instead of queued
+    
+    reason is "queue_full" (status 429: the client should back off) or
+    "deadline" (status 503: the call could not start in time). retry_after
+    is the suggested wait in whole seconds.
+    """
+    
+    def __init__(self, reason: str, retry_after: int):
+        self.reason = reason
+        self.retry_after = retry_after
+        self.status_code = 429 if reason == "queue_full" else 503
+        super().__init__(f"Model server overloaded ({reason}), retry after {retry_after}s")
+
+
+@contextmanager
+def request_deadline(seconds: Optional[float]) -> Iterator[None]:
+    """Give every LLM call made inside the block (and tasks started from it) a shared deadline"""
+    if not seconds:
+        yield
+        return
+    token = _request_deadline.set(time.monotonic() + seconds)
+    try:
+        yield
+    finally:
+        _request_deadline.reset(token)
+
+
+class _Waiter:
+    """A queued call, woken through its event loop (async) or an Event (threads)"""
+    
+    __slots__ = ("model", "timeout", "loop", "future", "event", "granted")
+    
+    def __init__(self, model: str, timeout: float, loop: Optional[asyncio.AbstractEventLoop]):
+        self.model = model
+        self.timeout = timeout
+        self.loop = loop
+        self.future = loop.create_future() if loop is not None else None
+        self.event = threading.Event() if loop is None else None
+        self.granted = False
+    
+    def wake(self):
+        self.granted = True
+        if self.loop is None:
+            self.event.set()
+        else:
+            self.loop.call_soon_threadsafe(_resolve, self.future)
+
+
+def _resolve(future: asyncio.Future):
+    if not future.done():
+        future.set_result(None)
+
+
+class AdmissionController:
+    """
+    Concurrency limits with a bounded, deadline-aware queue
+    
+    A call starts at once when fewer than the global limit of calls are in
+    flight and fewer than its model's limit; otherwise it waits in FIFO
+    order. It is shed when the queue is full, when the expected wait (queue
+    position x average call time / limit) already exceeds its deadline, or
+    when the deadline passes while it waits.
+    
+    With adaptive=True the global limit follows observed call latency
+    (AIMD): +1/limit per call under target_latency, x0.9 per call over it,
+    kept between min_concurrency and max_concurrency.
+    """
+    
+    def __init__(self, max_concurrency: int = 8, max_per_model: int = 4,
+                 model_limits: Optional[Dict[str, int]] = None, max_queue: int = 64,
+                 queue_timeout: float = 30.0, adaptive: bool = False,
+                 target_latency: float = 10.0, min_concurrency: int = 1):
+        self.max_concurrency = max_concurrency
+        self.max_per_model = max_per_model
+        self.model_limits = dict(model_limits or {})
+        self.max_queue = max_queue
+        self.queue_timeout = queue_timeout
+        self.adaptive = adaptive
+        self.target_latency = target_latency
+        self.min_concurrency = min_concurrency
+        self.limit = float(max_concurrency)
+        self._active = 0
+        self._active_by_model: Dict[str, int] = {}
+        self._queue: Deque[_Waiter] = deque()
+        self._service_time: Optional[float] = None  # moving average of call seconds
+        self._lock = threading.Lock()
+        self._stats = {"admitted": 0, "queued": 0, "shed_queue_full": 0, "shed_deadline": 0}
+    
+    @asynccontextmanager
+    async def aslot(self, model: str):
+        """Hold a slot for one async call to model"""
+        started = await self.acquire(model)
+        try:
+            yield
+        finally:
+            self.release(model, started)
+    
+    @contextmanager
+    def slot(self, model: str) -> Iterator[None]:
+        """Hold a slot for one blocking call to model (from a worker thread)"""
+        started = self.acquire_sync(model)
+        try:
+            yield
+        finally:
+            self.release(model, started)
+    
+    async def acquire(self, model: str) -> float:
+        """Wait for a slot; returns the perf_counter time it was granted"""
+        queued_at = time.perf_counter()
+        waiter = self._admit_or_enqueue(model, asyncio.get_running_loop())
+        if waiter is not None:
+            try:
+                await asyncio.wait_for(asyncio.shield(waiter.future), waiter.timeout)
+            except asyncio.TimeoutError:
+                if self._abandon(waiter):
+                    raise self._shed("deadline")
+            except asyncio.CancelledError:
+                # Granted just as the caller went away: hand the slot back
+                if not self._abandon(waiter):
+                    self.release(model)
+                raise
+        ADMISSION_WAIT_SECONDS.observe(time.perf_counter() - queued_at, model=model)
+        return time.perf_counter()
+    
+    def acquire_sync(self, model: str) -> float:
+        """Blocking variant of acquire"""
+        queued_at = time.perf_counter()
+        waiter = self._admit_or_enqueue(model, None)
+        if waiter is not None and not waiter.event.wait(waiter.timeout):
+            if self._abandon(waiter):
+                raise self._shed("deadline")
+        ADMISSION_WAIT_SECONDS.observe(time.perf_counter() - queued_at, model=model)
+        return time.perf_counter()
+    
+    def release(self, model: str, started: Optional[float] = None):
+        """Free a slot; started (from acquire) feeds the latency average and adaptive limit"""
+        with self._lock:
+            self._active -= 1
+            remaining = self._active_by_model.get(model, 1) - 1
+            if remaining > 0:
+                self._active_by_model[model] = remaining
+            else:
+                self._active_by_model.pop(model, None)
+            if started is not None:
+                self._observe(time.perf_counter() - started)
+            self._dispatch()
+    
+    def retry_after(self) -> int:
+        """Seconds a shed client should wait: the time to drain the current queue, at least 1"""
+        wait = self._expected_wait(len(self._queue) + 1)
+        return max(1, math.ceil(wait)) if wait is not None else 1
+    
+    def stats(self) -> Dict[str, Any]:
+        """Limits, occupancy and shedding counters"""
+        with self._lock:
+            return {
+                "limit": round(self.limit, 2),
+                "max_concurrency": self.max_concurrency,
+                "max_per_model": self.max_per_model,
+                "active": self._active,
+                "active_by_model": dict(self._active_by_model),
+                "queued_now": len(self._queue),
+                "max_queue": self.max_queue,
+                "avg_call_ms": round(self._service_time * 1000, 1) if self._service_time is not None else None,
+                "adaptive": self.adaptive,
+                **self._stats
+            }
+    
+    def _admit_or_enqueue(self, model: str, loop: Optional[asyncio.AbstractEventLoop]) -> Optional[_Waiter]:
+        """Take a slot now (returns None) or join the queue (returns the waiter); raises Overloaded"""
+        now = time.monotonic()
+        deadline = now + self.queue_timeout
+        request_deadline_at = _request_deadline.get()
+        if request_deadline_at is not None:
+            deadline = min(deadline, request_deadline_at)
+        
+        with self._lock:
+            # Queued calls that fit were granted on the last release, so a fit here jumps nobody
+            if self._fits(model):
+                self._grant(model)
+                return None
+            if len(self._queue) >= self.max_queue:
+                raise self._shed("queue_full")
+            remaining = deadline - now
+            expected = self._expected_wait(len(self._queue) + 1)
+            if remaining <= 0 or (expected is not None and expected > remaining):
+                raise self._shed("deadline")
+            waiter = _Waiter(model, remaining, loop)
+            self._queue.append(waiter)
+            self._stats["queued"] += 1
+            return waiter
+    
+    def _abandon(self, waiter: _Waiter) -> bool:
+        """Drop a waiter that gave up; False when it was granted a slot in the meantime"""
+        with self._lock:
+            if waiter.granted:
+                return False
+            self._queue.remove(waiter)
+            return True
+    
+    def _fits(self, model: str) -> bool:
+        model_limit = self.model_limits.get(model, self.max_per_model)
+        return (self._active < max(1, int(self.limit))
+                and (not model_limit or self._active_by_model.get(model, 0) < model_limit))
+    
+    def _grant(self, model: str):
+        self._active += 1
+        self._active_by_model[model] = self._active_by_model.get(model, 0) + 1
+        self._stats["admitted"] += 1
+    
+    def _dispatch(self):
+        """Grant queued calls that fit now, oldest first (called under the lock)"""
+        for waiter in list(self._queue):
+            if self._fits(waiter.model):
+                self._queue.remove(waiter)
+                self._grant(waiter.model)
+                waiter.wake()
+    
+    def _observe(self, seconds: float):
+        self._service_time = seconds if self._service_time is None else 0.8 * self._service_time + 0.2 * seconds
+        if not self.adaptive:
+            return
+        if seconds > self.target_latency:
+            self.limit = max(float(self.min_concurrency), self.limit * 0.9)
+        else:
+            self.limit = min(float(self.max_concurrency), self.limit + 1 / self.limit)
+    
+    def _expected_wait(self, position: int) -> Optional[float]:
+        if self._service_time is None:
+            return None
+        return position * self._service_time / max(1, int(self.limit))
+    
+    def _shed(self, reason: str) -> Overloaded:
+        self._stats[f"shed_{reason}"] += 1
+        ADMISSION_SHED.inc(reason=reason)
+        return Overloaded(reason, self.retry_after())
+
+
+_controller: Optional[AdmissionController] = None
+_controller_lock = threading.Lock()
+
+
+def get_admission_controller() -> Optional[AdmissionController]:
+    """Process-wide controller configured from Config (None when admission control is off)"""
+    global _controller
+    if not Config.ADMISSION_ENABLED:
+        return None
+    with _controller_lock:
+        if _controller is None:
+            _controller = AdmissionController(
+                max_concurrency=Config.ADMISSION_MAX_CONCURRENCY,
+                max_per_model=Config.ADMISSION_MAX_PER_MODEL,
+                model_limits=Config.ADMISSION_MODEL_LIMITS,
+                max_queue=Config.ADMISSION_MAX_QUEUE,
+                queue_timeout=Config.ADMISSION_QUEUE_TIMEOUT,
+                adaptive=Config.ADMISSION_ADAPTIVE,
+                target_latency=Config.ADMISSION_TARGET_LATENCY,
+                min_concurrency=Config.ADMISSION_MIN_CONCURRENCY
+            )
+        return _controller
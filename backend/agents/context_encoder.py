@@ -0,0 +1,190 @@
+"""
+Compact page-context encoder for agent prompts
+Replaces the indented JSON dump of the whole page with a deduplicated,
+per-agent, token-budgeted text block
+"""
+
+from typing import List, Dict, Any, Optional, Iterable
+import json
+import re
+
+
+# Fields each agent receives as context. URL and title are left out: they
+# head the page block of the prompt (see agents/prompts.py).
+AGENT_CONTEXT_FIELDS: Dict[str, tuple] = {
+    "Planner": ("pageType", "text", "interactiveElements", "forms", "conversation_summary", "chat_history"),
+    "Analyzer": ("interactiveElements", "text", "forms", "links"),
+    "Executor": (),
+    "Summarizer": (),
+    "Navigator": ("pageType", "text", "interactiveElements", "forms", "links", "conversation_summary", "chat_history"),
+}
+
+# Order in which sections are shrunk when the encoded context is over budget
+_TRIM_ORDER = ("links", "text", "interactiveElements", "forms", "conversation_summary", "chat_history")
+
+# Element attributes worth keeping; layout data such as position is dropped
+_ELEMENT_ATTRIBUTES = ("id", "name", "type", "placeholder", "href", "value")
+
+_encoding = None
+
+
+def count_tokens(text: str) -> int:
+    """Count tokens with tiktoken when available, otherwise estimate at ~4 characters per token"""
+    global _encoding
+    if _encoding is None:
+        try:
+            import tiktoken
+            _encoding = tiktoken.get_encoding("cl100k_base")
+        except Exception:
+            _encoding = False
+    if _encoding:
+        return len(_encoding.encode(text))
+    return (len(text) + 3) // 4
+
+
+def _clean(text: Any, limit: Optional[int] = None) -> str:
+    """Collapse whitespace and optionally truncate"""
+    text = re.sub(r'\s+', ' ', str(text or '')).strip()
+    if limit and len(text) > limit:
+        text = text[:limit].rstrip() + "…"
+    return text
+
+
+def encode_element(element: Dict[str, Any]) -> str:
+    """One-line element description without empty attributes or layout data"""
+    parts = [element.get('type') or 'element']
+    text = _clean(element.get('text'), 80)
+    if text:
+        parts.append(json.dumps(text, ensure_ascii=False))
+    if element.get('selector'):
+        parts.append(f"sel={element['selector']}")
+    
+    attributes = dict(element.get('attributes') or {})
+    for key in _ELEMENT_ATTRIBUTES:
+        # Some callers put attributes at the top level of the element
+        value = attributes.get(key) or element.get(key)
+        if value and key != 'type':
+            parts.append(f"{key}={_clean(value, 80)}")
+        elif value and key == 'type' and value != element.get('type'):
+            parts.append(f"input_type={value}")
+    return " ".join(parts)
+
+
+def encode_elements(elements: Iterable[Dict[str, Any]]) -> List[str]:
+    """Encode elements, dropping duplicates with the same description"""
+    lines: List[str] = []
+    seen = set()
+    for element in elements:
+        if not isinstance(element, dict):
+            continue
+        line = encode_element(element)
+        if line not in seen:
+            seen.add(line)
+            lines.append(line)
+    return lines
+
+
+def _encode_form(form: Dict[str, Any]) -> str:
+    fields = [f.get('name') or f.get('id') or f.get('type') for f in form.get('fields', []) if isinstance(f, dict)]
+    parts = [f"form {form.get('method', 'get')}"]
+    if form.get('action'):
+        parts.append(f"action={form['action']}")
+    if form.get('selector'):
+        parts.append(f"sel={form['selector']}")
+    if fields:
+        parts.append("fields=" + ",".join(name for name in fields if name))
+    return " ".join(parts)
+
+
+def _encode_link(link: Dict[str, Any]) -> str:
+    return f"{json.dumps(_clean(link.get('text'), 60), ensure_ascii=False)} -> {link.get('href', '')}"
+
+
+def _encode_message(message: Dict[str, Any]) -> str:
+    return f"{message.get('role', 'user')}: {_clean(message.get('content'), 300)}"
+
+
+class ContextEncoder:
+    """
+    Encodes agent context as a compact, deduplicated text block
+    
+    Only whitelisted fields are kept, empty attributes and layout data are
+    dropped, and sections are shrunk in a fixed order until the block fits
+    the token budget.
+    """
+    
+    def __init__(self, fields: Optional[Iterable[str]] = None, token_budget: int = 1200):
+        self.fields = tuple(fields) if fields is not None else None
+        self.token_budget = token_budget
+    
+    @classmethod
+    def for_agent(cls, agent_name: str, token_budget: int = 1200) -> "ContextEncoder":
+        """Encoder with the whitelist for a given agent"""
+        return cls(fields=AGENT_CONTEXT_FIELDS.get(agent_name), token_budget=token_budget)
+    
+    def encode(self, context: Dict[str, Any]) -> str:
+        """Encode the context, shrinking sections until it fits the token budget"""
+        sections = self._sections(context)
+        encoded = self._render(sections)
+        
+        for name in _TRIM_ORDER:
+            while count_tokens(encoded) > self.token_budget and self._shrink(sections, name):
+                encoded = self._render(sections)
+        
+        return encoded
+    
+    def _sections(self, context: Dict[str, Any]) -> Dict[str, Any]:
+        """Select whitelisted fields and convert each to its compact form"""
+        sections: Dict[str, Any] = {}
+        for key, value in context.items():
+            if self.fields is not None and key not in self.fields:
+                continue
+            if value in (None, '', [], {}):
+                continue
+            if key == 'text':
+                sections[key] = _clean(value)
+            elif key == 'interactiveElements':
+                sections[key] = encode_elements(value)
+            elif key == 'forms':
+                sections[key] = list(dict.fromkeys(_encode_form(f) for f in value if isinstance(f, dict)))
+            elif key == 'links':
+                sections[key] = list(dict.fromkeys(_encode_link(l) for l in value if isinstance(l, dict)))
+            elif key == 'chat_history':
+                sections[key] = [_encode_message(m) for m in value if isinstance(m, dict)]
+            elif key in ('images', 'viewport'):
+                continue
+            elif isinstance(value, (dict, list)):
+                sections[key] = json.dumps(value, separators=(',', ':'), default=str)
+            else:
+                sections[key] = _clean(value)
+        return sections
+    
+    @staticmethod
+    def _shrink(sections: Dict[str, Any], name: str) -> bool:
+        """Shrink one section; returns False when it cannot shrink further"""
+        value = sections.get(name)
+        if not value:
+            return False
+        if isinstance(value, str):
+            if len(value) <= 200:
+                return False
+            sections[name] = value[:len(value) * 3 // 4].rstrip() + "…"
+        else:
+            # Drop the oldest chat turns, but the least relevant (last) elements/links
+            if name == 'chat_history':
+                sections[name] = value[1:]
+            else:
+                sections[name] = value[:-max(1, len(value) // 4)]
+        return True
+    
+    @staticmethod
+    def _render(sections: Dict[str, Any]) -> str:
+        lines: List[str] = []
+        for key, value in sections.items():
+            if isinstance(value, list):
+                if value:
+                    lines.append(f"{key}:")
+                    lines.extend(f"- {item}" for item in value)
+            else:
+                lines.append(f"{key}: {value}")
+        return "\n".join(lines)
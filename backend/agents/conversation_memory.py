@@ -0,0 +1,244 @@
+"""
+Rolling conversation memory
+Keeps the latest turns verbatim and folds older ones into a running summary,
+so the conversation context sent to the Planner stays within a token budget
+however long the session runs
+"""
+
+from typing import Any, Awaitable, Callable, Dict, Iterable, List, Optional
+import asyncio
+import re
+import time
+
+from agents.context_encoder import count_tokens
+from agents.metrics import record_llm_call, LLM_ERRORS
+
+
+# Longest message kept in memory; anything longer is cut on the way in
+MAX_MESSAGE_CHARS = 1000
+
+# Pending turns kept before they are folded in without waiting for the LLM
+MAX_PENDING_MESSAGES = 20
+
+SUMMARY_PROMPT = """Update the running summary of a conversation between a user and a web browsing assistant.
+Keep the user's goals, pages and items mentioned, and answers given. Drop pleasantries.
+Write at most {max_words} words of plain text.
+
+Current summary:
+{summary}
+
+New turns:
+{turns}
+
+Updated summary:"""
+
+
+def _clean(text: Any, limit: int) -> str:
+    text = re.sub(r'\s+', ' ', str(text or '')).strip()
+    return text[:limit].rstrip() + "…" if len(text) > limit else text
+
+
+def _tail_tokens(text: str, max_tokens: int) -> str:
+    """Keep the end of text (the most recent part of a summary) within max_tokens"""
+    while text and count_tokens(text) > max_tokens:
+        cut = text.find(' ', max(1, len(text) // 5))
+        text = "…" + text[cut + 1:] if cut != -1 else ""
+    return text
+
+
+class ConversationMemory:
+    """
+    Recent turns verbatim plus an incrementally updated summary
+    
+    Messages beyond recent_messages move to a pending list. compact() folds
+    pending messages into the summary with a cheap extractive digest;
+    acompact() asks the LLM for an updated summary instead, and
+    schedule_compaction() runs it as a background task so the request that
+    produced the turn never waits for it; on_compacted, when set, is awaited
+    once it has updated the summary. window() returns the summary and
+    recent messages trimmed to token_budget.
+    """
+    
+    def __init__(self, llm: Any = None, recent_messages: int = 6, token_budget: int = 600,
+                 summary_tokens: int = 250):
+        self.llm = llm
+        self.recent_messages = recent_messages
+        self.token_budget = token_budget
+        self.summary_tokens = summary_tokens
+        self.summary = ""
+        self.recent: List[Dict[str, str]] = []
+        self._pending: List[Dict[str, str]] = []
+        self._in_flight: List[Dict[str, str]] = []  # pending messages being summarized right now
+        self._compaction: Optional[asyncio.Task] = None
+        self.on_compacted: Optional[Callable[[], Awaitable[None]]] = None
+        self._stats = {"messages": 0, "compactions": 0, "llm_compactions": 0, "llm_errors": 0}
+    
+    def add_turn(self, task: str, result: str):
+        """Record a user task and the agent's answer"""
+        self._append("user", task)
+        self._append("agent", result)
+    
+    def seed(self, messages: Iterable[Dict[str, Any]]):
+        """Start an empty memory from client-side chat history (e.g. after a server restart)"""
+        if self.recent or self.summary or self._pending:
+            return
+        for message in messages:
+            if isinstance(message, dict) and message.get('content'):
+                self._append(message.get('role', 'user'), message['content'])
+    
+    def window(self) -> Dict[str, Any]:
+        """
+        Conversation context for the Planner within token_budget
+        
+        Returns:
+            Dict with conversation_summary and chat_history, each only when non-empty
+        """
+        summary = self._summary_with_pending()
+        recent = list(self.recent)
+        
+        def size() -> int:
+            return count_tokens(summary) + sum(count_tokens(m['content']) + 2 for m in recent)
+        
+        # Over budget: shorten the summary first, then drop the oldest verbatim turns
+        if size() > self.token_budget:
+            summary = _tail_tokens(summary, min(self.summary_tokens, self.token_budget // 3))
+        while len(recent) > 1 and size() > self.token_budget:
+            recent.pop(0)
+        if recent and size() > self.token_budget:
+            recent[0] = {**recent[0], 'content': _tail_tokens(recent[0]['content'], self.token_budget // 2)}
+        
+        window: Dict[str, Any] = {}
+        if summary:
+            window['conversation_summary'] = summary
+        if recent:
+            window['chat_history'] = recent
+        return window
+    
+    def compact(self):
+        """Fold pending messages into the summary with an extractive digest"""
+        if not self._pending:
+            return
+        pending, self._pending = self._pending, []
+        self.summary = _tail_tokens("\n".join(filter(None, [self.summary, self._digest(pending)])), self.summary_tokens)
+        self._stats["compactions"] += 1
+    
+    async def acompact(self):
+        """Fold pending messages into the summary with the LLM, falling back to compact()"""
+        if not self._pending:
+            return
+        if self.llm is None:
+            self.compact()
+            return
+        
+        pending, self._pending = self._pending, []
+        self._in_flight = pending
+        prompt = SUMMARY_PROMPT.format(
+            max_words=self.summary_tokens * 3 // 4,
+            summary=self.summary or "(none yet)",
+            turns="\n".join(f"{m['role']}: {_clean(m['content'], 400)}" for m in pending)
+        )
+        started = time.perf_counter()
+        try:
+            response = await self.llm.ainvoke(prompt)
+        except Exception as e:
+            print(f"[Memory] Summary update failed, using extractive digest: {e}")
+            LLM_ERRORS.inc(stage="memory")
+            self._stats["llm_errors"] += 1
+            self._pending = pending + self._pending
+            self.compact()
+            await self._notify_compacted()
+            return
+        except asyncio.CancelledError:
+            # Keep the turns for the next compaction
+            self._pending = pending + self._pending
+            raise
+        finally:
+            self._in_flight = []
+        
+        content = getattr(response, 'content', str(response))
+        record_llm_call("memory", time.perf_counter() - started, count_tokens(prompt), count_tokens(content))
+        self.summary = _tail_tokens(_clean(content, 4000), self.summary_tokens)
+        self._stats["compactions"] += 1
+        self._stats["llm_compactions"] += 1
+        await self._notify_compacted()
+    
+    def schedule_compaction(self):
+        """
+        Update the summary without holding up the caller: as a background task
+        inside an event loop, inline (extractive, no LLM call) otherwise
+        """
+        if not self._pending:
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            self.compact()
+            return
+        if self._compaction is None or self._compaction.done():
+            self._compaction = loop.create_task(self.acompact())
+    
+    def clear(self):
+        """Forget everything"""
+        if self._compaction is not None and not self._compaction.done():
+            self._compaction.cancel()
+        self.summary = ""
+        self.recent = []
+        self._pending = []
+        self._in_flight = []
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """JSON-compatible state; turns still being summarized are saved as pending"""
+        return {
+            "summary": self.summary,
+            "recent": list(self.recent),
+            "pending": self._in_flight + self._pending
+        }
+    
+    def load_dict(self, state: Dict[str, Any]):
+        """Restore state produced by to_dict()"""
+        self.summary = state.get("summary", "")
+        self.recent = list(state.get("recent") or [])
+        self._pending = list(state.get("pending") or [])
+        self._in_flight = []
+    
+    def stats(self) -> Dict[str, Any]:
+        """Sizes and compaction counters"""
+        return {
+            "recent_messages": len(self.recent),
+            "pending_messages": len(self._pending),
+            "summary_tokens": count_tokens(self.summary) if self.summary else 0,
+            **self._stats
+        }
+    
+    async def _notify_compacted(self):
+        if self.on_compacted is None:
+            return
+        try:
+            await self.on_compacted()
+        except Exception as e:
+            print(f"[Memory] Compaction callback failed: {e}")
+    
+    def _append(self, role: str, content: Any):
+        self.recent.append({'role': role, 'content': _clean(content, MAX_MESSAGE_CHARS)})
+        self._stats["messages"] += 1
+        while len(self.recent) > self.recent_messages:
+            self._pending.append(self.recent.pop(0))
+        # Bound RAM if summaries fall behind (slow or failing LLM)
+        if len(self._pending) > MAX_PENDING_MESSAGES:
+            self.compact()
+    
+    def _summary_with_pending(self) -> str:
+        """Summary plus a digest of turns not folded in yet"""
+        unsummarized = self._in_flight + self._pending
+        if not unsummarized:
+            return self.summary
+        return "\n".join(filter(None, [self.summary, self._digest(unsummarized)]))
+    
+    @staticmethod
+    def _digest(messages: List[Dict[str, str]]) -> str:
+        """One short line per message: its first sentence, capped"""
+        lines = []
+        for message in messages:
+            first = re.split(r'(?<=[.!?])\s', message['content'], maxsplit=1)[0]
+            lines.append(f"{message['role']}: {_clean(first, 160)}")
+        return "\n".join(lines)
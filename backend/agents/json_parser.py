@@ -0,0 +1,205 @@
+"""
+Robust JSON extraction and validation for agent responses
+Handles code fences, stray braces and truncated output, and validates the
+result against a per-agent Pydantic schema
+"""
+
+from typing import Any, Dict, Iterator, List, Optional, Tuple, Type
+import json
+import re
+
+from pydantic import BaseModel, ConfigDict, Field, ValidationError, field_validator
+
+
+# ============ Agent Schemas ============
+
+class PlanSchema(BaseModel):
+    """Planner output"""
+    model_config = ConfigDict(extra="allow")
+    
+    understanding: str = ""
+    approach: str = ""
+    steps: List[str] = Field(..., min_length=1)
+    risks: List[str] = []
+    
+    @field_validator("steps", "risks", mode="before")
+    @classmethod
+    def _stringify_items(cls, value: Any) -> Any:
+        # Small models sometimes return steps as objects or a single string
+        if isinstance(value, str):
+            return [value]
+        if isinstance(value, list):
+            return [item if isinstance(item, str) else json.dumps(item) for item in value]
+        return value
+
+
+class ElementMappingSchema(BaseModel):
+    """One Analyzer step → element mapping"""
+    model_config = ConfigDict(extra="allow")
+    
+    step: str = ""
+    element: Any = None
+    action: str = ""
+    value: Any = ""
+    selector: str = ""
+
+
+class AnalysisSchema(BaseModel):
+    """Analyzer output"""
+    model_config = ConfigDict(extra="allow")
+    
+    analysis: str = ""
+    element_mapping: List[ElementMappingSchema] = []
+
+
+class ActionSchema(BaseModel):
+    """One Executor action"""
+    model_config = ConfigDict(extra="allow")
+    
+    type: str
+    selector: Optional[str] = ""
+    value: Any = ""
+    description: str = ""
+
+
+class ActionsSchema(BaseModel):
+    """Executor output"""
+    model_config = ConfigDict(extra="allow")
+    
+    actions: List[ActionSchema] = []
+    result: str = Field(..., min_length=1)
+
+
+class ActionVerdictSchema(BaseModel):
+    """One action validation verdict"""
+    model_config = ConfigDict(extra="allow")
+    
+    index: int
+    valid: bool = True
+    reason: str = ""
+
+
+class ActionVerdictsSchema(BaseModel):
+    """Batched action validation output"""
+    model_config = ConfigDict(extra="allow")
+    
+    verdicts: List[ActionVerdictSchema] = []
+
+
+class FusedSchema(PlanSchema):
+    """Fused pipeline output: the Planner, Analyzer and Executor fields in one object"""
+    
+    analysis: str = ""
+    element_mapping: List[ElementMappingSchema] = []
+    actions: List[ActionSchema] = []
+    result: str = Field(..., min_length=1)
+
+
+# ============ Extraction ============
+
+_FENCE = re.compile(r'```(?:json|JSON)?\s*\n?(.*?)(?:```|$)', re.DOTALL)
+
+
+def _balanced_objects(text: str) -> List[str]:
+    """
+    Top-level {...} spans found by scanning braces outside of strings
+    
+    An object left open at the end of the text (a truncated response) is
+    returned closed off, so it still has a chance to parse.
+    """
+    objects: List[str] = []
+    depth = 0
+    start = -1
+    in_string = False
+    escaped = False
+    stack: List[str] = []
+    
+    for i, char in enumerate(text):
+        if in_string:
+            if escaped:
+                escaped = False
+            elif char == '\\':
+                escaped = True
+            elif char == '"':
+                in_string = False
+            continue
+        if char == '"' and depth:
+            in_string = True
+        elif char in '{[':
+            if depth == 0 and char == '{':
+                start = i
+                stack = []
+            if depth or char == '{':
+                depth += 1
+                stack.append('}' if char == '{' else ']')
+        elif char in '}]' and depth:
+            depth -= 1
+            stack.pop()
+            if depth == 0:
+                objects.append(text[start:i + 1])
+    
+    if depth and start != -1:
+        # Truncated: drop a dangling partial token, then close what is open
+        tail = text[start:]
+        if in_string:
+            tail += '"'
+        tail = re.sub(r',\s*("[^"]*"\s*:?\s*)?$', '', tail)
+        objects.append(tail + ''.join(reversed(stack)))
+    return objects
+
+
+def _loads(candidate: str) -> Optional[Any]:
+    try:
+        return json.loads(candidate)
+    except ValueError:
+        pass
+    # Common small-model slip: trailing commas
+    try:
+        return json.loads(re.sub(r',\s*([}\]])', r'\1', candidate))
+    except ValueError:
+        return None
+
+
+def iter_json_objects(text: str) -> Iterator[Dict[str, Any]]:
+    """Yield every JSON object in text, those inside code fences first"""
+    sources = [match.group(1) for match in _FENCE.finditer(text)] + [text]
+    for source in sources:
+        for candidate in _balanced_objects(source):
+            value = _loads(candidate)
+            if isinstance(value, dict):
+                yield value
+
+
+def extract_json(text: str) -> Optional[Dict[str, Any]]:
+    """Return the first JSON object in text, or None"""
+    return next(iter_json_objects(text), None)
+
+
+def parse_json_response(text: str, schema: Type[BaseModel]) -> Tuple[Optional[Dict[str, Any]], Optional[str]]:
+    """
+    Extract and validate a JSON object
+    
+    Returns:
+        (data, error) - data is the validated dict or None, error explains why
+    """
+    error = "response did not contain a JSON object"
+    for index, data in enumerate(iter_json_objects(text)):
+        try:
+            return schema.model_validate(data).model_dump(), None
+        except ValidationError as e:
+            if index == 0:
+                problems = "; ".join(f"{'.'.join(str(p) for p in err['loc'])}: {err['msg']}" for err in e.errors()[:5])
+                error = f"JSON did not match the expected format ({problems})"
+    return None, error
+
+
+def repair_prompt(response: str, error: str, schema: Type[BaseModel]) -> str:
+    """Short prompt asking the model to fix its previous output"""
+    return f"""Your previous response could not be used: {error}.
+
+Previous response:
+{response[:2000]}
+
+Return ONLY a corrected JSON object matching this JSON schema, with no other text:
+{json.dumps(schema.model_json_schema(), separators=(',', ':'))}
+"""
@@ -0,0 +1,118 @@
+"""
+Shared LLM client registry
+One ChatOpenAI per (base_url, model, api_key, temperature, max_tokens), all
+backed by pooled keep-alive HTTP clients per base URL
+"""
+
+from typing import TYPE_CHECKING, Dict, Any, Optional, Tuple
+import threading
+
+import httpx
+
+from config import Config
+
+if TYPE_CHECKING:
+    from langchain_openai import ChatOpenAI
+
+
+class LLMClientRegistry:
+    """
+    Thread-safe registry of shared LLM clients
+    
+    Sessions asking for the same model on the same server get the same
+    client, so they skip client construction and reuse pooled connections.
+    Each base URL gets one sync and one async httpx client whose limits
+    bound the number of sockets open to the model server.
+    """
+    
+    def __init__(self, max_connections: int = 20, max_keepalive_connections: int = 10,
+                 keepalive_expiry: float = 30.0, timeout: float = 120.0):
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+            keepalive_expiry=keepalive_expiry
+        )
+        self.timeout = httpx.Timeout(timeout, connect=10.0)
+        self._clients: Dict[Tuple, "ChatOpenAI"] = {}
+        self._http_clients: Dict[Optional[str], Tuple[httpx.Client, httpx.AsyncClient]] = {}
+        self._lock = threading.Lock()
+        self._hits = 0
+        self._misses = 0
+    
+    def get(self, api_key: str, model: str, base_url: Optional[str] = None,
+            temperature: float = 0.7, max_tokens: Optional[int] = None) -> "ChatOpenAI":
+        """Return the shared client for these settings, creating it on first use"""
+        key = (base_url or None, model, api_key, temperature, max_tokens)
+        with self._lock:
+            client = self._clients.get(key)
+            if client is not None:
+                self._hits += 1
+                return client
+            
+            self._misses += 1
+            http_client, http_async_client = self._get_http_clients(base_url or None)
+            llm_kwargs: Dict[str, Any] = {
+                "api_key": api_key,
+                "model": model,
+                "temperature": temperature,
+                "http_client": http_client,
+                "http_async_client": http_async_client
+            }
+            if max_tokens is not None:
+                llm_kwargs["max_tokens"] = max_tokens
+            if base_url:
+                llm_kwargs["base_url"] = base_url
+            
+            # Imported on the first client so startup does not pay for LangChain
+            from langchain_openai import ChatOpenAI
+            client = ChatOpenAI(**llm_kwargs)
+            self._clients[key] = client
+            return client
+    
+    def _get_http_clients(self, base_url: Optional[str]) -> Tuple[httpx.Client, httpx.AsyncClient]:
+        """Pooled HTTP clients shared by every model on one server (called under the lock)"""
+        if base_url not in self._http_clients:
+            self._http_clients[base_url] = (
+                httpx.Client(limits=self.limits, timeout=self.timeout),
+                httpx.AsyncClient(limits=self.limits, timeout=self.timeout)
+            )
+        return self._http_clients[base_url]
+    
+    def stats(self) -> Dict[str, Any]:
+        """Client counts and reuse metrics"""
+        with self._lock:
+            return {
+                "clients": len(self._clients),
+                "connection_pools": len(self._http_clients),
+                "max_connections_per_pool": self.limits.max_connections,
+                "hits": self._hits,
+                "misses": self._misses
+            }
+    
+    async def aclose(self):
+        """Close all pooled connections"""
+        with self._lock:
+            http_clients = list(self._http_clients.values())
+            self._http_clients.clear()
+            self._clients.clear()
+        for http_client, http_async_client in http_clients:
+            http_client.close()
+            await http_async_client.aclose()
+
+
+_registry: Optional[LLMClientRegistry] = None
+_registry_lock = threading.Lock()
+
+
+def get_llm_registry() -> LLMClientRegistry:
+    """Process-wide registry configured from Config"""
+    global _registry
+    with _registry_lock:
+        if _registry is None:
+            _registry = LLMClientRegistry(
+                max_connections=Config.LLM_MAX_CONNECTIONS,
+                max_keepalive_connections=Config.LLM_MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=Config.LLM_KEEPALIVE_EXPIRY,
+                timeout=Config.LLM_TIMEOUT
+            )
+        return _registry
@@ -0,0 +1,215 @@
+"""
+Lightweight Prometheus-style metrics
+Counters and histograms with labels, rendered in the text exposition format
+"""
+
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+from contextvars import ContextVar
+import bisect
+import threading
+import time
+
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+TOKEN_BUCKETS = (16, 64, 256, 512, 1024, 2048, 4096, 8192)
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for _, v in pairs)
+    return "{" + ",".join(f'{name}="{value}"' for (name, _), value in zip(pairs, escaped)) + "}"
+
+
+class Counter:
+    """Monotonic counter with optional labels"""
+    
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+    
+    def inc(self, amount: float = 1, **labels: str):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+    
+    def value(self, **labels: str) -> float:
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        return self._values.get(key, 0)
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.label_names, key)} {value}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram with optional labels"""
+    
+    def __init__(self, name: str, documentation: str, labels: Sequence[str] = (),
+                 buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        # Per label set: [bucket counts..., +Inf count], sum
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+        self._lock = threading.Lock()
+    
+    def observe(self, value: float, **labels: str):
+        key = tuple(str(labels.get(name, "")) for name in self.label_names)
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            counts, total = self._series.setdefault(key, ([0] * (len(self.buckets) + 1), [0.0]))
+            counts[index] += 1
+            total[0] += value
+    
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for key, (counts, total) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, count in zip(self.buckets, counts):
+                    cumulative += count
+                    lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, ('le', repr(float(bound))))} {cumulative}")
+                cumulative += counts[-1]
+                lines.append(f"{self.name}_bucket{_format_labels(self.label_names, key, ('le', '+Inf'))} {cumulative}")
+                lines.append(f"{self.name}_sum{_format_labels(self.label_names, key)} {total[0]}")
+                lines.append(f"{self.name}_count{_format_labels(self.label_names, key)} {cumulative}")
+        return lines
+
+
+class MetricsRegistry:
+    """Collection of metrics rendered together on /metrics"""
+    
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+        self._lock = threading.Lock()
+    
+    def counter(self, name: str, documentation: str, labels: Sequence[str] = ()) -> Counter:
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Counter(name, documentation, labels)
+            return self._metrics[name]
+    
+    def histogram(self, name: str, documentation: str, labels: Sequence[str] = (),
+                  buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        with self._lock:
+            if name not in self._metrics:
+                self._metrics[name] = Histogram(name, documentation, labels, buckets)
+            return self._metrics[name]
+    
+    def render(self) -> str:
+        with self._lock:
+            metrics = list(self._metrics.values())
+        lines: List[str] = []
+        for metric in metrics:
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+
+registry = MetricsRegistry()
+
+# Agent and chain LLM calls
+LLM_CALL_SECONDS = registry.histogram(
+    "agent_llm_call_seconds", "Wall time of LLM calls by stage", ("stage",))
+LLM_PROMPT_TOKENS = registry.histogram(
+    "agent_llm_prompt_tokens", "Prompt tokens per LLM call by stage", ("stage",), TOKEN_BUCKETS)
+LLM_COMPLETION_TOKENS = registry.histogram(
+    "agent_llm_completion_tokens", "Completion tokens per LLM call by stage", ("stage",), TOKEN_BUCKETS)
+LLM_ERRORS = registry.counter(
+    "agent_llm_errors_total", "LLM calls that raised an error by stage", ("stage",))
+JSON_PARSE_FAILURES = registry.counter(
+    "agent_json_parse_failures_total", "Agent responses that could not be parsed as JSON", ("stage",))
+JSON_PARSE_RESULTS = registry.counter(
+    "agent_json_parse_results_total", "Outcome of parsing agent JSON responses (ok, repaired, failed)", ("stage", "outcome"))
+FALLBACKS = registry.counter(
+    "agent_fallbacks_total", "Fallback paths taken when producing a result", ("stage", "fallback"))
+ESCALATIONS = registry.counter(
+    "agent_escalations_total", "Retries on the escalation model after invalid output, by result", ("stage", "outcome"))
+
+# Whole requests
+PIPELINE_SECONDS = registry.histogram(
+    "agent_pipeline_seconds", "End-to-end wall time of the agent pipeline", ("endpoint",))
+ADMISSION_WAIT_SECONDS = registry.histogram(
+    "agent_admission_wait_seconds", "Time LLM calls waited for an admission slot", ("model",))
+ADMISSION_SHED = registry.counter(
+    "agent_admission_shed_total", "LLM calls rejected by admission control", ("reason",))
+SPECULATION = registry.counter(
+    "agent_speculation_total", "Speculative Analyzer surveys by outcome (hit, partial, rerun)", ("outcome",))
+COALESCED_REQUESTS = registry.counter(
+    "agent_coalesced_requests_total", "Requests that ran the pipeline (leader) or shared a run in flight (coalesced)", ("flight", "role"))
+
+
+
+# ============ Per-request report ============
+
+# Per-request report (timings, tokens, cache hits, ...) shared by the
+# request's async tasks and merged into agent_insights when the result is compiled
+_request_report: ContextVar[Optional[Dict[str, Any]]] = ContextVar("request_report", default=None)
+
+
+def begin_request_report() -> Dict[str, Any]:
+    """Start a fresh report for the current request"""
+    report: Dict[str, Any] = {"_started": time.perf_counter()}
+    _request_report.set(report)
+    return report
+
+
+def get_request_report() -> Optional[Dict[str, Any]]:
+    """The current request's report, or None outside a request"""
+    return _request_report.get()
+
+
+def finish_request_report() -> Dict[str, Any]:
+    """Report contents with the total request time filled in"""
+    report = _request_report.get()
+    if report is None:
+        return {}
+    finished = {key: value for key, value in report.items() if not key.startswith("_")}
+    if "_started" in report:
+        finished.setdefault("timings_ms", {})["total"] = round((time.perf_counter() - report["_started"]) * 1000, 1)
+    return finished
+
+
+def record_llm_call(stage: str, seconds: float, prompt_tokens: int, completion_tokens: int):
+    """Record one LLM call in the metrics and the current request's report"""
+    LLM_CALL_SECONDS.observe(seconds, stage=stage)
+    LLM_PROMPT_TOKENS.observe(prompt_tokens, stage=stage)
+    LLM_COMPLETION_TOKENS.observe(completion_tokens, stage=stage)
+    
+    report = _request_report.get()
+    if report is not None:
+        timings = report.setdefault("timings_ms", {})
+        timings[stage] = round(timings.get(stage, 0) + seconds * 1000, 1)
+        tokens = report.setdefault("tokens", {}).setdefault(stage, {"prompt": 0, "completion": 0})
+        tokens["prompt"] += prompt_tokens
+        tokens["completion"] += completion_tokens
+
+
+def record_parse(stage: str, outcome: str):
+    """Record whether a JSON response parsed first time, after a repair, or not at all"""
+    JSON_PARSE_RESULTS.inc(stage=stage, outcome=outcome)
+    
+    report = _request_report.get()
+    if report is not None:
+        report.setdefault("json_parse", {})[stage] = outcome
+
+
+def record_fallback(stage: str, fallback: str, parse_failure: bool = False):
+    """Record that a fallback path fired, optionally because JSON parsing failed"""
+    FALLBACKS.inc(stage=stage, fallback=fallback)
+    if parse_failure:
+        JSON_PARSE_FAILURES.inc(stage=stage)
+    
+    report = _request_report.get()
+    if report is not None:
+        report.setdefault("fallbacks", []).append(f"{stage}:{fallback}")
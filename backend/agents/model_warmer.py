@@ -0,0 +1,162 @@
+"""
+Model warm-up and keep-alive for local Ollama models
+Loads each configured model with an empty request at startup, so the first
+user request does not pay the model load time, then refreshes the models on
+a schedule while requests keep coming. Each refresh asks Ollama to keep the
+model loaded a little longer than the refresh interval; once the backend goes
+idle the refreshes stop and Ollama unloads the models on its own.
+"""
+
+from typing import Any, Dict, Iterable, List, Optional
+from datetime import datetime
+import asyncio
+import time
+
+import httpx
+
+
+class ModelWarmer:
+    """
+    Background warm-up of the models behind one Ollama server
+    
+    Warming uses Ollama's native /api/generate with an empty prompt, which
+    loads the model without generating. Servers without that endpoint
+    (OpenAI and other hosted APIs) are reported as unsupported and left alone.
+    """
+    
+    def __init__(self, base_url: str, models: Iterable[str], interval: float = 240,
+                 idle_after: float = 900, timeout: float = 120):
+        # The native API lives at the server root, next to the OpenAI-compatible /v1
+        root = (base_url or "").rstrip("/")
+        self.api_url = (root[:-3] if root.endswith("/v1") else root) + "/api/generate"
+        self.models = list(dict.fromkeys(model for model in models if model))
+        self.interval = interval
+        self.idle_after = idle_after
+        self.timeout = timeout
+        # Loaded models outlive one missed refresh
+        self.keep_alive = int(interval * 2)
+        self._status: Dict[str, Dict[str, Any]] = {
+            model: {"state": "pending", "ready": False, "last_warm": None, "last_warm_ms": None,
+                    "load_ms": None, "error": None, "_warmed_at": None}
+            for model in self.models
+        }
+        self._last_activity = time.monotonic()
+        self._task: Optional[asyncio.Task] = None
+        self._wake: Optional[asyncio.Event] = None
+    
+    def touch(self):
+        """Record a request that uses the models; keeps the refreshes going"""
+        was_idle = self.idle
+        self._last_activity = time.monotonic()
+        if was_idle and self._wake is not None:
+            # Back from idle: reload the models now rather than at the next refresh
+            self._wake.set()
+    
+    @property
+    def idle(self) -> bool:
+        return time.monotonic() - self._last_activity > self.idle_after
+    
+    def start(self):
+        """Warm every model now and keep refreshing in the background"""
+        if self._task is None and self.models:
+            self._wake = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+    
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+    
+    async def warm_all(self, client: httpx.AsyncClient):
+        """Warm the models one after another (a local server loads them one at a time anyway)"""
+        for model in self.models:
+            if self._status[model]["state"] != "unsupported":
+                await self.warm(client, model)
+    
+    async def warm(self, client: httpx.AsyncClient, model: str):
+        """Load one model, or extend how long it stays loaded"""
+        status = self._status[model]
+        started = time.perf_counter()
+        try:
+            response = await client.post(self.api_url, json={
+                "model": model, "prompt": "", "stream": False, "keep_alive": self.keep_alive
+            })
+        except httpx.HTTPError as e:
+            status.update(state="error", ready=False, error=f"{type(e).__name__}: {e}")
+            print(f"[Warmer] {model} could not be warmed: {status['error']}")
+            return
+        
+        if response.status_code == 404 and _ollama_error(response) is None:
+            # No native API: not an Ollama server (Ollama answers 404 with an error for unknown models)
+            status.update(state="unsupported", ready=False, error="server has no /api/generate")
+            return
+        if response.status_code != 200:
+            error = _ollama_error(response) or response.text[:200]
+            status.update(state="error", ready=False, error=f"HTTP {response.status_code}: {error}")
+            print(f"[Warmer] {model} could not be warmed: {status['error']}")
+            return
+        
+        elapsed_ms = round((time.perf_counter() - started) * 1000, 1)
+        load_ns = _json(response).get("load_duration")
+        if status["last_warm"] is None:
+            print(f"[Warmer] {model} ready in {elapsed_ms} ms")
+        status.update(
+            state="warm", ready=True, error=None, last_warm=datetime.now().isoformat(),
+            last_warm_ms=elapsed_ms, load_ms=round(load_ns / 1e6, 1) if load_ns is not None else status["load_ms"],
+            _warmed_at=time.monotonic()
+        )
+    
+    def status(self) -> Dict[str, Any]:
+        """Per-model readiness for /health"""
+        now = time.monotonic()
+        models: Dict[str, Any] = {}
+        for model, status in self._status.items():
+            report = {key: value for key, value in status.items() if not key.startswith("_")}
+            if status["state"] == "warm" and now - status["_warmed_at"] > self.keep_alive:
+                # Past its keep-alive: Ollama will have unloaded it
+                report.update(state="unloaded", ready=False)
+            models[model] = report
+        return {
+            "api_url": self.api_url,
+            "interval": self.interval,
+            "keep_alive": self.keep_alive,
+            "idle": self.idle,
+            "models": models
+        }
+    
+    async def _run(self):
+        async with httpx.AsyncClient(timeout=httpx.Timeout(self.timeout, connect=5.0)) as client:
+            await self.warm_all(client)
+            while True:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=self.interval)
+                except asyncio.TimeoutError:
+                    pass
+                self._wake.clear()
+                if not self.idle:
+                    await self.warm_all(client)
+
+
+def warmup_models(chat_model: str, reasoning_model: str, stage_models: Iterable[str]) -> List[str]:
+    """Models the default configuration uses: "chat"/"reasoning" in a stage setting map to those models"""
+    aliases = {"chat": chat_model, "reasoning": reasoning_model}
+    names = [chat_model, reasoning_model] + [aliases.get((name or "").lower(), name) for name in stage_models]
+    return list(dict.fromkeys(name for name in names if name))
+
+
+def _json(response: httpx.Response) -> Dict[str, Any]:
+    try:
+        data = response.json()
+    except ValueError:
+        return {}
+    return data if isinstance(data, dict) else {}
+
+
+def _ollama_error(response: httpx.Response) -> Optional[str]:
+    """The "error" message of an Ollama error response, None for anything else"""
+    error = _json(response).get("error")
+    return error if isinstance(error, str) else None
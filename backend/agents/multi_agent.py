@@ -3,11 +3,40 @@ Multi-Agent System for AI Browser Agent
 Implements Planner, Analyzer, and Executor agents working together
 """
 
-from typing import List, Dict, Any, Optional
-from dataclasses import dataclass
-from langchain.llms.base import BaseLLM
-from langchain_openai import ChatOpenAI
+from typing import TYPE_CHECKING, List, Dict, Any, Optional, AsyncIterator, Tuple, Type
+from contextlib import nullcontext
+from dataclasses import asdict, dataclass
+import asyncio
 import json
+import re
+import time
+
+from agents.admission import Overloaded, get_admission_controller
+from agents.action_validator import ActionValidator
+from agents.context_encoder import ContextEncoder, count_tokens
+from agents.llm_registry import get_llm_registry
+from agents.response_cache import ResponseCache, page_fingerprint
+from agents.router import IntentRouter, ACTION_PATTERN
+from agents.page_preprocessor import PagePreprocessor
+from agents.page_text import TextWindow, split_passages
+from agents.snapshot_store import SnapshotStore
+from agents.conversation_memory import ConversationMemory
+from agents.prompts import PromptTemplate, render_page_block, split_context, prompt_text
+from agents.json_parser import (
+    PlanSchema, AnalysisSchema, ActionsSchema, FusedSchema, parse_json_response, repair_prompt
+)
+from agents.metrics import (
+    LLM_ERRORS, ESCALATIONS, SPECULATION, begin_request_report, get_request_report, finish_request_report,
+    record_llm_call, record_fallback, record_parse
+)
+from pydantic import BaseModel
+
+if TYPE_CHECKING:
+    from langchain.llms.base import BaseLLM
+    from langchain_core.messages import BaseMessage
+
+# Tells summary tasks apart when the system runs without a router (ROUTER_ENABLED=false)
+_DEFAULT_CLASSIFIER = IntentRouter()
 
 
 @dataclass
@@ -21,35 +50,210 @@ class AgentMessage:
 class SimpleAgent:
     """Base agent class with role and personality"""
     
-    def __init__(self, name: str, role: str, llm: BaseLLM):
+    def __init__(self, name: str, role: str, llm: "BaseLLM"):
         self.name = name
         self.role = role
         self.llm = llm
         self.memory: List[AgentMessage] = []
+        self.max_memory: Optional[int] = None
+        self.json_mode = False  # request JSON output mode from OpenAI-compatible servers
+        self.escalation_llm: Optional["BaseLLM"] = None  # bigger model retried when JSON stays invalid
+        self.context_encoder = ContextEncoder.for_agent(name)
+        self.template = PromptTemplate.for_agent(name, role)
     
-    def think(self, prompt: str, context: Optional[Dict] = None) -> str:
+    def think(self, prompt: str, context: Optional[Dict] = None, json_mode: bool = False,
+              escalate: bool = False) -> str:
         """Agent reasoning process"""
-        system_prompt = f"You are {self.name}, a {self.role}. "
+        messages = self._build_prompt(prompt, context)
         
-        if context:
-            system_prompt += f"\n\nContext: {json.dumps(context, indent=2)}"
+        with self._admission_slot(escalate):
+            started = time.perf_counter()
+            try:
+                response = self._llm_for(json_mode, escalate).invoke(messages)
+            except Exception:
+                LLM_ERRORS.inc(stage=self.stage)
+                raise
         
-        full_prompt = f"{system_prompt}\n\n{prompt}"
+        content = self._remember(response, context)
+        self._record_call(messages, content, response, started, escalate)
+        return content
+    
+    async def athink(self, prompt: str, context: Optional[Dict] = None, json_mode: bool = False,
+                     escalate: bool = False) -> str:
+        """Async agent reasoning process - awaits the LLM without blocking the event loop"""
+        messages = self._build_prompt(prompt, context)
+        
+        async with self._admission_slot(escalate, asynchronous=True):
+            started = time.perf_counter()
+            try:
+                response = await self._llm_for(json_mode, escalate).ainvoke(messages)
+            except Exception:
+                LLM_ERRORS.inc(stage=self.stage)
+                raise
         
-        response = self.llm.invoke(full_prompt)
+        content = self._remember(response, context)
+        self._record_call(messages, content, response, started, escalate)
+        return content
+    
+    async def astream_think(self, prompt: str, context: Optional[Dict] = None,
+                            json_mode: bool = False) -> AsyncIterator[str]:
+        """Stream the agent's response token by token; memory is updated once the stream ends"""
+        messages = self._build_prompt(prompt, context)
+        
+        chunks: List[str] = []
+        aggregate = None
+        async with self._admission_slot(asynchronous=True):
+            started = time.perf_counter()
+            try:
+                async for chunk in self._llm_for(json_mode).astream(messages):
+                    aggregate = chunk if aggregate is None else aggregate + chunk
+                    text = chunk.content if hasattr(chunk, 'content') else str(chunk)
+                    if text:
+                        chunks.append(text)
+                        yield text
+            except Exception:
+                LLM_ERRORS.inc(stage=self.stage)
+                raise
+        
+        content = self._remember("".join(chunks), context)
+        self._record_call(messages, content, aggregate, started)
+    
+    def think_json(self, prompt: str, schema: Type[BaseModel],
+                   context: Optional[Dict] = None) -> Tuple[Optional[Dict[str, Any]], str]:
+        """
+        Ask for a JSON response and validate it against schema
+        
+        An invalid response is retried once: with the original prompt on the
+        escalation model when one is set, otherwise as a repair request to
+        the same model.
+        
+        Returns:
+            (data, response) - data is None if the response stayed invalid after the retry
+        """
+        response = self.think(prompt, context, json_mode=True)
+        data, error = parse_json_response(response, schema)
+        if data is not None:
+            record_parse(self.stage, "ok")
+            return data, response
         
+        if self.escalation_llm is not None:
+            print(f"[{self.name}] Invalid JSON ({error}), escalating to {_model_name(self.escalation_llm)}...")
+            escalated = self.think(prompt, context, json_mode=True, escalate=True)
+            return self._finish_retry(escalated, response, schema, "escalated")
+        
+        print(f"[{self.name}] Invalid JSON ({error}), requesting repair...")
+        repaired = self.think(repair_prompt(response, error, schema), json_mode=True)
+        return self._finish_retry(repaired, response, schema, "repaired")
+    
+    async def athink_json(self, prompt: str, schema: Type[BaseModel],
+                          context: Optional[Dict] = None) -> Tuple[Optional[Dict[str, Any]], str]:
+        """Async variant of think_json"""
+        response = await self.athink(prompt, context, json_mode=True)
+        return await self.avalidate_json(response, schema, prompt, context)
+    
+    async def avalidate_json(self, response: str, schema: Type[BaseModel], prompt: Optional[str] = None,
+                             context: Optional[Dict] = None) -> Tuple[Optional[Dict[str, Any]], str]:
+        """Validate an already generated response, with one async retry (escalation needs the prompt)"""
+        data, error = parse_json_response(response, schema)
+        if data is not None:
+            record_parse(self.stage, "ok")
+            return data, response
+        
+        if self.escalation_llm is not None and prompt is not None:
+            print(f"[{self.name}] Invalid JSON ({error}), escalating to {_model_name(self.escalation_llm)}...")
+            escalated = await self.athink(prompt, context, json_mode=True, escalate=True)
+            return self._finish_retry(escalated, response, schema, "escalated")
+        
+        print(f"[{self.name}] Invalid JSON ({error}), requesting repair...")
+        repaired = await self.athink(repair_prompt(response, error, schema), json_mode=True)
+        return self._finish_retry(repaired, response, schema, "repaired")
+    
+    def _finish_retry(self, retried: str, original: str, schema: Type[BaseModel],
+                      outcome: str) -> Tuple[Optional[Dict[str, Any]], str]:
+        """Validate the retried response; on failure hand back the original for the fallback"""
+        data, _ = parse_json_response(retried, schema)
+        record_parse(self.stage, outcome if data is not None else "failed")
+        if outcome == "escalated":
+            ESCALATIONS.inc(stage=self.stage, outcome="ok" if data is not None else "failed")
+        return data, (retried if data is not None else original)
+    
+    def _llm_for(self, json_mode: bool, escalate: bool = False):
+        """The LLM (or escalation LLM), bound to JSON output mode when requested and enabled"""
+        llm = self.escalation_llm if escalate and self.escalation_llm is not None else self.llm
+        if json_mode and self.json_mode:
+            return llm.bind(response_format={"type": "json_object"})
+        return llm
+    
+    def _admission_slot(self, escalate: bool = False, asynchronous: bool = False):
+        """Admission slot for one call to the model (a no-op context when admission control is off)"""
+        admission = get_admission_controller()
+        if admission is None:
+            return nullcontext()
+        llm = self.escalation_llm if escalate and self.escalation_llm is not None else self.llm
+        return admission.aslot(_model_name(llm)) if asynchronous else admission.slot(_model_name(llm))
+    
+    @property
+    def stage(self) -> str:
+        """Stage label used in metrics and reports"""
+        return self.name.lower()
+    
+    def _record_call(self, messages: List["BaseMessage"], content: str, response: Any, started: float,
+                     escalate: bool = False):
+        """Record wall time, token usage (preferring the server's counts) and the model used"""
+        usage = getattr(response, 'usage_metadata', None) or {}
+        prompt_tokens = usage.get('input_tokens') or count_tokens(prompt_text(messages))
+        completion_tokens = usage.get('output_tokens') or count_tokens(content)
+        record_llm_call(self.stage, time.perf_counter() - started, prompt_tokens, completion_tokens)
+        
+        report = get_request_report()
+        if report is not None:
+            llm = self.escalation_llm if escalate and self.escalation_llm is not None else self.llm
+            report.setdefault("models", {})[self.stage] = _model_name(llm)
+    
+    def _build_prompt(self, prompt: str, context: Optional[Dict] = None) -> List["BaseMessage"]:
+        """
+        Build the messages sent to the LLM
+        
+        Static system prompt first, then the page block, then the per-call
+        prompt and conversation, so consecutive calls share the longest
+        possible prefix for the server's prompt cache.
+        """
+        page, conversation = split_context(context)
+        encoded_page = self.context_encoder.encode(page) if page else ""
+        encoded_conversation = self.context_encoder.encode(conversation) if conversation else ""
+        if context:
+            self._report_context_tokens(context, "\n".join(filter(None, [encoded_page, encoded_conversation])))
+        
+        request = prompt.strip()
+        if encoded_conversation:
+            request = f"Conversation so far:\n{encoded_conversation}\n\n{request}"
+        return self.template.messages(render_page_block(page, encoded_page), request)
+    
+    def _report_context_tokens(self, context: Dict, encoded: str):
+        """Record raw vs. encoded context tokens in the current request's report"""
+        report = get_request_report()
+        if report is None:
+            return
+        stage = report.setdefault("context_tokens", {}).setdefault(self.stage, {"before": 0, "after": 0})
+        stage["before"] += count_tokens(json.dumps(context, indent=2, default=str))
+        stage["after"] += count_tokens(encoded)
+    
+    def _remember(self, response: Any, context: Optional[Dict] = None) -> str:
+        """Extract response content and store it in memory"""
         # Extract content from LangChain response (could be AIMessage or string)
         if hasattr(response, 'content'):
             content = response.content
         else:
             content = str(response)
         
-        # Store in memory
+        # Store in memory (which context fields were used, not the page itself)
         self.memory.append(AgentMessage(
             sender=self.name,
             content=content,
-            metadata={"context": context or {}}
+            metadata={"context_fields": sorted(context or {}), "url": (context or {}).get('url')}
         ))
+        if self.max_memory is not None and len(self.memory) > self.max_memory:
+            del self.memory[:-self.max_memory]
         
         return content
     
@@ -65,75 +269,39 @@ class SimpleAgent:
 class PlannerAgent(SimpleAgent):
     """Strategic planning agent"""
     
-    def __init__(self, llm: BaseLLM):
+    def __init__(self, llm: "BaseLLM"):
         super().__init__(
             name="Planner",
             role="strategic planner who breaks down complex tasks into actionable steps with a focus on delivering actual content and information to users rather than just describing actions",
             llm=llm
         )
     
-    def create_plan(self, task: str, page_context: Dict) -> Dict[str, Any]:
-        """Create a strategic plan for the task"""
-        # Enhanced prompt to emphasize content extraction over action description
-        prompt = f"""
+    def create_plan(self, task: str, page_context: Dict) -> Tuple[Dict[str, Any], bool]:
+        """
+        Create a strategic plan for the task
+        
+        Returns:
+            (plan, parse_ok) - parse_ok is False when the response stayed invalid and the fallback plan is used
+        """
+        plan, response = self.think_json(self._plan_prompt(task, page_context), PlanSchema, context=page_context)
+        return (plan, True) if plan is not None else (self._fallback_plan(response, task), False)
+    
+    async def acreate_plan(self, task: str, page_context: Dict) -> Tuple[Dict[str, Any], bool]:
+        """Async variant of create_plan"""
+        plan, response = await self.athink_json(self._plan_prompt(task, page_context), PlanSchema, context=page_context)
+        return (plan, True) if plan is not None else (self._fallback_plan(response, task), False)
+    
+    def _plan_prompt(self, task: str, page_context: Dict) -> str:
+        """Build the per-call part of the planning prompt (instructions are in the system prompt)"""
+        return f"""
 Given this task: "{task}"
 
-And this webpage context:
-- URL: {page_context.get('url', 'Unknown')}
-- Title: {page_context.get('title', 'Unknown')}
-- Available elements: {len(page_context.get('interactiveElements', []))} interactive elements
-- Page type: {page_context.get('pageType', 'Unknown')}
-
-Create a strategic plan that prioritizes CONTENT EXTRACTION AND DELIVERY over procedural descriptions. 
-
-When the task asks for information (news, content, summaries, etc.):
-1. Focus on identifying and extracting ACTUAL CONTENT from the page
-2. Plan how to gather and synthesize the requested information
-3. Think about how to present the information in a useful way
-
-Steps for content-focused planning:
-1. Content Identification: What specific information is available?
-2. Extraction Strategy: How to gather that information?
-3. Synthesis Approach: How to organize and present it?
-4. Delivery Method: How to communicate it clearly to the user?
-
-Respond in JSON format:
-{{
-  "understanding": "...",
-  "approach": "...",
-  "steps": ["step1", "step2", ...],
-  "risks": ["risk1", "risk2", ...]
-}}
-
-EXAMPLE GOOD RESPONSE FOR "WHAT ARE THE TOP NEWS HEADLINES":
-{{
-  "understanding": "User wants actual news headlines from the current page",
-  "approach": "Extract headlines from visible news elements and present them as a numbered list",
-  "steps": [
-    "Identify headline elements (h1, h2, h3 tags)",
-    "Extract text content from those elements",
-    "Format as a clear numbered list of headlines",
-    "Present to user without procedural descriptions"
-  ],
-  "risks": [
-    "Headlines may not be clearly marked",
-    "May need to filter out non-news content"
-  ]
-}}
+Create the plan for it on this page.
 """
-        
-        response = self.think(prompt, context=page_context)
-        
-        try:
-            # Extract JSON from response
-            json_start = response.find('{')
-            json_end = response.rfind('}') + 1
-            if json_start != -1 and json_end > json_start:
-                return json.loads(response[json_start:json_end])
-        except:
-            pass
-        
-        # Fallback
+    
+    def _fallback_plan(self, response: str, task: str) -> Dict[str, Any]:
+        """Plan used when the response could not be parsed"""
+        record_fallback(self.stage, "raw_response_plan", parse_failure=True)
         return {
             "understanding": response,
             "approach": "Direct execution",
@@ -145,143 +313,492 @@ EXAMPLE GOOD RESPONSE FOR "WHAT ARE THE TOP NEWS HEADLINES":
 class AnalyzerAgent(SimpleAgent):
     """Page analysis and element detection agent"""
     
-    def __init__(self, llm: BaseLLM):
+    def __init__(self, llm: "BaseLLM"):
         super().__init__(
             name="Analyzer",
             role="expert at analyzing webpages and identifying the best elements to interact with, with a focus on extracting actual content and information for users rather than just describing UI elements",
             llm=llm
         )
+        # Elements arrive ranked by relevance when a preprocessor runs, so the
+        # top of the list is what the Analyzer should see
+        self.element_limit = 10
+        # Characters of page text in the prompt; None when the text is already a task window
+        self.text_limit: Optional[int] = 500
+    
+    def analyze_page(self, page_data: Dict, plan: Dict) -> Tuple[Dict[str, Any], bool]:
+        """
+        Analyze page and identify target elements
+        
+        Returns:
+            (analysis, parse_ok) - parse_ok is False when the fallback analysis is used
+        """
+        analysis, response = self.think_json(self._analysis_prompt(page_data, plan), AnalysisSchema,
+                                             context=self._page_context(page_data))
+        return (analysis, True) if analysis is not None else (self._fallback_analysis(response), False)
     
-    def analyze_page(self, page_data: Dict, plan: Dict) -> Dict[str, Any]:
-        """Analyze page and identify target elements"""
-        prompt = f"""
-Analyze this webpage to execute the plan.
-
-Page Data:
-- URL: {page_data.get('url')}
-- Title: {page_data.get('title')}
-- Text Content: {page_data.get('text', '')[:500]}...
-- Interactive Elements: {json.dumps(page_data.get('interactiveElements', [])[:10], indent=2)}
-
-Plan Steps: {json.dumps(plan.get('steps', []))}
-
-For each step, identify:
-1. Which element(s) to interact with
-2. What action to take (click, type, scroll, etc.)
-3. What value to use (if typing)
-4. CSS selector for the element
-
-Respond in JSON format:
-{{
-  "analysis": "...",
-  "element_mapping": [
-    {{
-      "step": "...",
-      "element": {{...}},
-      "action": "click|type|scroll",
-      "value": "...",
-      "selector": "..."
-    }}
-  ]
-}}
+    async def aanalyze_page(self, page_data: Dict, plan: Dict) -> Tuple[Dict[str, Any], bool]:
+        """Async variant of analyze_page"""
+        analysis, response = await self.athink_json(self._analysis_prompt(page_data, plan), AnalysisSchema,
+                                                    context=self._page_context(page_data))
+        return (analysis, True) if analysis is not None else (self._fallback_analysis(response), False)
+    
+    def _analysis_prompt(self, page_data: Dict, plan: Dict) -> str:
+        """Build the per-call part of the page analysis prompt"""
+        return f"""
+Map each of these plan steps onto the page: {json.dumps(plan.get('steps', []))}
 """
+    
+    def _page_context(self, page_data: Dict) -> Dict:
+        """The page as the Analyzer sees it: top elements and a bounded text excerpt"""
+        return dict(
+            page_data,
+            interactiveElements=page_data.get('interactiveElements', [])[:self.element_limit],
+            text=self._text_excerpt(page_data)
+        )
+    
+    def _text_excerpt(self, page_data: Dict) -> str:
+        text = page_data.get('text', '')
+        if self.text_limit is None or len(text) <= self.text_limit:
+            return text
+        return text[:self.text_limit] + "..."
+    
+    async def asurvey_page(self, task: str, page_data: Dict) -> Tuple[Dict[str, Any], bool]:
+        """
+        Plan-independent element analysis
         
-        response = self.think(prompt, context=page_data)
+        Maps the task straight onto page elements so it can run while the
+        Planner is still working; reconcile() later lines it up with the plan.
         
-        try:
-            json_start = response.find('{')
-            json_end = response.rfind('}') + 1
-            if json_start != -1 and json_end > json_start:
-                return json.loads(response[json_start:json_end])
-        except:
-            pass
+        Returns:
+            (survey, parse_ok) - parse_ok is False when the fallback analysis is used
+        """
+        survey, response = await self.athink_json(self._survey_prompt(task, page_data), AnalysisSchema,
+                                                  context=self._page_context(page_data))
+        return (survey, True) if survey is not None else (self._fallback_analysis(response), False)
+    
+    def _survey_prompt(self, task: str, page_data: Dict) -> str:
+        """Build the per-call part of the plan-independent survey prompt"""
+        return f"""
+Find the elements needed for this task: "{task}"
+
+List every element that is likely to be used to complete the task, in the
+order it would be used. For each, describe the step it serves in a few words.
+"""
+    
+    def reconcile(self, survey: Dict[str, Any], plan: Dict) -> Tuple[Dict[str, Any], List[str]]:
+        """
+        Line up a speculative survey with the plan's steps
         
+        Each plan step is matched to the survey entry whose values (step
+        description, selector, element text) share the most words with it.
+        Steps that only report back to the user need no element.
+        
+        Returns:
+            (analysis with the matched steps, actionable steps no entry matched)
+        """
+        entries = [(entry, _entry_words(entry)) for entry in survey.get('element_mapping') or []]
+        mapping, missing = [], []
+        for step in plan.get('steps') or []:
+            step_words = _content_words(str(step))
+            best, best_score = None, 0
+            for entry, entry_words in entries:
+                score = len(step_words & entry_words)
+                if score > best_score:
+                    best, best_score = entry, score
+            if best is not None:
+                mapping.append({**best, "step": step})
+            elif _needs_element(str(step)):
+                missing.append(step)
+        
+        return {"analysis": survey.get("analysis"), "element_mapping": mapping}, missing
+    
+    def _fallback_analysis(self, response: str) -> Dict[str, Any]:
+        """Analysis used when the response could not be parsed"""
+        record_fallback(self.stage, "empty_element_mapping", parse_failure=True)
         return {
             "analysis": response,
             "element_mapping": []
         }
 
 
+_STOPWORDS = {'the', 'and', 'for', 'from', 'with', 'that', 'this', 'into', 'those', 'them', 'then', 'page', 'element', 'elements',
+              'was', 'are', 'its', 'has', 'their', 'your', 'you', 'all', 'any'}
+
+# Action verbs and element kinds that most steps share; they say nothing about which element a step needs
+_GENERIC_WORDS = {'click', 'type', 'enter', 'fill', 'press', 'submit', 'select', 'choose', 'scroll', 'navigate',
+                  'open', 'find', 'locate', 'button', 'field', 'link', 'input', 'box', 'item', 'value'}
+
+
+# Leading verbs of plan steps that answer the user rather than act on the page
+_REPORTING_VERBS = {'summarize', 'summarise', 'report', 'answer', 'tell', 'explain', 'present', 'respond',
+                    'reply', 'provide', 'share', 'return', 'give', 'compile', 'describe'}
+
+# Element mapping fields that say which element and step an entry is about
+_ENTRY_FIELDS = ('step', 'purpose', 'description', 'selector', 'value')
+_ELEMENT_FIELDS = ('text', 'label', 'name', 'placeholder', 'id', 'ariaLabel', 'aria-label')
+
+
+def _content_words(text: str) -> set:
+    """Lowercased words of three or more letters without a plural s, minus filler and generic UI words"""
+    words = {word[:-1] if len(word) > 4 and word.endswith('s') and not word.endswith('ss') else word
+             for word in re.findall(r'[a-z0-9]{3,}', text.lower()) if word not in _STOPWORDS}
+    return words - _GENERIC_WORDS
+
+
+def _entry_words(entry: Dict[str, Any]) -> set:
+    """Words of an element mapping entry's values (not its field names)"""
+    values = [entry.get(field) for field in _ENTRY_FIELDS]
+    element = entry.get('element')
+    if isinstance(element, dict):
+        values.extend(element.get(field) for field in _ELEMENT_FIELDS)
+    elif element is not None:
+        values.append(element)
+    return _content_words(" ".join(str(value) for value in values if value))
+
+
+def _needs_element(step: str) -> bool:
+    """Whether a plan step acts on the page (anything but reporting back to the user)"""
+    words = re.findall(r'[a-z]+', step.lower())
+    return not words or words[0] not in _REPORTING_VERBS
+
+
+class JSONStringFieldStreamer:
+    """
+    Incrementally decodes the string value of one top-level JSON field
+    from a response that arrives in chunks
+    """
+    
+    _ESCAPES = {'"': '"', '\\': '\\', '/': '/', 'b': '\b', 'f': '\f', 'n': '\n', 'r': '\r', 't': '\t'}
+    
+    def __init__(self, field: str):
+        self.marker = f'"{field}"'
+        self.buffer = ""
+        self.pos = 0
+        self.state = "search"  # search → colon → quote → value → done
+    
+    def feed(self, chunk: str) -> str:
+        """Add a chunk and return any newly decoded characters of the field value"""
+        self.buffer += chunk
+        out: List[str] = []
+        
+        while self.pos < len(self.buffer) and self.state != "done":
+            if self.state == "search":
+                idx = self.buffer.find(self.marker, self.pos)
+                if idx == -1:
+                    # Keep a tail in case the marker is split across chunks
+                    self.pos = max(self.pos, len(self.buffer) - len(self.marker))
+                    break
+                self.pos = idx + len(self.marker)
+                self.state = "colon"
+            elif self.state in ("colon", "quote"):
+                char = self.buffer[self.pos]
+                if char.isspace():
+                    self.pos += 1
+                elif self.state == "colon" and char == ':':
+                    self.pos += 1
+                    self.state = "quote"
+                elif self.state == "quote" and char == '"':
+                    self.pos += 1
+                    self.state = "value"
+                else:
+                    # The marker was a value or a non-string field, keep looking
+                    self.state = "search"
+            else:
+                char = self.buffer[self.pos]
+                if char == '"':
+                    self.pos += 1
+                    self.state = "done"
+                elif char == '\\':
+                    if self.pos + 1 >= len(self.buffer):
+                        break
+                    code = self.buffer[self.pos + 1]
+                    if code == 'u':
+                        if self.pos + 6 > len(self.buffer):
+                            break
+                        try:
+                            out.append(chr(int(self.buffer[self.pos + 2:self.pos + 6], 16)))
+                        except ValueError:
+                            pass
+                        self.pos += 6
+                    else:
+                        out.append(self._ESCAPES.get(code, code))
+                        self.pos += 2
+                else:
+                    out.append(char)
+                    self.pos += 1
+        
+        return "".join(out)
+
+
 class ExecutorAgent(SimpleAgent):
     """Action execution agent"""
     
-    def __init__(self, llm: BaseLLM):
+    def __init__(self, llm: "BaseLLM"):
         super().__init__(
             name="Executor",
             role="precise task executor who generates executable actions with a focus on extracting and delivering actual content and information to users rather than just performing mechanical actions",
             llm=llm
         )
     
-    def generate_actions(self, analysis: Dict, plan: Dict) -> List[Dict[str, Any]]:
-        """Generate executable actions from analysis"""
-        # Enhanced prompt emphasizing actual content extraction and formatting
-        prompt = f"""
-Based on this analysis and plan, generate precise executable actions with a strong emphasis on ACTUALLY EXTRACTING AND FORMATTING CONTENT.
-
+    def generate_actions(self, analysis: Dict, plan: Dict) -> Tuple[List[Dict[str, Any]], str, bool]:
+        """
+        Generate executable actions from analysis
+        
+        Returns:
+            (actions, result, parse_ok) - parse_ok is False when no valid actions could be generated
+        """
+        data, _ = self.think_json(self._actions_prompt(analysis, plan), ActionsSchema)
+        return self._actions_from(data)
+    
+    async def agenerate_actions(self, analysis: Dict, plan: Dict) -> Tuple[List[Dict[str, Any]], str, bool]:
+        """Async variant of generate_actions"""
+        data, _ = await self.athink_json(self._actions_prompt(analysis, plan), ActionsSchema)
+        return self._actions_from(data)
+    
+    async def astream_actions(self, analysis: Dict, plan: Dict) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream action generation
+        
+        Yields {"token": ...} events for each piece of the "result" field as it
+        is generated, then a final {"actions": ..., "result": ..., "parse_ok": ...} event.
+        """
+        extractor = JSONStringFieldStreamer("result")
+        chunks: List[str] = []
+        async for chunk in self.astream_think(self._actions_prompt(analysis, plan), json_mode=True):
+            chunks.append(chunk)
+            token = extractor.feed(chunk)
+            if token:
+                yield {"token": token}
+        
+        data, _ = await self.avalidate_json("".join(chunks), ActionsSchema, self._actions_prompt(analysis, plan))
+        actions, result_message, parse_ok = self._actions_from(data)
+        yield {"actions": actions, "result": result_message, "parse_ok": parse_ok}
+    
+    def _actions_prompt(self, analysis: Dict, plan: Dict) -> str:
+        """Build the per-call part of the action generation prompt"""
+        return f"""
 Analysis: {json.dumps(analysis, indent=2)}
 Plan: {json.dumps(plan, indent=2)}
+"""
+    
+    def _actions_from(self, data: Optional[Dict[str, Any]]):
+        """Split validated executor output into (actions, result, parse_ok), falling back when invalid"""
+        if data is not None:
+            return data.get('actions', []), data.get('result') or 'Actions generated', True
+        
+        record_fallback(self.stage, "no_actions", parse_failure=True)
+        return [], "Unable to generate actions", False
 
-YOUR PRIMARY GOAL: EXTRACT AND FORMAT REAL CONTENT FROM THE PAGE DATA PROVIDED.
-
-Format for actions:
-{{
-  "actions": [
-    {{
-      "type": "click|type|scroll|navigate|wait|extract",
-      "selector": "CSS selector",
-      "value": "value for type actions",
-      "description": "what this does"
-    }}
-  ],
-  "result": "FORMAT AND RETURN THE ACTUAL CONTENT IDENTIFIED IN THE PLAN - Extract and present the specific information requested by the user. No procedural descriptions!"
-}}
-
-CONTENT EXTRACTION AND FORMATTING INSTRUCTIONS:
-1. Look at the plan.steps for identified content elements
-2. Extract the actual text content from those elements
-3. Format it in a clear, readable way for the user
-4. Return ONLY the formatted content - no procedural descriptions
-
-EXAMPLE EXCELLENT RESULT FOR NEWS HEADLINES:
-"Top Headlines:
-1. Breaking: Major diplomatic crisis escalates
-2. Global climate summit reaches historic agreement
-3. Tech stocks surge after earnings reports"
-
-EXAMPLE POOR RESULT TO AVOID:
-"I have identified headline elements and am now extracting content..."
-
-TASK: Extract and format the actual content identified in the plan, not describe what you're doing.
+
+class NavigatorAgent(SimpleAgent):
+    """Single-call agent that plans, maps elements and generates actions together (fused mode)"""
+    
+    PLAN_FIELDS = ("understanding", "approach", "steps", "risks")
+    ANALYSIS_FIELDS = ("analysis", "element_mapping")
+    
+    def __init__(self, llm: "BaseLLM"):
+        super().__init__(
+            name="Navigator",
+            role="web agent who plans the user's task, maps it onto the page's elements and delivers the actions and the requested content in one response",
+            llm=llm
+        )
+    
+    def run(self, task: str, page_context: Dict) -> Optional[Dict[str, Any]]:
+        """Plan, analysis and actions in one call; None when the output stays invalid"""
+        data, _ = self.think_json(self._run_prompt(task), FusedSchema, context=page_context)
+        return data
+    
+    async def arun(self, task: str, page_context: Dict) -> Optional[Dict[str, Any]]:
+        """Async variant of run"""
+        data, _ = await self.athink_json(self._run_prompt(task), FusedSchema, context=page_context)
+        return data
+    
+    async def astream_run(self, task: str, page_context: Dict) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream the fused call
+        
+        Yields {"token": ...} events for each piece of the "result" field as it
+        is generated, then a final {"data": ...} event (None when invalid).
+        """
+        extractor = JSONStringFieldStreamer("result")
+        chunks: List[str] = []
+        async for chunk in self.astream_think(self._run_prompt(task), page_context, json_mode=True):
+            chunks.append(chunk)
+            token = extractor.feed(chunk)
+            if token:
+                yield {"token": token}
+        
+        data, _ = await self.avalidate_json("".join(chunks), FusedSchema, self._run_prompt(task), page_context)
+        yield {"data": data}
+    
+    def split(self, data: Dict[str, Any]) -> Tuple[Dict, Dict, List[Dict[str, Any]], str]:
+        """Fused output as the (plan, analysis, actions, result) the three stages would produce"""
+        plan = {key: data.get(key) for key in self.PLAN_FIELDS}
+        analysis = {key: data.get(key) for key in self.ANALYSIS_FIELDS}
+        return plan, analysis, data.get('actions', []), data.get('result') or 'Actions generated'
+    
+    def _run_prompt(self, task: str) -> str:
+        """Build the per-call part of the fused prompt"""
+        return f"""
+Task: "{task}"
 """
+
+
+class SummarizerAgent(SimpleAgent):
+    """Map-reduce summarization agent for pages too long for one call"""
+    
+    def __init__(self, llm: "BaseLLM", chunk_tokens: int = 800, max_chunks: int = 24,
+                 max_concurrency: int = 4, summary_words: int = 150):
+        super().__init__(
+            name="Summarizer",
+            role="expert at condensing long web pages into faithful summaries that keep the facts, names and numbers that matter",
+            llm=llm
+        )
+        self.chunk_tokens = chunk_tokens
+        self.max_chunks = max_chunks
+        self.max_concurrency = max_concurrency
+        self.summary_words = summary_words
+        # Chunk summaries are scratch work for one request
+        self.max_memory = 1
+    
+    def needs_map_reduce(self, text: str) -> bool:
+        """True when text does not fit a single chunk"""
+        return count_tokens(text) > self.chunk_tokens
+    
+    async def asummarize(self, task: str, page_data: Dict) -> Tuple[str, Dict[str, Any]]:
+        """
+        Summarize the page text for task
         
-        response = self.think(prompt)
+        Chunks are summarized concurrently (map), then the partial summaries
+        are merged (reduce) in as many rounds as it takes to fit one call, so
+        each call stays within chunk_tokens and wall time grows with the
+        number of rounds rather than the number of chunks.
         
-        try:
-            json_start = response.find('{')
-            json_end = response.rfind('}') + 1
-            if json_start != -1 and json_end > json_start:
-                result = json.loads(response[json_start:json_end])
-                return result.get('actions', []), result.get('result', 'Actions generated')
-        except:
-            pass
+        Returns:
+            (summary, stats)
+        """
+        chunks = split_passages(page_data.get('text', ''), self.chunk_tokens)
+        stats = {"chunks": len(chunks), "chunks_dropped": max(0, len(chunks) - self.max_chunks),
+                 "map_calls": 0, "reduce_calls": 0, "reduce_rounds": 0}
+        chunks = chunks[:self.max_chunks]
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        
+        page = {"url": page_data.get('url'), "title": page_data.get('title')}
+        
+        async def call(prompt: str) -> str:
+            async with semaphore:
+                return (await self.athink(prompt, context=page)).strip()
         
-        return [], "Unable to generate actions"
+        print(f"[Summarizer] Summarizing {len(chunks)} chunks...")
+        summaries = list(await asyncio.gather(*(
+            call(self._map_prompt(task, page_data, chunk, index, len(chunks)))
+            for index, chunk in enumerate(chunks, 1)
+        )))
+        stats["map_calls"] = len(chunks)
+        
+        while len(summaries) > 1:
+            groups = self._reduce_groups(summaries)
+            summaries = list(await asyncio.gather(*(call(self._reduce_prompt(task, page_data, group)) for group in groups)))
+            stats["reduce_calls"] += len(groups)
+            stats["reduce_rounds"] += 1
+        
+        return (summaries[0] if summaries else ""), stats
+    
+    def _reduce_groups(self, summaries: List[str]) -> List[List[str]]:
+        """Consecutive summaries packed into groups that fit one call, at least two per group"""
+        groups: List[List[str]] = [[]]
+        size = 0
+        for summary in summaries:
+            tokens = count_tokens(summary)
+            if len(groups[-1]) >= 2 and size + tokens > self.chunk_tokens:
+                groups.append([])
+                size = 0
+            groups[-1].append(summary)
+            size += tokens
+        # A trailing single summary joins the previous group so every round shrinks the list
+        if len(groups) > 1 and len(groups[-1]) == 1:
+            groups[-2].extend(groups.pop())
+        return groups
+    
+    def _map_prompt(self, task: str, page_data: Dict, chunk: str, index: int, total: int) -> str:
+        return f"""
+Summarize part {index} of {total} of the page in at most {self.summary_words} words.
+The user asked: "{task}"
+
+Text:
+{chunk}
+"""
+    
+    def _reduce_prompt(self, task: str, page_data: Dict, summaries: List[str]) -> str:
+        parts = "\n\n".join(f"Part {index}: {summary}" for index, summary in enumerate(summaries, 1))
+        return f"""
+Combine these summaries of consecutive parts of the page into one summary of at most
+{self.summary_words} words that answers: "{task}"
+
+{parts}
+"""
 
 
 class HybridMultiAgentSystem:
     """
     Hybrid system combining LangChain with multi-agent architecture
-    Planner → Analyzer → Executor pipeline
+    Planner → Analyzer → Executor pipeline, or a single Navigator call in fused mode
     """
     
-    def __init__(self, llm: BaseLLM):
+    PIPELINE_MODES = ("sequential", "speculative", "fused")
+    
+    def __init__(self, llm: "BaseLLM", pipeline_mode: str = "sequential", context_token_budget: int = 1200,
+                 cache: Optional[ResponseCache] = None, router: Optional[IntentRouter] = None,
+                 json_mode: bool = False, preprocessor: Optional[PagePreprocessor] = None,
+                 snapshots: Optional[SnapshotStore] = None, memory_token_budget: int = 600,
+                 memory_recent_messages: int = 6, memory_summarize: bool = True,
+                 stage_llms: Optional[Dict[str, "BaseLLM"]] = None, escalation_llm: Optional["BaseLLM"] = None,
+                 text_window: Optional[TextWindow] = None, summary_chunk_tokens: int = 800,
+                 summary_max_concurrency: int = 4, validator: Optional[ActionValidator] = None):
+        if pipeline_mode not in self.PIPELINE_MODES:
+            raise ValueError(f"Unknown pipeline mode: {pipeline_mode}")
         self.llm = llm
-        self.planner = PlannerAgent(llm)
-        self.analyzer = AnalyzerAgent(llm)
-        self.executor = ExecutorAgent(llm)
+        self.pipeline_mode = pipeline_mode
+        self.cache = cache
+        self.router = router
+        self.preprocessor = preprocessor
+        self.snapshots = snapshots
+        self.text_window = text_window
+        self.validator = validator
+        # Each stage may run on its own model; llm covers the rest
+        stage_llms = stage_llms or {}
+        self.planner = PlannerAgent(stage_llms.get("planner", llm))
+        self.analyzer = AnalyzerAgent(stage_llms.get("analyzer", llm))
+        self.executor = ExecutorAgent(stage_llms.get("executor", llm))
+        self.navigator = NavigatorAgent(stage_llms.get("navigator", llm))
+        # Summarization tasks on long pages are map-reduced over chunks (0 disables)
+        self.summarizer = SummarizerAgent(
+            stage_llms.get("summarizer", llm),
+            chunk_tokens=summary_chunk_tokens,
+            max_concurrency=summary_max_concurrency
+        ) if summary_chunk_tokens else None
+        if text_window is not None:
+            # The windowed text is already bounded, so the Analyzer sees all of it
+            self.analyzer.text_limit = None
+        for agent in (self.planner, self.analyzer, self.executor, self.navigator):
+            agent.context_encoder.token_budget = context_token_budget
+            agent.json_mode = json_mode
+            # Escalating to the model the stage already runs on would only repeat the call
+            if escalation_llm is not None and _model_name(escalation_llm) != _model_name(agent.llm):
+                agent.escalation_llm = escalation_llm
         self.conversation_history: List[Dict] = []
+        self.max_history: Optional[int] = None
+        # Bumped on every save to the session backend; a stored state is only loaded when newer
+        self.state_version = 0
+        # What the Planner sees of the conversation: recent turns plus a running summary
+        self.conversation_memory = ConversationMemory(
+            llm=llm if memory_summarize else None,
+            recent_messages=memory_recent_messages,
+            token_budget=memory_token_budget
+        )
     
-    def process_task(self, task: str, page_data: Dict, chat_history: Optional[List[Dict]] = None) -> Dict[str, Any]:
+    def process_task(self, task: str, page_data: Dict, chat_history: Optional[List[Dict]] = None,
+                     page_ref: Optional[str] = None, pipeline_mode: Optional[str] = None) -> Dict[str, Any]:
         """
         Process a task through the multi-agent pipeline
         
@@ -289,28 +806,515 @@ class HybridMultiAgentSystem:
             task: User's task/question
             page_data: Current page context
             chat_history: Previous conversation for context
+            page_ref: Snapshot ref of page_data, so work derived from the page is reused
+            pipeline_mode: Mode for this request, overriding the system's pipeline_mode
             
         Returns:
             Dict with understanding, actions, result, and agent_insights
         """
         
-        # Add chat history to context
-        context = page_data.copy()
-        if chat_history:
-            context['chat_history'] = chat_history[-5:]  # Last 5 messages
+        begin_request_report()
+        mode = self._resolve_mode(pipeline_mode)
+        fingerprint = self._fingerprint(page_data, page_ref)
+        page_data, page_elements = self._prepare_page(task, page_data, page_ref)
+        routed = self._route(task, page_data, page_elements)
+        if routed is not None:
+            return routed
+        
+        context = self._build_context(page_data, chat_history)
+        
+        if mode == "fused":
+            key, fused = self._cache_lookup("navigator", task, fingerprint, *self._history_inputs(context))
+            if fused is None:
+                print(f"[Navigator] Planning and generating actions in one call for: {task}")
+                fused = self.navigator.run(task, context)
+                if fused is not None:
+                    self._cache_store(key, fused)
+            if self._fused_ok(fused):
+                plan, analysis, actions, result_message = self.navigator.split(fused)
+                actions = self._validate_actions(task, page_data, page_elements, actions)
+                return self._compile_result(task, page_data, plan, analysis, actions, result_message)
         
         # Step 1: Planner creates strategic plan
         print(f"[Planner] Creating plan for: {task}")
-        plan = self.planner.create_plan(task, context)
+        key, plan = self._cache_lookup("planner", task, fingerprint, *self._history_inputs(context))
+        if plan is None:
+            plan, parse_ok = self.planner.create_plan(task, context)
+            self._cache_store(key, plan, parse_ok)
         
         # Step 2: Analyzer examines page and identifies elements
         print(f"[Analyzer] Analyzing page...")
-        analysis = self.analyzer.analyze_page(page_data, plan)
+        key, analysis = self._cache_lookup("analyzer", task, fingerprint, plan)
+        if analysis is None:
+            analysis, parse_ok = self.analyzer.analyze_page(page_data, plan)
+            self._cache_store(key, analysis, parse_ok)
         
         # Step 3: Executor generates actions
         print(f"[Executor] Generating actions...")
-        actions, result_message = self.executor.generate_actions(analysis, plan)
+        key, cached = self._cache_lookup("executor", task, fingerprint, plan, analysis,
+                                         *self._history_inputs(context))
+        if cached is None:
+            actions, result_message, parse_ok = self.executor.generate_actions(analysis, plan)
+            self._cache_store(key, [actions, result_message], parse_ok)
+        else:
+            actions, result_message = cached
+        
+        actions = self._validate_actions(task, page_data, page_elements, actions)
+        return self._compile_result(task, page_data, plan, analysis, actions, result_message)
+    
+    async def aprocess_task(self, task: str, page_data: Dict, chat_history: Optional[List[Dict]] = None,
+                            page_ref: Optional[str] = None, pipeline_mode: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Async variant of process_task
+        
+        Each stage awaits the LLM, so concurrent sessions overlap their
+        LLM waits instead of blocking the event loop. In speculative mode
+        the Analyzer surveys the page while the Planner is still running.
+        """
+        begin_request_report()
+        mode = self._resolve_mode(pipeline_mode)
+        fingerprint = self._fingerprint(page_data, page_ref)
+        summarized = await self._asummarize(task, page_data, fingerprint)
+        if summarized is not None:
+            return summarized
+        page_data, page_elements = self._prepare_page(task, page_data, page_ref)
+        routed = self._route(task, page_data, page_elements)
+        if routed is not None:
+            return routed
+        
+        context = self._build_context(page_data, chat_history)
+        
+        if mode == "fused":
+            key, fused = self._cache_lookup("navigator", task, fingerprint, *self._history_inputs(context))
+            if fused is None:
+                print(f"[Navigator] Planning and generating actions in one call for: {task}")
+                fused = await self.navigator.arun(task, context)
+                if fused is not None:
+                    self._cache_store(key, fused)
+            if self._fused_ok(fused):
+                plan, analysis, actions, result_message = self.navigator.split(fused)
+                actions = await self._avalidate_actions(task, page_data, page_elements, actions)
+                return self._compile_result(task, page_data, plan, analysis, actions, result_message)
+        
+        survey = None
+        try:
+            # Step 1: Planner creates strategic plan (Analyzer may start alongside)
+            print(f"[Planner] Creating plan for: {task}")
+            key, plan = self._cache_lookup("planner", task, fingerprint, *self._history_inputs(context))
+            if plan is None:
+                survey = self._start_survey(task, page_data, mode)
+                plan, parse_ok = await self.planner.acreate_plan(task, context)
+                self._cache_store(key, plan, parse_ok)
+            
+            # Step 2: Analyzer examines page and identifies elements
+            print("[Analyzer] Analyzing page...")
+            key, analysis = self._cache_lookup("analyzer", task, fingerprint, plan)
+            if analysis is None:
+                analysis, parse_ok = await self._aresolve_analysis(page_data, plan, survey)
+                self._cache_store(key, analysis, parse_ok)
+        finally:
+            # An unused survey (cache hit, failed plan, cancelled request) must not hold model capacity
+            if survey is not None and not survey.done():
+                survey.cancel()
         
+        # Step 3: Executor generates actions
+        print("[Executor] Generating actions...")
+        key, cached = self._cache_lookup("executor", task, fingerprint, plan, analysis,
+                                         *self._history_inputs(context))
+        if cached is None:
+            actions, result_message, parse_ok = await self.executor.agenerate_actions(analysis, plan)
+            self._cache_store(key, [actions, result_message], parse_ok)
+        else:
+            actions, result_message = cached
+        
+        actions = await self._avalidate_actions(task, page_data, page_elements, actions)
+        return self._compile_result(task, page_data, plan, analysis, actions, result_message)
+    
+    async def astream_task(self, task: str, page_data: Dict, chat_history: Optional[List[Dict]] = None,
+                           page_ref: Optional[str] = None,
+                           pipeline_mode: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Stream a task through the pipeline as a sequence of events
+        
+        Yields:
+            {"event": "stage_start", "stage": ...} before each agent runs,
+            {"event": "stage_end", "stage": ..., "elapsed_ms": ..., "output": ...} after it,
+            {"event": "token", "text": ...} for each piece of the Executor's result,
+            {"event": "result", "data": ...} with the compiled result at the end
+        
+        In fused mode a single "navigator" stage replaces the three agents. If
+        its output stays invalid the agents run after all, so result tokens
+        already streamed are superseded by the final result event.
+        """
+        begin_request_report()
+        mode = self._resolve_mode(pipeline_mode)
+        fingerprint = self._fingerprint(page_data, page_ref)
+        summarized = await self._asummarize(task, page_data, fingerprint)
+        if summarized is not None:
+            yield {"event": "token", "text": summarized["result"]}
+            yield {"event": "result", "data": summarized}
+            return
+        page_data, page_elements = self._prepare_page(task, page_data, page_ref)
+        routed = self._route(task, page_data, page_elements)
+        if routed is not None:
+            yield {"event": "token", "text": routed["result"]}
+            yield {"event": "result", "data": routed}
+            return
+        
+        context = self._build_context(page_data, chat_history)
+        
+        if mode == "fused":
+            yield {"event": "stage_start", "stage": "navigator"}
+            started = time.perf_counter()
+            key, fused = self._cache_lookup("navigator", task, fingerprint, *self._history_inputs(context))
+            if fused is None:
+                print(f"[Navigator] Planning and generating actions in one call for: {task}")
+                async for update in self.navigator.astream_run(task, context):
+                    if "token" in update:
+                        yield {"event": "token", "text": update["token"]}
+                    else:
+                        fused = update["data"]
+                if fused is not None:
+                    self._cache_store(key, fused)
+            else:
+                yield {"event": "token", "text": fused["result"]}
+            yield {"event": "stage_end", "stage": "navigator", "elapsed_ms": _elapsed_ms(started),
+                   "output": {"valid": fused is not None}}
+            if self._fused_ok(fused):
+                plan, analysis, actions, result_message = self.navigator.split(fused)
+                if self.validator is not None and actions:
+                    yield {"event": "stage_start", "stage": "validator"}
+                    started = time.perf_counter()
+                    actions = await self._avalidate_actions(task, page_data, page_elements, actions)
+                    yield {"event": "stage_end", "stage": "validator", "elapsed_ms": _elapsed_ms(started),
+                           "output": {"actions_kept": len(actions)}}
+                yield {"event": "result", "data": self._compile_result(task, page_data, plan, analysis,
+                                                                       actions, result_message)}
+                return
+        
+        survey = None
+        try:
+            # Step 1: Planner creates strategic plan
+            print(f"[Planner] Creating plan for: {task}")
+            yield {"event": "stage_start", "stage": "planner"}
+            started = time.perf_counter()
+            key, plan = self._cache_lookup("planner", task, fingerprint, *self._history_inputs(context))
+            if plan is None:
+                survey = self._start_survey(task, page_data, mode)
+                if survey is not None:
+                    yield {"event": "stage_start", "stage": "analyzer", "speculative": True}
+                plan, parse_ok = await self.planner.acreate_plan(task, context)
+                self._cache_store(key, plan, parse_ok)
+            yield {"event": "stage_end", "stage": "planner", "elapsed_ms": _elapsed_ms(started), "output": plan}
+            
+            # Step 2: Analyzer examines page and identifies elements
+            print("[Analyzer] Analyzing page...")
+            if survey is None:
+                yield {"event": "stage_start", "stage": "analyzer"}
+                started = time.perf_counter()
+            key, analysis = self._cache_lookup("analyzer", task, fingerprint, plan)
+            if analysis is None:
+                analysis, parse_ok = await self._aresolve_analysis(page_data, plan, survey)
+                self._cache_store(key, analysis, parse_ok)
+            yield {"event": "stage_end", "stage": "analyzer", "elapsed_ms": _elapsed_ms(started), "output": analysis}
+        finally:
+            # Also runs when the client disconnects and the stream is closed mid-way
+            if survey is not None and not survey.done():
+                survey.cancel()
+        
+        # Step 3: Executor streams actions and result tokens
+        print("[Executor] Generating actions...")
+        yield {"event": "stage_start", "stage": "executor"}
+        started = time.perf_counter()
+        actions, result_message, parse_ok = [], "Unable to generate actions", False
+        key, cached = self._cache_lookup("executor", task, fingerprint, plan, analysis,
+                                         *self._history_inputs(context))
+        if cached is None:
+            async for update in self.executor.astream_actions(analysis, plan):
+                if "token" in update:
+                    yield {"event": "token", "text": update["token"]}
+                else:
+                    actions, result_message, parse_ok = update["actions"], update["result"], update["parse_ok"]
+            self._cache_store(key, [actions, result_message], parse_ok)
+        else:
+            actions, result_message = cached
+            yield {"event": "token", "text": result_message}
+        yield {"event": "stage_end", "stage": "executor", "elapsed_ms": _elapsed_ms(started),
+               "output": {"actions_generated": len(actions)}}
+        
+        # Step 4: Validator checks the actions before they reach the page
+        if self.validator is not None and actions:
+            yield {"event": "stage_start", "stage": "validator"}
+            started = time.perf_counter()
+            actions = await self._avalidate_actions(task, page_data, page_elements, actions)
+            yield {"event": "stage_end", "stage": "validator", "elapsed_ms": _elapsed_ms(started),
+                   "output": {"actions_kept": len(actions)}}
+        
+        result = self._compile_result(task, page_data, plan, analysis, actions, result_message)
+        yield {"event": "result", "data": result}
+    
+    def _prepare_page(self, task: str, page_data: Dict,
+                      page_ref: Optional[str] = None) -> Tuple[Dict, List[Dict[str, Any]]]:
+        """
+        Dedupe, prune and rank the page's elements and window its text for this task
+        
+        Returns:
+            (prepared page, every element left after pruning, in page order)
+        """
+        elements = page_data.get('interactiveElements') or []
+        if 'error' in page_data:
+            return page_data, elements
+        report = get_request_report()
+        prepared = page_data
+        
+        if self.preprocessor is not None:
+            # Pruning does not depend on the task, so it is done once per snapshot
+            pruned, stats = self._snapshot_artifact(page_ref, "pruned_page", lambda: self.preprocessor.prune(page_data))
+            prepared = self.preprocessor.select(pruned, task)
+            elements = pruned['interactiveElements']
+            stats = dict(stats, elements_out=len(prepared['interactiveElements']))
+            print(f"[Preprocessor] {stats['elements_in']} → {stats['elements_out']} elements")
+            if report is not None:
+                report["page_preprocessing"] = stats
+        
+        if self.text_window is not None:
+            # Likewise the passages; only their selection depends on the task
+            passages = self._snapshot_artifact(page_ref, "text_passages",
+                                               lambda: self.text_window.passages(page_data.get('text', '')))
+            text, stats = self.text_window.select(passages, task)
+            prepared = dict(prepared, text=text)
+            print(f"[TextWindow] {stats['tokens_in']} → {stats['tokens_out']} text tokens")
+            if report is not None:
+                report["text_window"] = stats
+        
+        return prepared, elements
+    
+    async def _asummarize(self, task: str, page_data: Dict, fingerprint: Optional[str]) -> Optional[Dict[str, Any]]:
+        """
+        Answer a summarization task on a long page with a map-reduce summary
+        
+        Async paths only. Returns None (the task goes on to the router and
+        pipeline) for other tasks, short pages, or when summarization fails.
+        """
+        classifier = self.router or _DEFAULT_CLASSIFIER
+        if (self.summarizer is None or 'error' in page_data
+                or classifier.classify(task) != "summary" or ACTION_PATTERN.search(task.lower())
+                or not self.summarizer.needs_map_reduce(page_data.get('text', ''))):
+            return None
+        
+        started = time.perf_counter()
+        key, summary = self._cache_lookup("summarizer", task, fingerprint)
+        stats: Dict[str, Any] = {}
+        if summary is None:
+            try:
+                summary, stats = await self.summarizer.asummarize(task, page_data)
+            except Overloaded:
+                raise
+            except Exception as e:
+                print(f"[Summarizer] Map-reduce summary failed, falling back: {e}")
+                return None
+            if not summary:
+                return None
+            self._cache_store(key, summary)
+        
+        report = get_request_report()
+        if report is not None:
+            report["routing"] = {"intent": "summary", "route": "map_reduce", "reason": "page text exceeds one chunk"}
+            report["summarization"] = dict(stats, elapsed_ms=_elapsed_ms(started))
+        result = {
+            "understanding": "User wants a summary of this page",
+            "actions": [],
+            "result": f"Summary of {page_data.get('title') or 'this page'}:\n\n{summary}",
+            "agent_insights": finish_request_report()
+        }
+        self._record_history(task, result)
+        return result
+    
+    def _snapshot_artifact(self, page_ref: Optional[str], name: str, factory):
+        """Value derived from the page, cached on its snapshot when there is one"""
+        if page_ref is None or self.snapshots is None:
+            return factory()
+        return self.snapshots.artifact(page_ref, name, factory)
+    
+    def _route(self, task: str, page_data: Dict, page_elements: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        """
+        Answer the task from page data when the router allows it, otherwise return None
+        
+        The router reads page_elements, every element left after pruning in
+        page order, so extracted headlines come top to bottom rather than
+        in task-relevance order from the top-k selection.
+        """
+        if self.router is None:
+            return None
+        
+        decision = self.router.route(task, dict(page_data, interactiveElements=page_elements))
+        print(f"[Router] {decision['intent']} → {decision['route']} ({decision['reason']})")
+        routing = {key: value for key, value in decision.items() if key not in ("result", "understanding")}
+        report = get_request_report()
+        if report is not None:
+            report["routing"] = routing
+        if decision["route"] != "fast_path":
+            return None
+        
+        result = {
+            "understanding": decision["understanding"],
+            "actions": [],
+            "result": decision["result"],
+            "agent_insights": finish_request_report()
+        }
+        self._record_history(task, result)
+        return result
+    
+    def _fingerprint(self, page_data: Dict, page_ref: Optional[str] = None) -> Optional[str]:
+        """Fingerprint of the uploaded page for cache keys, or None when caching is disabled"""
+        if self.cache is None:
+            return None
+        return self._snapshot_artifact(page_ref, "fingerprint", lambda: page_fingerprint(page_data))
+    
+    def _cache_lookup(self, stage: str, task: str, fingerprint: Optional[str], *inputs: Any):
+        """
+        Look up a stage output in the response cache
+        
+        Returns:
+            (key, value) - key is None when caching is disabled, value is None on a miss
+        """
+        if self.cache is None:
+            return None, None
+        agent = getattr(self, stage)
+        # The escalation model can produce the output too when the stage's JSON is invalid
+        models = [_llm_identity(llm) for llm in (agent.llm, agent.escalation_llm) if llm is not None]
+        key = ResponseCache.make_key(stage, task, fingerprint, *inputs, model="+".join(models))
+        value = self.cache.get(stage, key)
+        report = get_request_report()
+        if report is not None:
+            report.setdefault("cache", {})[stage] = "hit" if value is not None else "miss"
+        if value is not None:
+            print(f"[{stage.capitalize()}] Cache hit")
+        return key, value
+    
+    def _cache_store(self, key: Optional[str], value: Any, parse_ok: bool = True):
+        """Store a stage output when caching is enabled; fallback output is never cached"""
+        if key is not None and parse_ok:
+            self.cache.set(key, value)
+    
+    @staticmethod
+    def _history_inputs(context: Dict) -> Tuple[Dict[str, Any], ...]:
+        """Conversation fields of a stage's context as extra cache key inputs (none for a fresh session)"""
+        _, conversation = split_context(context)
+        return (conversation,) if conversation else ()
+    
+    def _validate_actions(self, task: str, page_data: Dict, page_elements: List[Dict[str, Any]],
+                          actions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Drop actions the validator rejects (unchanged when validation is off)
+        
+        Selectors are checked against page_elements, all elements left after
+        pruning, not only the top-ranked ones the agents saw.
+        """
+        if self.validator is None or not actions:
+            return actions
+        kept, stats = self.validator.validate(actions, page_data, task, elements=page_elements)
+        self._report_validation(stats)
+        return kept
+    
+    async def _avalidate_actions(self, task: str, page_data: Dict, page_elements: List[Dict[str, Any]],
+                                 actions: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Async variant of _validate_actions"""
+        if self.validator is None or not actions:
+            return actions
+        kept, stats = await self.validator.avalidate(actions, page_data, task, elements=page_elements)
+        self._report_validation(stats)
+        return kept
+    
+    @staticmethod
+    def _report_validation(stats: Dict[str, Any]):
+        report = get_request_report()
+        if report is not None:
+            report["validation"] = stats
+    
+    def _resolve_mode(self, pipeline_mode: Optional[str] = None) -> str:
+        """Pipeline mode for one request: the override when given, otherwise the system's mode"""
+        mode = pipeline_mode or self.pipeline_mode
+        if mode not in self.PIPELINE_MODES:
+            raise ValueError(f"Unknown pipeline mode: {mode}")
+        report = get_request_report()
+        if report is not None:
+            report["pipeline_mode"] = mode
+        return mode
+    
+    def _fused_ok(self, fused: Optional[Dict[str, Any]]) -> bool:
+        """Whether fused output can be used; otherwise the request falls back to the three agents"""
+        if fused is not None:
+            return True
+        print("[Navigator] Invalid fused output, falling back to the three-stage pipeline...")
+        record_fallback(self.navigator.stage, "three_stage", parse_failure=True)
+        return False
+    
+    def _start_survey(self, task: str, page_data: Dict, mode: str) -> Optional[asyncio.Task]:
+        """Start the speculative Analyzer survey when running in speculative mode"""
+        if mode != "speculative":
+            return None
+        return asyncio.create_task(self.analyzer.asurvey_page(task, page_data))
+    
+    async def _aresolve_analysis(self, page_data: Dict, plan: Dict, survey: Optional[asyncio.Task]):
+        """
+        Use the speculative survey for the plan steps it covers and run the Analyzer on the rest
+        
+        The outcome (hit: survey covered every actionable step, partial: only
+        the missed steps were analyzed, rerun: the whole plan was) goes to the
+        request report and the agent_speculation_total metric.
+        
+        Returns:
+            (analysis, parse_ok)
+        """
+        if survey is None:
+            return await self.analyzer.aanalyze_page(page_data, plan)
+        
+        try:
+            surveyed, survey_ok = await survey
+        except Exception as e:
+            print(f"[Analyzer] Speculative survey failed: {e}")
+            surveyed, survey_ok = None, False
+        reconciled, missing = self.analyzer.reconcile(surveyed, plan) if survey_ok else (None, None)
+        steps = plan.get('steps') or []
+        
+        if reconciled is not None and not missing:
+            self._report_speculation("hit", len(steps), 0)
+            return reconciled, True
+        
+        if reconciled is not None and reconciled["element_mapping"]:
+            print(f"[Analyzer] Survey missed {len(missing)} of {len(steps)} plan steps, analyzing those...")
+            self._report_speculation("partial", len(steps), len(missing))
+            extra, parse_ok = await self.analyzer.aanalyze_page(page_data, dict(plan, steps=missing))
+            # Keep the mapping in plan order
+            order = {str(step): index for index, step in enumerate(steps)}
+            mapping = sorted(reconciled["element_mapping"] + (extra.get("element_mapping") or []),
+                             key=lambda entry: order.get(str(entry.get("step")), len(steps)))
+            return dict(reconciled, element_mapping=mapping), parse_ok
+        
+        print("[Analyzer] Plan not covered by speculative survey, re-analyzing...")
+        self._report_speculation("rerun", len(steps), len(steps))
+        return await self.analyzer.aanalyze_page(page_data, plan)
+    
+    @staticmethod
+    def _report_speculation(outcome: str, steps: int, reanalyzed: int):
+        SPECULATION.inc(outcome=outcome)
+        report = get_request_report()
+        if report is not None:
+            report["speculation"] = {"outcome": outcome, "plan_steps": steps, "steps_reanalyzed": reanalyzed}
+    
+    def _build_context(self, page_data: Dict, chat_history: Optional[List[Dict]] = None) -> Dict:
+        """Build the planner context from page data and the conversation so far"""
+        # Client-side history only fills a session the server has no memory of
+        if chat_history:
+            self.conversation_memory.seed(chat_history)
+        context = page_data.copy()
+        context.update(self.conversation_memory.window())
+        return context
+    
+    def _compile_result(self, task: str, page_data: Dict, plan: Dict, analysis: Dict,
+                        actions: List[Dict[str, Any]], result_message: str) -> Dict[str, Any]:
+        """Compile stage outputs into the final result and record it in history"""
         # Compile result with enhanced focus on actual content delivery
         result = {
             "understanding": plan.get("understanding", "Processing your request to extract relevant information..."),
@@ -332,14 +1336,27 @@ class HybridMultiAgentSystem:
             }
         }
         
-        # Store in conversation history
+        result["agent_insights"].update(finish_request_report())
+        if self.cache is not None:
+            result["agent_insights"]["cache"] = {
+                "this_request": result["agent_insights"].get("cache", {}),
+                "totals": self.cache.stats()
+            }
+        
+        self._record_history(task, result)
+        return result
+    
+    def _record_history(self, task: str, result: Dict[str, Any]):
+        """Store a result in conversation history"""
         self.conversation_history.append({
             "task": task,
             "result": result,
             "timestamp": None  # Will be added by API
         })
-        
-        return result
+        if self.max_history is not None and len(self.conversation_history) > self.max_history:
+            del self.conversation_history[:-self.max_history]
+        self.conversation_memory.add_turn(task, result.get("result", ""))
+        self.conversation_memory.schedule_compaction()
     
     def _extract_and_format_actual_headlines(self, result_message: str, page_data: Dict, task: str) -> str:
         """
@@ -366,6 +1383,7 @@ class HybridMultiAgentSystem:
             
             # Format headlines if found
             if headlines:
+                record_fallback("result", "page_headlines")
                 formatted = "Top Headlines:\n"
                 for i, headline in enumerate(headlines[:5], 1):  # Limit to top 5
                     formatted += f"{i}. {headline}\n"
@@ -373,6 +1391,7 @@ class HybridMultiAgentSystem:
         
         # For other content extraction tasks, try to provide meaningful response
         if any(keyword in task_lower for keyword in ['content', 'summary', 'information', 'about']):
+            record_fallback("result", "content_placeholder")
             return "I'm analyzing the page content to extract the specific information you requested."
             
         # Default enhancement
@@ -390,6 +1409,7 @@ class HybridMultiAgentSystem:
                 return result_message
             
         # Transform procedural descriptions into content-focused responses
+        record_fallback("result", "generic_enhancement")
         task_lower = task.lower()
         
         if 'news' in task_lower or 'headline' in task_lower:
@@ -405,19 +1425,90 @@ class HybridMultiAgentSystem:
             # Generic enhancement for other tasks
             return f"I'm working on your request: '{task}' to extract and deliver the specific content you're looking for."
     
+    def record_shared_result(self, task: str, result: Dict[str, Any]) -> Dict[str, Any]:
+        """Adopt a result computed by another session's run of the same task (single-flight)"""
+        shared = dict(result, agent_insights=dict(result.get("agent_insights") or {}, coalesced=True))
+        self._record_history(task, shared)
+        return shared
+    
     def get_conversation_history(self) -> List[Dict]:
         """Get conversation history"""
         return self.conversation_history
     
+    def set_memory_cap(self, max_messages: int):
+        """Cap conversation history and each agent's memory at max_messages entries"""
+        self.max_history = max_messages
+        del self.conversation_history[:-max_messages]
+        for agent in (self.planner, self.analyzer, self.executor, self.navigator):
+            agent.max_memory = max_messages
+            del agent.memory[:-max_messages]
+    
     def clear_history(self):
         """Clear conversation history"""
         self.conversation_history = []
+        self.conversation_memory.clear()
         self.planner.clear_memory()
         self.analyzer.clear_memory()
         self.executor.clear_memory()
+        self.navigator.clear_memory()
+    
+    def export_state(self) -> Dict[str, Any]:
+        """JSON-compatible session state: version, conversation history and memory, agent memories"""
+        return {
+            "version": self.state_version,
+            "conversation_history": list(self.conversation_history),
+            "conversation_memory": self.conversation_memory.to_dict(),
+            "agent_memory": {
+                agent.stage: [asdict(message) for message in agent.memory]
+                for agent in (self.planner, self.analyzer, self.executor, self.navigator)
+            }
+        }
+    
+    def load_state(self, state: Dict[str, Any]):
+        """Replace session state with one produced by export_state()"""
+        self.state_version = state.get("version", 0)
+        self.conversation_history = list(state.get("conversation_history") or [])
+        self.conversation_memory.load_dict(state.get("conversation_memory") or {})
+        agent_memory = state.get("agent_memory") or {}
+        for agent in (self.planner, self.analyzer, self.executor, self.navigator):
+            agent.memory = [AgentMessage(**message) for message in agent_memory.get(agent.stage, [])]
+        if self.max_history is not None:
+            self.set_memory_cap(self.max_history)
 
 
-def create_hybrid_system(api_key: str, model: str = "gpt-4", base_url: Optional[str] = None) -> HybridMultiAgentSystem:
+def _model_name(llm: Any) -> str:
+    """Model name of a chat model, for logs and reports"""
+    return getattr(llm, 'model_name', None) or getattr(llm, 'model', None) or type(llm).__name__
+
+
+def _llm_identity(llm: Any) -> str:
+    """Model name and API base URL of a chat model, for cache keys"""
+    return f"{_model_name(llm)}@{getattr(llm, 'openai_api_base', None) or ''}"
+
+
+def _elapsed_ms(started: float) -> float:
+    """Milliseconds elapsed since a perf_counter timestamp"""
+    return round((time.perf_counter() - started) * 1000, 1)
+
+
+def create_hybrid_system(api_key: str, model: str = "gpt-4", base_url: Optional[str] = None,
+                         pipeline_mode: str = "sequential", context_token_budget: int = 1200,
+                         cache: Optional[ResponseCache] = None,
+                         router: Optional[IntentRouter] = None,
+                         json_mode: bool = False,
+                         preprocessor: Optional[PagePreprocessor] = None,
+                         snapshots: Optional[SnapshotStore] = None,
+                         memory_token_budget: int = 600,
+                         memory_recent_messages: int = 6,
+                         memory_summarize: bool = True,
+                         stage_models: Optional[Dict[str, str]] = None,
+                         escalation_model: Optional[str] = None,
+                         text_window: Optional[TextWindow] = None,
+                         summary_chunk_tokens: int = 800,
+                         summary_max_concurrency: int = 4,
+                         action_validation: str = "off",
+                         validator_model: Optional[str] = None,
+                         validation_max_concurrency: int = 4) -> HybridMultiAgentSystem:
     """
     Factory function to create a hybrid multi-agent system
     
@@ -425,21 +1516,60 @@ def create_hybrid_system(api_key: str, model: str = "gpt-4", base_url: Optional[
         api_key: OpenAI API key (or compatible)
         model: Model name to use for the agent system
         base_url: Optional custom base URL for API
+        pipeline_mode: "sequential", "speculative" (Analyzer overlaps the Planner) or "fused"
+            (one Navigator call returns plan, element mapping and actions)
+        context_token_budget: Token budget for the context block of each agent prompt
+        cache: Optional response cache shared across sessions
+        router: Optional intent router that answers extractable tasks without the LLM
+        json_mode: Request JSON output mode (response_format) from the server
+        preprocessor: Optional page preprocessor that dedupes and ranks elements per task
+        snapshots: Optional page snapshot store holding per-page derived data
+        memory_token_budget: Token budget for the conversation context given to the Planner
+        memory_recent_messages: Messages kept verbatim before they are summarized
+        memory_summarize: Summarize older turns with the LLM (extractive digest otherwise)
+        stage_models: Optional model per stage ("planner", "analyzer", "executor", "navigator", "summarizer");
+            others use model
+        escalation_model: Optional bigger model that retries a stage whose JSON output stays invalid
+        text_window: Optional token-budgeted window that keeps the page text relevant to the task
+        summary_chunk_tokens: Chunk size for map-reduce summaries of long pages (0 disables them)
+        summary_max_concurrency: Chunks summarized at the same time
+        action_validation: "off", "precheck" (deterministic checks only), "batch" (ambiguous
+            actions validated in one model call) or "concurrent" (one call per action)
+        validator_model: Model that validates actions (default: model)
+        validation_max_concurrency: Validation calls at the same time in concurrent mode
         
     Returns:
         Configured HybridMultiAgentSystem
     """
     
-    llm_kwargs = {
-        "api_key": api_key,
-        "model": model,  # Now this will be the chat model specifically
-        "temperature": 0.7,
-        "max_tokens": 1500
-    }
-    
-    if base_url:
-        llm_kwargs["base_url"] = base_url
+    # Clients are shared across sessions that use the same model and server
+    def llm_for(model_name: str):
+        return get_llm_registry().get(
+            api_key=api_key,
+            model=model_name,
+            base_url=base_url,
+            temperature=0.7,
+            max_tokens=1500
+        )
     
-    llm = ChatOpenAI(**llm_kwargs)
+    llm = llm_for(model)  # Now this will be the chat model specifically
+    stage_llms = {stage: llm_for(name) for stage, name in (stage_models or {}).items() if name and name != model}
+    escalation_llm = llm_for(escalation_model) if escalation_model else None
+    validator = None
+    if action_validation != "off":
+        chains = None
+        if action_validation != "precheck":
+            from chains.reasoning_chains import ReasoningChains
+            chains = ReasoningChains(llm_for(validator_model or model))
+        validator = ActionValidator(chains, mode=action_validation, max_concurrency=validation_max_concurrency)
     
-    return HybridMultiAgentSystem(llm)
+    return HybridMultiAgentSystem(llm, pipeline_mode=pipeline_mode, context_token_budget=context_token_budget,
+                                  cache=cache, router=router, json_mode=json_mode,
+                                  preprocessor=preprocessor, snapshots=snapshots,
+                                  memory_token_budget=memory_token_budget,
+                                  memory_recent_messages=memory_recent_messages,
+                                  memory_summarize=memory_summarize,
+                                  stage_llms=stage_llms, escalation_llm=escalation_llm,
+                                  text_window=text_window, summary_chunk_tokens=summary_chunk_tokens,
+                                  summary_max_concurrency=summary_max_concurrency,
+                                  validator=validator)
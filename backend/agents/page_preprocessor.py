@@ -0,0 +1,180 @@
+"""
+Page-data preprocessing
+Dedupes, prunes and ranks interactiveElements by relevance to the task so
+each agent sees the elements that matter instead of the first few on the page
+"""
+
+from typing import Any, Dict, List, Set, Tuple
+import re
+
+
+_STOPWORDS = {
+    'a', 'an', 'the', 'and', 'or', 'of', 'to', 'in', 'on', 'for', 'with', 'is', 'are', 'was',
+    'be', 'this', 'that', 'it', 'me', 'my', 'i', 'you', 'your', 'what', 'which', 'please',
+    'can', 'could', 'would', 'from', 'at', 'by', 'as', 'page', 'here', 'there'
+}
+
+_INPUT_TYPES = {'input', 'textarea', 'select'}
+_HEADING_TYPES = {'h1', 'h2', 'h3', 'h4'}
+_INPUT_INTENT = re.compile(r'\b(search|type|fill|enter|write|find|look ?up|query|log ?in|sign ?in|email|password)\b')
+_HEADING_INTENT = re.compile(r'\b(headlines?|news|stor(y|ies)|articles?|breaking|titles?)\b')
+
+_ATTRIBUTE_KEYS = ('id', 'name', 'placeholder', 'href', 'value', 'class', 'aria-label', 'title')
+
+
+def _terms(text: str) -> Set[str]:
+    """Lowercased word stems, minus stopwords"""
+    terms = set()
+    for word in re.findall(r'[a-z0-9]+', text.lower()):
+        if word in _STOPWORDS or len(word) < 2:
+            continue
+        terms.add(word[:-1] if len(word) > 3 and word.endswith('s') else word)
+    return terms
+
+
+def _attributes(element: Dict[str, Any]) -> Dict[str, Any]:
+    """Element attributes, whether nested under 'attributes' or at the top level"""
+    attributes = dict(element.get('attributes') or {})
+    for key in _ATTRIBUTE_KEYS:
+        if key not in attributes and element.get(key):
+            attributes[key] = element[key]
+    return attributes
+
+
+def _is_visible(element: Dict[str, Any]) -> bool:
+    position = element.get('position')
+    if isinstance(position, dict) and 'width' in position and 'height' in position:
+        try:
+            if float(position['width']) <= 0 or float(position['height']) <= 0:
+                return False
+        except (TypeError, ValueError):
+            pass
+    return _attributes(element).get('type') != 'hidden'
+
+
+def _is_empty(element: Dict[str, Any]) -> bool:
+    """No text and nothing else to identify or describe the element"""
+    if (element.get('text') or '').strip():
+        return False
+    if element.get('type') in _INPUT_TYPES:
+        return False
+    attributes = _attributes(element)
+    return not any(attributes.get(key) for key in ('id', 'name', 'placeholder', 'href', 'aria-label', 'title'))
+
+
+def _identity(element: Dict[str, Any]) -> Tuple:
+    attributes = _attributes(element)
+    return (
+        element.get('type'),
+        ' '.join((element.get('text') or '').split()).lower(),
+        attributes.get('href') or '',
+        attributes.get('name') or attributes.get('id') or ''
+    )
+
+
+class PagePreprocessor:
+    """
+    Cleans page data before it reaches the agents
+    
+    Elements are deduplicated, invisible and empty ones are dropped, and the
+    rest are ranked by a lexical overlap score with the task (text matches
+    weigh more than attribute matches, with small priors for inputs on
+    search-style tasks and headings on news-style tasks). Only the top_k
+    elements are kept; ties keep their page order.
+    """
+    
+    def __init__(self, top_k: int = 20, max_links: int = 20):
+        self.top_k = top_k
+        self.max_links = max_links
+    
+    def process(self, page_data: Dict[str, Any], task: str) -> Tuple[Dict[str, Any], Dict[str, int]]:
+        """
+        Returns:
+            (processed page data, stats on what was dropped)
+        """
+        pruned, stats = self.prune(page_data)
+        processed = self.select(pruned, task)
+        return processed, dict(stats, elements_out=len(processed['interactiveElements']))
+    
+    def prune(self, page_data: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, int]]:
+        """
+        Task-independent half of process(): dedupe and drop invisible and
+        empty elements, dedupe links and forms
+        """
+        elements = [e for e in page_data.get('interactiveElements') or [] if isinstance(e, dict)]
+        stats = {"elements_in": len(elements), "duplicates": 0, "invisible": 0, "empty": 0}
+        
+        kept: List[Dict[str, Any]] = []
+        seen = set()
+        for element in elements:
+            # Elements with their own selector are distinct targets even when their
+            # text repeats ("Add to cart" on every product); only selector-less
+            # ones fall back to type, text and attributes
+            identity = element.get('selector') or _identity(element)
+            if identity in seen:
+                stats["duplicates"] += 1
+                continue
+            seen.add(identity)
+            if not _is_visible(element):
+                stats["invisible"] += 1
+                continue
+            if _is_empty(element):
+                stats["empty"] += 1
+                continue
+            kept.append(element)
+        
+        pruned = dict(page_data)
+        pruned['interactiveElements'] = kept
+        if page_data.get('links'):
+            pruned['links'] = self._dedupe_links(page_data['links'])[:self.max_links]
+        if page_data.get('forms'):
+            pruned['forms'] = list({
+                (form.get('selector') or repr(form)): form for form in page_data['forms'] if isinstance(form, dict)
+            }.values())
+        return pruned, stats
+    
+    def select(self, pruned_page: Dict[str, Any], task: str) -> Dict[str, Any]:
+        """Task-dependent half of process(): keep the top_k elements for the task"""
+        selected = dict(pruned_page)
+        selected['interactiveElements'] = self.rank(pruned_page.get('interactiveElements') or [], task)[:self.top_k]
+        return selected
+    
+    def rank(self, elements: List[Dict[str, Any]], task: str) -> List[Dict[str, Any]]:
+        """Sort elements by relevance to the task, keeping page order for ties"""
+        task_terms = _terms(task)
+        wants_input = bool(_INPUT_INTENT.search(task.lower()))
+        wants_headings = bool(_HEADING_INTENT.search(task.lower()))
+        
+        scored = [
+            (self.score(element, task_terms, wants_input, wants_headings), -index, element)
+            for index, element in enumerate(elements)
+        ]
+        scored.sort(key=lambda item: (item[0], item[1]), reverse=True)
+        return [element for _, _, element in scored]
+    
+    @staticmethod
+    def score(element: Dict[str, Any], task_terms: Set[str], wants_input: bool = False,
+              wants_headings: bool = False) -> float:
+        """Lexical overlap score of an element with the task terms"""
+        text_terms = _terms(element.get('text') or '')
+        attributes = _attributes(element)
+        attribute_terms = _terms(' '.join(str(attributes.get(key) or '') for key in _ATTRIBUTE_KEYS))
+        attribute_terms |= _terms(element.get('selector') or '')
+        
+        score = 2.0 * len(task_terms & text_terms) + 1.0 * len(task_terms & (attribute_terms - text_terms))
+        element_type = element.get('type')
+        if wants_input and element_type in _INPUT_TYPES:
+            score += 1.5
+        if wants_headings and element_type in _HEADING_TYPES:
+            score += 1.5
+        if element_type == 'button':
+            score += 0.2
+        return score
+    
+    @staticmethod
+    def _dedupe_links(links: List[Any]) -> List[Dict[str, Any]]:
+        unique: Dict[str, Dict[str, Any]] = {}
+        for link in links:
+            if isinstance(link, dict) and link.get('href') and link['href'] not in unique:
+                unique[link['href']] = link
+        return list(unique.values())
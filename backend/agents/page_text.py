@@ -0,0 +1,114 @@
+"""
+Page text processing
+Splits page text into passages and keeps the ones most relevant to the task
+within a token budget, so long pages cost a bounded number of tokens per call
+"""
+
+from typing import Any, Dict, List, Tuple
+import re
+
+from agents.context_encoder import count_tokens
+from agents.page_preprocessor import _terms
+
+
+_SENTENCE_END = re.compile(r'(?<=[.!?])\s+|\n+')
+
+
+def split_passages(text: str, max_tokens: int = 60) -> List[str]:
+    """
+    Split text into passages of whole sentences, each at most max_tokens
+    
+    Sentences longer than max_tokens are cut at word boundaries.
+    """
+    passages: List[str] = []
+    current: List[str] = []
+    current_tokens = 0
+    
+    for sentence in _SENTENCE_END.split(text or ''):
+        sentence = ' '.join(sentence.split())
+        if not sentence:
+            continue
+        tokens = count_tokens(sentence)
+        if tokens > max_tokens:
+            if current:
+                passages.append(' '.join(current))
+                current, current_tokens = [], 0
+            passages.extend(_split_words(sentence, max_tokens))
+            continue
+        if current and current_tokens + tokens > max_tokens:
+            passages.append(' '.join(current))
+            current, current_tokens = [], 0
+        current.append(sentence)
+        current_tokens += tokens + 1
+    
+    if current:
+        passages.append(' '.join(current))
+    return passages
+
+
+def _split_words(sentence: str, max_tokens: int) -> List[str]:
+    words = sentence.split()
+    # ~4 characters per token, ~5 characters per word
+    step = max(1, max_tokens * 4 // 5)
+    return [' '.join(words[i:i + step]) for i in range(0, len(words), step)]
+
+
+class TextWindow:
+    """
+    Token-budgeted window over page text
+    
+    Passages are scored by how many of the task's terms they contain (the
+    opening passage gets a small bonus, as it usually says what the page is
+    about) and the best ones are kept, in page order, until the budget is
+    spent. Tasks that share no terms with the page get its opening passages.
+    """
+    
+    def __init__(self, token_budget: int = 300, passage_tokens: int = 60):
+        self.token_budget = token_budget
+        self.passage_tokens = passage_tokens
+    
+    def passages(self, text: str) -> List[str]:
+        """Passages of text (independent of the task, so callers may cache them per page)"""
+        return split_passages(text, self.passage_tokens)
+    
+    def select(self, passages: List[str], task: str) -> Tuple[str, Dict[str, int]]:
+        """
+        Best passages for task within the budget
+        
+        Returns:
+            (text, stats) - skipped stretches are marked with "…"
+        """
+        sizes = [count_tokens(passage) for passage in passages]
+        stats = {"passages_in": len(passages), "tokens_in": sum(sizes)}
+        if stats["tokens_in"] <= self.token_budget:
+            return ' '.join(passages), dict(stats, passages_out=len(passages), tokens_out=stats["tokens_in"])
+        
+        task_terms = _terms(task)
+        scores = [len(task_terms & _terms(passage)) + (0.5 if index == 0 else 0)
+                  for index, passage in enumerate(passages)]
+        # Highest score first; among equals, earlier passages first
+        order = sorted(range(len(passages)), key=lambda index: (-scores[index], index))
+        
+        chosen: List[int] = []
+        spent = 0
+        for index in order:
+            if spent + sizes[index] > self.token_budget:
+                continue
+            chosen.append(index)
+            spent += sizes[index]
+        
+        parts: List[str] = []
+        previous = -1
+        for index in sorted(chosen):
+            if index != previous + 1:
+                parts.append("…")
+            parts.append(passages[index])
+            previous = index
+        if previous != len(passages) - 1:
+            parts.append("…")
+        return ' '.join(parts), dict(stats, passages_out=len(chosen), tokens_out=spent)
+    
+    def apply(self, page_data: Dict[str, Any], task: str) -> Tuple[Dict[str, Any], Dict[str, int]]:
+        """Copy of page_data whose text is the window for task"""
+        text, stats = self.select(self.passages(page_data.get('text') or ''), task)
+        return dict(page_data, text=text), stats
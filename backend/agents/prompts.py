@@ -0,0 +1,217 @@
+"""
+Prompt templates
+Every agent prompt is laid out static-first so model servers with prompt
+(KV) caching - Ollama, vLLM, OpenAI-style prefix caches - can reuse the
+longest possible prefix between calls:
+
+1. system message: the agent's fixed role, instructions, output format and
+   examples, identical for every call the agent makes
+2. page block: the page the agent works on, rendered deterministically with
+   the fields that do not depend on the task first
+3. per-call part: the task, upstream outputs and conversation
+"""
+
+from typing import TYPE_CHECKING, Any, Dict, List, Optional
+from dataclasses import dataclass
+
+if TYPE_CHECKING:
+    from langchain_core.messages import BaseMessage
+
+
+PLANNER_INSTRUCTIONS = """Create a strategic plan for the user's task on the webpage described in the message.
+Prioritize CONTENT EXTRACTION AND DELIVERY over procedural descriptions.
+
+When the task asks for information (news, content, summaries, etc.):
+1. Focus on identifying and extracting ACTUAL CONTENT from the page
+2. Plan how to gather and synthesize the requested information
+3. Think about how to present the information in a useful way
+
+Steps for content-focused planning:
+1. Content Identification: What specific information is available?
+2. Extraction Strategy: How to gather that information?
+3. Synthesis Approach: How to organize and present it?
+4. Delivery Method: How to communicate it clearly to the user?
+
+Respond in JSON format:
+{
+  "understanding": "...",
+  "approach": "...",
+  "steps": ["step1", "step2", ...],
+  "risks": ["risk1", "risk2", ...]
+}
+
+EXAMPLE GOOD RESPONSE FOR "WHAT ARE THE TOP NEWS HEADLINES":
+{
+  "understanding": "User wants actual news headlines from the current page",
+  "approach": "Extract headlines from visible news elements and present them as a numbered list",
+  "steps": [
+    "Identify headline elements (h1, h2, h3 tags)",
+    "Extract text content from those elements",
+    "Format as a clear numbered list of headlines",
+    "Present to user without procedural descriptions"
+  ],
+  "risks": [
+    "Headlines may not be clearly marked",
+    "May need to filter out non-news content"
+  ]
+}"""
+
+ANALYZER_INSTRUCTIONS = """Analyze the webpage described in the message and map the work to be done onto its elements.
+
+The message ends with either plan steps or a task. For each plan step (or, for a task,
+every element likely to be used, in the order it would be used), identify:
+1. Which element(s) to interact with
+2. What action to take (click, type, scroll, extract, etc.)
+3. What value to use (if typing)
+4. CSS selector for the element
+
+Respond in JSON format:
+{
+  "analysis": "...",
+  "element_mapping": [
+    {
+      "step": "...",
+      "element": {...},
+      "action": "click|type|scroll|extract",
+      "value": "...",
+      "selector": "..."
+    }
+  ]
+}"""
+
+EXECUTOR_INSTRUCTIONS = """Based on the analysis and plan in the message, generate precise executable actions with a strong emphasis on ACTUALLY EXTRACTING AND FORMATTING CONTENT.
+
+YOUR PRIMARY GOAL: EXTRACT AND FORMAT REAL CONTENT FROM THE PAGE DATA PROVIDED.
+
+Format for actions:
+{
+  "actions": [
+    {
+      "type": "click|type|scroll|navigate|wait|extract",
+      "selector": "CSS selector",
+      "value": "value for type actions",
+      "description": "what this does"
+    }
+  ],
+  "result": "FORMAT AND RETURN THE ACTUAL CONTENT IDENTIFIED IN THE PLAN - Extract and present the specific information requested by the user. No procedural descriptions!"
+}
+
+CONTENT EXTRACTION AND FORMATTING INSTRUCTIONS:
+1. Look at the plan.steps for identified content elements
+2. Extract the actual text content from those elements
+3. Format it in a clear, readable way for the user
+4. Return ONLY the formatted content - no procedural descriptions
+
+EXAMPLE EXCELLENT RESULT FOR NEWS HEADLINES:
+"Top Headlines:
+1. Breaking: Major diplomatic crisis escalates
+2. Global climate summit reaches historic agreement
+3. Tech stocks surge after earnings reports"
+
+EXAMPLE POOR RESULT TO AVOID:
+"I have identified headline elements and am now extracting content..."
+
+TASK: Extract and format the actual content identified in the plan, not describe what you're doing."""
+
+NAVIGATOR_INSTRUCTIONS = """Handle the user's task on the webpage described in the message in a single pass:
+plan it, map the plan onto the page's elements, then produce the actions and the answer.
+Prioritize CONTENT EXTRACTION AND DELIVERY over procedural descriptions: when the task
+asks for information, the result must contain that information, taken from the page.
+
+For each plan step, identify the element to interact with, the action (click, type,
+scroll, extract, etc.), the value to use when typing and a CSS selector for the element.
+
+Respond with one JSON object:
+{
+  "understanding": "what the user wants",
+  "approach": "how to get it from this page",
+  "steps": ["step1", "step2", ...],
+  "risks": ["risk1", ...],
+  "analysis": "what the page offers for the task",
+  "element_mapping": [
+    {
+      "step": "...",
+      "element": {...},
+      "action": "click|type|scroll|extract",
+      "value": "...",
+      "selector": "..."
+    }
+  ],
+  "actions": [
+    {
+      "type": "click|type|scroll|navigate|wait|extract",
+      "selector": "CSS selector",
+      "value": "value for type actions",
+      "description": "what this does"
+    }
+  ],
+  "result": "THE ACTUAL CONTENT the user asked for, formatted for reading - no procedural descriptions"
+}
+
+EXAMPLE EXCELLENT RESULT FOR NEWS HEADLINES:
+"Top Headlines:
+1. Breaking: Major diplomatic crisis escalates
+2. Global climate summit reaches historic agreement
+3. Tech stocks surge after earnings reports"
+
+EXAMPLE POOR RESULT TO AVOID:
+"I have identified headline elements and am now extracting content..." """
+
+SUMMARIZER_INSTRUCTIONS = """Summarize the text in the message, or combine the partial summaries in it into one.
+Keep the facts, names and numbers that matter for the user's request. Write plain text
+without preamble, within the word limit given in the message."""
+
+AGENT_INSTRUCTIONS: Dict[str, str] = {
+    "Planner": PLANNER_INSTRUCTIONS,
+    "Analyzer": ANALYZER_INSTRUCTIONS,
+    "Executor": EXECUTOR_INSTRUCTIONS,
+    "Summarizer": SUMMARIZER_INSTRUCTIONS,
+    "Navigator": NAVIGATOR_INSTRUCTIONS,
+}
+
+# Context fields about the conversation rather than the page; they go in the per-call part
+CONVERSATION_FIELDS = ("conversation_summary", "chat_history")
+
+# Page block order: fields that are the same for every task on a page come first,
+# task-dependent ones (ranked elements, text window) last
+PAGE_FIELD_ORDER = ("pageType", "forms", "links", "interactiveElements", "text")
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    """The fixed system message of one agent and the layout of its messages"""
+    system: str
+    
+    @classmethod
+    def for_agent(cls, name: str, role: str) -> "PromptTemplate":
+        instructions = AGENT_INSTRUCTIONS.get(name, "")
+        return cls(system=f"You are {name}, a {role}." + (f"\n\n{instructions}" if instructions else ""))
+    
+    def messages(self, page_block: str = "", request: str = "") -> List["BaseMessage"]:
+        """System message, then one user message with the page block before the per-call part"""
+        from langchain_core.messages import HumanMessage, SystemMessage
+        body = "\n\n".join(part for part in (page_block, request.strip()) if part)
+        return [SystemMessage(content=self.system), HumanMessage(content=body)]
+
+
+def split_context(context: Optional[Dict[str, Any]]) -> tuple:
+    """(page fields in page block order, conversation fields)"""
+    context = context or {}
+    page = {key: context[key] for key in PAGE_FIELD_ORDER if key in context}
+    page.update((key, value) for key, value in sorted(context.items())
+                if key not in page and key not in CONVERSATION_FIELDS)
+    conversation = {key: context[key] for key in CONVERSATION_FIELDS if context.get(key)}
+    return page, conversation
+
+
+def render_page_block(page: Dict[str, Any], encoded: str) -> str:
+    """URL and title header followed by the encoded page fields"""
+    header = [f"{label}: {page[key]}" for key, label in (("url", "URL"), ("title", "Title")) if page.get(key)]
+    if not header and not encoded:
+        return ""
+    return "\n".join(["Page:"] + header + ([encoded] if encoded else []))
+
+
+def prompt_text(messages: List["BaseMessage"]) -> str:
+    """All message contents, for token counting and logs"""
+    return "\n\n".join(str(message.content) for message in messages)
@@ -0,0 +1,168 @@
+"""
+Response cache for the agent pipeline
+Caches Planner, Analyzer and Executor outputs per normalized task and page
+fingerprint, in memory or in SQLite so entries survive restarts
+"""
+
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+
+
+STAGES = ("planner", "analyzer", "executor", "navigator")
+
+
+def normalize_task(task: str) -> str:
+    """Lowercase, strip punctuation and collapse whitespace"""
+    return " ".join(re.sub(r'[^\w\s]', ' ', task.lower()).split())
+
+
+def page_fingerprint(page_data: Dict[str, Any]) -> str:
+    """Content hash of the parts of the page the agents read"""
+    content = {
+        "url": page_data.get('url'),
+        "title": page_data.get('title'),
+        "text": page_data.get('text'),
+        "elements": page_data.get('interactiveElements')
+    }
+    return hashlib.sha256(json.dumps(content, sort_keys=True, default=str).encode()).hexdigest()
+
+
+def _digest(value: Any) -> str:
+    return hashlib.sha256(json.dumps(value, sort_keys=True, default=str).encode()).hexdigest()[:16]
+
+
+class ResponseCache:
+    """
+    Size-bounded LRU cache with TTL for stage outputs
+    
+    Keys combine the stage, the model that produced the output, normalized
+    task and page fingerprint; the Analyzer and Executor keys also include
+    a digest of their upstream inputs so a different plan never reuses a
+    stale analysis. Pass
+    sqlite_path to persist entries on disk instead of keeping them in memory.
+    """
+    
+    def __init__(self, max_entries: int = 1000, ttl: float = 3600, sqlite_path: Optional[str] = None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.sqlite_path = sqlite_path
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        self._stats = {stage: {"hits": 0, "misses": 0} for stage in STAGES}
+        self._db: Optional[sqlite3.Connection] = None
+        if sqlite_path:
+            self._db = sqlite3.connect(sqlite_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS response_cache ("
+                "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+                "expires_at REAL NOT NULL, last_access REAL NOT NULL)"
+            )
+            self._db.commit()
+    
+    @staticmethod
+    def make_key(stage: str, task: str, fingerprint: str, *inputs: Any, model: Optional[str] = None) -> str:
+        """
+        Cache key for a stage
+        
+        fingerprint comes from page_fingerprint(), inputs are upstream outputs
+        and model names the stage's model (and endpoint), so two models never
+        share an entry.
+        """
+        key = f"{stage}:{_digest(model) if model else '-'}:{fingerprint}:{normalize_task(task)}"
+        if inputs:
+            key += f":{_digest(inputs)}"
+        return key
+    
+    def get(self, stage: str, key: str) -> Optional[Any]:
+        """Return the cached value, or None on a miss or expired entry"""
+        now = time.time()
+        with self._lock:
+            raw = self._db_get(key, now) if self._db else self._memory_get(key, now)
+            self._stats.setdefault(stage, {"hits": 0, "misses": 0})
+            self._stats[stage]["hits" if raw is not None else "misses"] += 1
+        return json.loads(raw) if raw is not None else None
+    
+    def set(self, key: str, value: Any):
+        """Store a JSON-serializable value"""
+        raw = json.dumps(value, default=str)
+        expires_at = time.time() + self.ttl
+        with self._lock:
+            if self._db:
+                self._db_set(key, raw, expires_at)
+            else:
+                self._entries[key] = (expires_at, raw)
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+    
+    def clear(self):
+        """Drop every entry"""
+        with self._lock:
+            self._entries.clear()
+            if self._db:
+                self._db.execute("DELETE FROM response_cache")
+                self._db.commit()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Hit and miss counts per stage"""
+        with self._lock:
+            if self._db:
+                size = self._db.execute("SELECT COUNT(*) FROM response_cache").fetchone()[0]
+            else:
+                size = len(self._entries)
+            stages = {stage: dict(counts) for stage, counts in self._stats.items()}
+        hits = sum(counts["hits"] for counts in stages.values())
+        total = hits + sum(counts["misses"] for counts in stages.values())
+        return {
+            "backend": "sqlite" if self._db else "memory",
+            "entries": size,
+            "max_entries": self.max_entries,
+            "hit_rate": round(hits / total, 3) if total else None,
+            "stages": stages
+        }
+    
+    def _memory_get(self, key: str, now: float) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, raw = entry
+        if expires_at <= now:
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return raw
+    
+    def _db_get(self, key: str, now: float) -> Optional[str]:
+        row = self._db.execute(
+            "SELECT value, expires_at FROM response_cache WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        if row[1] <= now:
+            self._db.execute("DELETE FROM response_cache WHERE key = ?", (key,))
+            self._db.commit()
+            return None
+        self._db.execute("UPDATE response_cache SET last_access = ? WHERE key = ?", (now, key))
+        self._db.commit()
+        return row[0]
+    
+    def _db_set(self, key: str, raw: str, expires_at: float):
+        now = time.time()
+        self._db.execute(
+            "INSERT OR REPLACE INTO response_cache (key, value, expires_at, last_access) VALUES (?, ?, ?, ?)",
+            (key, raw, expires_at, now)
+        )
+        # Evict expired entries, then the least recently used beyond the size bound
+        self._db.execute("DELETE FROM response_cache WHERE expires_at <= ?", (now,))
+        self._db.execute(
+            "DELETE FROM response_cache WHERE key IN ("
+            "SELECT key FROM response_cache ORDER BY last_access DESC LIMIT -1 OFFSET ?)",
+            (self.max_entries,)
+        )
+        self._db.commit()
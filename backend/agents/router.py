@@ -0,0 +1,124 @@
+"""
+Deterministic intent router
+Answers extractable intents (headlines, summaries) straight from page data
+and lets everything else fall through to the multi-agent pipeline
+"""
+
+from typing import Any, Dict, Iterable, List, Optional
+import re
+import time
+
+from agents.page_text import split_passages
+
+
+def extract_headlines(page_data: Dict, limit: int = 5) -> Optional[str]:
+    """Format the page's h1-h3 headings as a numbered list, or None when there are none"""
+    headlines: List[str] = []
+    seen = set()
+    for element in page_data.get('interactiveElements', []):
+        if element.get('type') in ['h1', 'h2', 'h3'] and element.get('text'):
+            text = element.get('text', '').strip()
+            if text and len(text) > 10 and text not in seen:  # Filter out very short texts
+                seen.add(text)
+                headlines.append(text)
+    
+    if not headlines:
+        return None
+    
+    formatted = "Top Headlines:\n"
+    for i, headline in enumerate(headlines[:limit], 1):
+        formatted += f"{i}. {headline}\n"
+    return formatted.strip()
+
+
+def extract_summary(page_data: Dict, max_tokens: int = 60) -> Optional[str]:
+    """Title plus the opening sentences of the page text, or None when the page has no text"""
+    title = page_data.get('title', '')
+    passages = split_passages(page_data.get('text', ''), max_tokens)
+    if not passages:
+        return None
+    
+    summary_text = passages[0] + (" ..." if len(passages) > 1 else "")
+    return f"This page is about: {title}\n\nSummary: {summary_text}"
+
+
+# Intent name → (task patterns, extractor, understanding)
+DEFAULT_INTENTS: Dict[str, tuple] = {
+    "headlines": (
+        (r'\bheadlines?\b', r'\bnews\b', r'\btop stor(y|ies)\b', r'\bbreaking\b'),
+        extract_headlines,
+        "User wants to see the top headlines from this page"
+    ),
+    "summary": (
+        (r'\bsummar', r'\btl;?dr\b', r'\bwhat is (this|the) (page|article|site)( about)?\b',
+         r'\bwhat\'?s (this|the) (page|article|site) about\b'),
+        extract_summary,
+        "User wants a summary of this page"
+    ),
+}
+
+# Tasks asking the agent to act on the page always go to the pipeline
+ACTION_PATTERN = re.compile(r'\b(click|type|fill|enter|submit|search for|navigate|go to|open|scroll|select|log ?in|sign ?in)\b')
+
+
+class IntentRouter:
+    """
+    Classifies tasks with cheap rules and answers extractable intents directly
+    
+    Only intents listed in enabled_intents are answered on the fast path;
+    tasks with action verbs, unknown intents and pages where extraction
+    finds nothing fall through to the pipeline.
+    """
+    
+    def __init__(self, enabled_intents: Optional[Iterable[str]] = None,
+                 intents: Optional[Dict[str, tuple]] = None):
+        self.intents = intents or DEFAULT_INTENTS
+        self.enabled_intents = set(enabled_intents) if enabled_intents is not None else set(self.intents)
+        self._compiled = {
+            name: [re.compile(pattern) for pattern in patterns]
+            for name, (patterns, _, _) in self.intents.items()
+        }
+    
+    def classify(self, task: str) -> Optional[str]:
+        """Return the first matching intent name, or None"""
+        task_lower = task.lower()
+        for name, patterns in self._compiled.items():
+            if any(pattern.search(task_lower) for pattern in patterns):
+                return name
+        return None
+    
+    def route(self, task: str, page_data: Dict) -> Dict[str, Any]:
+        """
+        Decide how to handle a task
+        
+        Returns:
+            Dict with intent, route ("fast_path" or "pipeline"), reason and,
+            for the fast path, the extracted result and understanding
+        """
+        started = time.perf_counter()
+        intent = self.classify(task)
+        decision: Dict[str, Any] = {"intent": intent, "route": "pipeline"}
+        
+        if intent is None:
+            decision["reason"] = "no extractable intent"
+        elif intent not in self.enabled_intents:
+            decision["reason"] = f"intent '{intent}' not enabled for fast path"
+        elif ACTION_PATTERN.search(task.lower()):
+            decision["reason"] = "task asks for page actions"
+        elif 'error' in page_data:
+            decision["reason"] = "page data has an error"
+        else:
+            _, extractor, understanding = self.intents[intent]
+            result = extractor(page_data)
+            if result:
+                decision.update({
+                    "route": "fast_path",
+                    "reason": "answered from page data",
+                    "result": result,
+                    "understanding": understanding
+                })
+            else:
+                decision["reason"] = "nothing to extract from page data"
+        
+        decision["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 2)
+        return decision
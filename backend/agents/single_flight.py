@@ -0,0 +1,54 @@
+"""
+Single-flight request coalescing
+Concurrent calls with the same key share one in-flight computation instead
+of each running the pipeline
+"""
+
+from typing import Any, Awaitable, Callable, Dict, Tuple
+import asyncio
+
+from agents.metrics import COALESCED_REQUESTS
+
+
+class SingleFlight:
+    """
+    Deduplicates concurrent async calls by key
+    
+    The first caller for a key starts the computation as its own task; callers
+    arriving while it runs wait on the same task and get the same result (or
+    exception). The task is shielded, so a caller that goes away does not
+    cancel it for the others. Nothing is cached once the task finishes.
+    """
+    
+    def __init__(self, name: str = "task"):
+        self.name = name
+        self._in_flight: Dict[str, asyncio.Task] = {}
+        self._stats = {"leaders": 0, "coalesced": 0}
+    
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> Tuple[Any, bool]:
+        """
+        Run fn() once per key among concurrent callers
+        
+        Returns:
+            (result, coalesced) - coalesced is True when another caller's run was shared
+        """
+        task = self._in_flight.get(key)
+        coalesced = task is not None
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._forget(key, task))
+            self._stats["leaders"] += 1
+            COALESCED_REQUESTS.inc(flight=self.name, role="leader")
+        else:
+            self._stats["coalesced"] += 1
+            COALESCED_REQUESTS.inc(flight=self.name, role="coalesced")
+        return await asyncio.shield(task), coalesced
+    
+    def stats(self) -> Dict[str, int]:
+        """Leader and coalesced counts, and keys in flight right now"""
+        return {"in_flight": len(self._in_flight), **self._stats}
+    
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._in_flight.get(key) is task:
+            del self._in_flight[key]
@@ -0,0 +1,117 @@
+"""
+Content-addressed page snapshots
+Stores uploaded page data under its content hash so follow-up requests on an
+unchanged page can send the hash instead of the whole payload, and caches
+data derived from each snapshot alongside it
+"""
+
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional
+import hashlib
+import json
+import threading
+import time
+
+
+def snapshot_ref(page_data: Dict[str, Any]) -> str:
+    """Content hash of the full page payload"""
+    canonical = json.dumps(page_data, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+class SnapshotStore:
+    """
+    Size-bounded LRU of page snapshots with an idle TTL
+    
+    Each snapshot also holds named artifacts (pruned elements, fingerprints,
+    ...) computed on first use, so repeat requests on the same page skip
+    that work. Artifacts are dropped together with their snapshot.
+    """
+    
+    def __init__(self, max_snapshots: int = 200, ttl: float = 1800):
+        self.max_snapshots = max_snapshots
+        self.ttl = ttl
+        self._snapshots: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._stats = {"stored": 0, "hits": 0, "misses": 0, "artifact_hits": 0, "artifact_misses": 0, "evicted": 0}
+    
+    def put(self, page_data: Dict[str, Any]) -> str:
+        """Store a snapshot (or refresh an existing one) and return its ref"""
+        ref = snapshot_ref(page_data)
+        now = time.time()
+        with self._lock:
+            entry = self._snapshots.get(ref)
+            if entry is None:
+                entry = {"page": page_data, "artifacts": {}}
+                self._snapshots[ref] = entry
+                self._stats["stored"] += 1
+            entry["expires_at"] = now + self.ttl
+            self._snapshots.move_to_end(ref)
+            self._evict(now)
+        return ref
+    
+    def get(self, ref: str) -> Optional[Dict[str, Any]]:
+        """Return the page data for a ref, or None when it is unknown or expired"""
+        with self._lock:
+            entry = self._live_entry(ref)
+            self._stats["hits" if entry is not None else "misses"] += 1
+            return entry["page"] if entry is not None else None
+    
+    def artifact(self, ref: str, name: str, factory: Callable[[], Any]) -> Any:
+        """
+        Return a value derived from the snapshot, computing it with factory()
+        the first time; without a live snapshot the value is computed but not kept
+        """
+        with self._lock:
+            entry = self._live_entry(ref)
+            if entry is not None and name in entry["artifacts"]:
+                self._stats["artifact_hits"] += 1
+                return entry["artifacts"][name]
+            self._stats["artifact_misses"] += 1
+        
+        value = factory()
+        if entry is not None:
+            with self._lock:
+                entry["artifacts"].setdefault(name, value)
+        return value
+    
+    def __contains__(self, ref: str) -> bool:
+        with self._lock:
+            return self._live_entry(ref) is not None
+    
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._snapshots)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Snapshot count and hit/miss counters"""
+        with self._lock:
+            return {
+                "snapshots": len(self._snapshots),
+                "max_snapshots": self.max_snapshots,
+                "ttl_seconds": self.ttl,
+                **self._stats
+            }
+    
+    def _live_entry(self, ref: str) -> Optional[Dict[str, Any]]:
+        """Entry for ref with its TTL refreshed, or None (caller holds the lock)"""
+        entry = self._snapshots.get(ref)
+        if entry is None:
+            return None
+        now = time.time()
+        if entry["expires_at"] <= now:
+            del self._snapshots[ref]
+            self._stats["evicted"] += 1
+            return None
+        entry["expires_at"] = now + self.ttl
+        self._snapshots.move_to_end(ref)
+        return entry
+    
+    def _evict(self, now: float):
+        """Drop expired snapshots, then the least recently used beyond the bound (caller holds the lock)"""
+        for ref in [ref for ref, entry in self._snapshots.items() if entry["expires_at"] <= now]:
+            del self._snapshots[ref]
+            self._stats["evicted"] += 1
+        while len(self._snapshots) > self.max_snapshots:
+            self._snapshots.popitem(last=False)
+            self._stats["evicted"] += 1
@@ -0,0 +1,27 @@
+"""
+Lightweight core shared by the backend apps
+App factory with the CORS setup the extension needs. Imports nothing
+beyond FastAPI, so every mode starts without loading LangChain.
+"""
+
+from typing import List, Optional
+
+from fastapi import FastAPI
+from fastapi.middleware.cors import CORSMiddleware
+
+
+def create_app(title: str, description: str, version: str,
+               expose_headers: Optional[List[str]] = None) -> FastAPI:
+    """FastAPI app that accepts requests from the browser extension"""
+    app = FastAPI(title=title, description=description, version=version)
+    
+    # CORS middleware - allow Chrome extension
+    app.add_middleware(
+        CORSMiddleware,
+        allow_origins=["*"],  # In production, specify your extension ID
+        allow_credentials=True,
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=expose_headers or []
+    )
+    return app
@@ -3,44 +3,112 @@ FastAPI Backend for AI Agent Browser Extension
 Hybrid LangChain + Multi-Agent System
 """
 
-from fastapi import FastAPI, HTTPException
-from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel, Field
-from typing import List, Dict, Any, Optional
+from fastapi import HTTPException, Request
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from pydantic import BaseModel, Field, model_validator
+from typing import TYPE_CHECKING, List, Dict, Any, Literal, Optional
 from datetime import datetime
+import asyncio
+import hashlib
+import json
 import os
 import sys
+import time
 
 # Add parent directory to path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from config import Config
 
-# Add parent directory to path
-sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-
+# LangChain and the model clients are imported on the first LLM-backed request
 from agents.multi_agent import create_hybrid_system, HybridMultiAgentSystem
-from chains.reasoning_chains import ReasoningChains
-from langchain_openai import ChatOpenAI
+from agents.llm_registry import get_llm_registry
+from agents.router import IntentRouter
+from agents.page_preprocessor import PagePreprocessor
+from agents.page_text import TextWindow
+from agents.snapshot_store import SnapshotStore
+from agents.single_flight import SingleFlight
+from agents.admission import Overloaded, get_admission_controller, request_deadline
+from agents.response_cache import ResponseCache, normalize_task
+from agents.metrics import registry as metrics_registry, PIPELINE_SECONDS
+from agents.model_warmer import ModelWarmer, warmup_models
+from app.core import create_app
+from app.session_store import SessionStore
+from app.session_backends import create_session_backend
+
+if TYPE_CHECKING:
+    from chains.reasoning_chains import ReasoningChains
 
 # Initialize FastAPI app
-app = FastAPI(
+app = create_app(
     title="AI Agent Backend",
     description="Hybrid LangChain + Multi-Agent system for browser automation",
     version="2.0.0"
 )
 
-# CORS middleware - allow Chrome extension
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],  # In production, specify your extension ID
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+# Session state - bounded by count, idle TTL and per-session memory
+agent_systems = SessionStore(
+    max_sessions=Config.MAX_SESSIONS,
+    idle_ttl=Config.SESSION_IDLE_TTL,
+    memory_cap=Config.SESSION_MEMORY_CAP,
+    name="agent_systems"
 )
+reasoning_chains = SessionStore(
+    max_sessions=Config.MAX_SESSIONS,
+    idle_ttl=Config.SESSION_IDLE_TTL,
+    memory_cap=None,
+    name="reasoning_chains"
+)
+
+# Shared session state for multi-worker deployments (None = this process only).
+# Agent systems above then act as a per-worker cache restored from it per request
+session_backend = create_session_backend(
+    Config.SESSION_BACKEND,
+    Config.SESSION_BACKEND_URL,
+    ttl=Config.SESSION_IDLE_TTL
+)
+
+# Stage output cache shared by all sessions
+response_cache: Optional[ResponseCache] = ResponseCache(
+    max_entries=Config.CACHE_MAX_ENTRIES,
+    ttl=Config.CACHE_TTL,
+    sqlite_path=Config.CACHE_SQLITE_PATH
+) if Config.CACHE_ENABLED else None
+
+# Fast-path router for intents answerable straight from page data
+intent_router: Optional[IntentRouter] = IntentRouter(
+    enabled_intents=Config.ROUTER_INTENTS
+) if Config.ROUTER_ENABLED else None
+
+# Element dedupe/pruning/ranking applied before the agents see the page
+page_preprocessor: Optional[PagePreprocessor] = PagePreprocessor(
+    top_k=Config.PAGE_TOP_K
+) if Config.PAGE_PREPROCESSING else None
+
+# Task-relevant passages of the page text within a token budget
+page_text_window: Optional[TextWindow] = TextWindow(
+    token_budget=Config.PAGE_TEXT_BUDGET
+) if Config.PAGE_TEXT_WINDOW else None
+
+# Uploaded pages by content hash, so follow-up requests can send page_ref only
+page_snapshots = SnapshotStore(
+    max_snapshots=Config.SNAPSHOT_MAX_ENTRIES,
+    ttl=Config.SNAPSHOT_TTL
+)
+
+# Concurrent identical tasks share one pipeline run
+task_flights: Optional[SingleFlight] = SingleFlight("task") if Config.SINGLE_FLIGHT_ENABLED else None
 
-# Global state - in production, use proper session management
-agent_systems: Dict[str, HybridMultiAgentSystem] = {}
-reasoning_chains: Dict[str, ReasoningChains] = {}
+# Configured models loaded at startup and kept loaded while requests come in
+model_warmer: Optional[ModelWarmer] = ModelWarmer(
+    base_url=Config.BASE_URL,
+    models=warmup_models(Config.CHAT_MODEL, Config.REASONING_MODEL, [
+        Config.PLANNER_MODEL, Config.ANALYZER_MODEL, Config.EXECUTOR_MODEL, Config.NAVIGATOR_MODEL,
+        Config.SUMMARIZER_MODEL, Config.VALIDATOR_MODEL, Config.ESCALATION_MODEL
+    ]),
+    interval=Config.MODEL_WARMUP_INTERVAL,
+    idle_after=Config.MODEL_WARMUP_IDLE_AFTER,
+    timeout=Config.MODEL_WARMUP_TIMEOUT
+) if Config.MODEL_WARMUP_ENABLED and Config.BASE_URL else None
 
 
 # ============ Pydantic Models ============
@@ -74,13 +142,24 @@ class ChatMessage(BaseModel):
     timestamp: Optional[str] = None
 
 
+PipelineMode = Literal["sequential", "speculative", "fused"]
+
+
 class TaskRequest(BaseModel):
     """Request to process a task"""
     task: str = Field(..., description="User's task or question")
-    page_data: PageData = Field(..., description="Current page context")
+    page_data: Optional[PageData] = Field(None, description="Current page context")
+    page_ref: Optional[str] = Field(None, description="Ref of a page uploaded earlier, instead of page_data")
     chat_history: Optional[List[ChatMessage]] = Field(default=[], description="Previous conversation")
     session_id: str = Field(default="default", description="Session ID for multi-tab support")
     config: AgentConfig = Field(..., description="Agent configuration")
+    pipeline_mode: Optional[PipelineMode] = Field(None, description="Pipeline mode for this request (default: server's)")
+    
+    @model_validator(mode="after")
+    def _page_or_ref(self) -> "TaskRequest":
+        if self.page_data is None and not self.page_ref:
+            raise ValueError("either page_data or page_ref is required")
+        return self
 
 
 class TaskResponse(BaseModel):
@@ -91,6 +170,23 @@ class TaskResponse(BaseModel):
     agent_insights: Dict[str, Any]
     timestamp: str
     session_id: str
+    page_ref: Optional[str] = None  # send this instead of page_data while the page is unchanged
+
+
+class BatchTaskItem(BaseModel):
+    """One (task, page) pair in a batch"""
+    id: Optional[str] = Field(None, description="Caller-supplied ID echoed back with the result")
+    task: str = Field(..., description="Task or question for this page")
+    page_data: PageData = Field(..., description="Page context")
+
+
+class BatchTaskRequest(BaseModel):
+    """Request to process many tasks with bounded concurrency"""
+    items: List[BatchTaskItem] = Field(..., description="Tasks to process")
+    config: AgentConfig = Field(..., description="Agent configuration shared by all items")
+    max_concurrency: Optional[int] = Field(None, ge=1, description="Concurrent pipelines (capped by the server)")
+    item_timeout: Optional[float] = Field(None, gt=0, description="Per-item timeout in seconds")
+    pipeline_mode: Optional[PipelineMode] = Field(None, description="Pipeline mode for all items (default: server's)")
 
 
 class AnalyzeRequest(BaseModel):
@@ -108,31 +204,142 @@ class AnalyzeResponse(BaseModel):
 
 # ============ Helper Functions ============
 
-def get_or_create_agent_system(session_id: str, config: AgentConfig) -> HybridMultiAgentSystem:
-    """Get existing or create new agent system for session"""
-    if session_id not in agent_systems:
-        agent_systems[session_id] = create_hybrid_system(
+def resolve_model(name: str, config: AgentConfig) -> Optional[str]:
+    """Model for a tier setting: "chat"/"reasoning" map to the request's models, anything else is a model name"""
+    if not name:
+        return None
+    return {"chat": config.chat_model, "reasoning": config.reasoning_model}.get(name.lower(), name)
+
+
+async def get_or_create_agent_system(session_id: str, config: AgentConfig) -> HybridMultiAgentSystem:
+    """Get existing or create new agent system for session, with its state restored from the session backend"""
+    def create_system() -> HybridMultiAgentSystem:
+        system = create_hybrid_system(
             api_key=config.api_key,
             model=config.chat_model,  # Use chat model for the agent system
-            base_url=config.base_url
+            base_url=config.base_url,
+            pipeline_mode=Config.PIPELINE_MODE,
+            context_token_budget=Config.CONTEXT_TOKEN_BUDGET,
+            cache=response_cache,
+            router=intent_router,
+            json_mode=Config.LLM_JSON_MODE,
+            preprocessor=page_preprocessor,
+            snapshots=page_snapshots,
+            memory_token_budget=Config.MEMORY_TOKEN_BUDGET,
+            memory_recent_messages=Config.MEMORY_RECENT_MESSAGES,
+            memory_summarize=Config.MEMORY_SUMMARIZE,
+            stage_models={
+                "planner": resolve_model(Config.PLANNER_MODEL, config),
+                "analyzer": resolve_model(Config.ANALYZER_MODEL, config),
+                "executor": resolve_model(Config.EXECUTOR_MODEL, config),
+                "navigator": resolve_model(Config.NAVIGATOR_MODEL, config),
+                "summarizer": resolve_model(Config.SUMMARIZER_MODEL, config)
+            },
+            escalation_model=resolve_model(Config.ESCALATION_MODEL, config),
+            text_window=page_text_window,
+            summary_chunk_tokens=Config.SUMMARY_CHUNK_TOKENS,
+            summary_max_concurrency=Config.SUMMARY_MAX_CONCURRENCY,
+            action_validation=Config.ACTION_VALIDATION,
+            validator_model=resolve_model(Config.VALIDATOR_MODEL, config),
+            validation_max_concurrency=Config.ACTION_VALIDATION_MAX_CONCURRENCY
         )
-    return agent_systems[session_id]
+        if session_backend is not None:
+            # The LLM summary lands after the request has saved the session
+            system.conversation_memory.on_compacted = lambda: persist_compacted(session_id, system)
+        return system
+    
+    agent_system = agent_systems.get_or_create(session_id, create_system)
+    if session_backend is not None:
+        # Another worker may have served this session since we last saw it;
+        # a state no newer than ours would drop a summary compacted since the last save
+        state = await asyncio.to_thread(session_backend.load, session_id)
+        if state is not None and state.get("version", 0) > agent_system.state_version:
+            agent_system.load_state(state)
+    return agent_system
+
+
+async def persist_session(session_id: str, agent_system: HybridMultiAgentSystem):
+    """Save the session's state under a new version so other workers see it"""
+    if session_backend is not None:
+        agent_system.state_version += 1
+        # Backend calls block (disk, network): keep them off the event loop
+        await asyncio.to_thread(session_backend.save, session_id, agent_system.export_state())
 
 
-def get_or_create_reasoning_chains(session_id: str, config: AgentConfig) -> ReasoningChains:
+async def persist_compacted(session_id: str, agent_system: HybridMultiAgentSystem):
+    """Save a background compaction's summary, unless another worker has saved the session since"""
+    state = await asyncio.to_thread(session_backend.load, session_id)
+    if state is not None and state.get("version", 0) > agent_system.state_version:
+        return
+    await persist_session(session_id, agent_system)
+
+
+def get_or_create_reasoning_chains(session_id: str, config: AgentConfig) -> "ReasoningChains":
     """Get existing or create new reasoning chains for session"""
-    if session_id not in reasoning_chains:
-        llm_kwargs = {
-            "api_key": config.api_key,
-            "model": config.reasoning_model,  # Use reasoning model for reasoning chains
-            "temperature": 0.7
-        }
-        if config.base_url:
-            llm_kwargs["base_url"] = config.base_url
-        
-        llm = ChatOpenAI(**llm_kwargs)
-        reasoning_chains[session_id] = ReasoningChains(llm)
-    return reasoning_chains[session_id]
+    def create_chains() -> "ReasoningChains":
+        from chains.reasoning_chains import ReasoningChains
+        llm = get_llm_registry().get(
+            api_key=config.api_key,
+            model=config.reasoning_model,  # Use reasoning model for reasoning chains
+            base_url=config.base_url,
+            temperature=0.7
+        )
+        return ReasoningChains(llm)
+    
+    return reasoning_chains.get_or_create(session_id, create_chains)
+
+
+def resolve_page(request: TaskRequest) -> tuple:
+    """
+    Page data and snapshot ref for a task request
+    
+    Uploaded pages are stored as snapshots; a page_ref the server no longer
+    knows is answered with 404 "unknown_page_ref" so the client re-uploads.
+    """
+    if request.page_data is not None:
+        page_data = request.page_data.model_dump()
+        return page_data, page_snapshots.put(page_data)
+    
+    page_data = page_snapshots.get(request.page_ref)
+    if page_data is None:
+        raise HTTPException(
+            status_code=404,
+            detail={"error": "unknown_page_ref", "page_ref": request.page_ref,
+                    "message": "Page snapshot not found; resend the request with page_data"}
+        )
+    return page_data, request.page_ref
+
+
+def task_flight_key(request: TaskRequest, page_ref: str, agent_system: HybridMultiAgentSystem) -> str:
+    """
+    Single-flight key for a task request
+    
+    Requests only share a run when the pipeline would see the same thing:
+    task, page, models, API key and the conversation given to the Planner
+    (the session's memory, or the client's chat history it would be seeded from).
+    """
+    conversation = agent_system.conversation_memory.window() or [msg.model_dump() for msg in request.chat_history]
+    return "|".join([
+        normalize_task(request.task), page_ref, request.config.chat_model,
+        request.config.base_url or "", request.pipeline_mode or Config.PIPELINE_MODE,
+        hashlib.sha256(request.config.api_key.encode()).hexdigest()[:16],
+        hashlib.sha256(json.dumps(conversation, sort_keys=True).encode()).hexdigest()[:16]
+    ])
+
+
+def format_sse(event: str, data: Dict[str, Any]) -> str:
+    """Format a Server-Sent Event frame"""
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+def overloaded_error(error: Overloaded) -> HTTPException:
+    """429 (queue full) or 503 (deadline) with Retry-After for a shed request"""
+    return HTTPException(
+        status_code=error.status_code,
+        detail={"error": "overloaded", "reason": error.reason, "retry_after": error.retry_after,
+                "message": str(error)},
+        headers={"Retry-After": str(error.retry_after)}
+    )
 
 
 # ============ API Endpoints ============
@@ -156,13 +363,30 @@ async def root():
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
+    admission = get_admission_controller()
     return {
         "status": "healthy",
         "active_sessions": len(agent_systems),
+        "sessions": agent_systems.stats(),
+        "session_backend": (await asyncio.to_thread(session_backend.stats)
+                            if session_backend is not None else {"backend": "memory"}),
+        "reasoning_sessions": reasoning_chains.stats(),
+        "llm_clients": get_llm_registry().stats(),
+        "response_cache": response_cache.stats() if response_cache else None,
+        "page_snapshots": page_snapshots.stats(),
+        "single_flight": task_flights.stats() if task_flights else None,
+        "admission": admission.stats() if admission else None,
+        "models": model_warmer.status() if model_warmer else None,
         "timestamp": datetime.now().isoformat()
     }
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics():
+    """Prometheus-style metrics: per-stage latency, tokens, parse failures and fallbacks"""
+    return PlainTextResponse(metrics_registry.render(), media_type="text/plain; version=0.0.4")
+
+
 @app.post("/api/task", response_model=TaskResponse)
 async def process_task(request: TaskRequest):
     """
@@ -173,22 +397,36 @@ async def process_task(request: TaskRequest):
     2. Processes task through Planner → Analyzer → Executor pipeline
     3. Returns actions and insights
     """
+    # Page data from the request, or from the snapshot named by page_ref
+    page_data_dict, page_ref = resolve_page(request)
+    
     try:
         # Get or create agent system for this session
-        agent_system = get_or_create_agent_system(request.session_id, request.config)
-        
-        # Convert page data to dict
-        page_data_dict = request.page_data.model_dump()
+        agent_system = await get_or_create_agent_system(request.session_id, request.config)
         
         # Convert chat history to dict
         chat_history = [msg.model_dump() for msg in request.chat_history]
         
-        # Process task through multi-agent system
-        result = agent_system.process_task(
+        # Process task through multi-agent system (awaited so the event loop stays free)
+        started = time.perf_counter()
+        run = lambda: agent_system.aprocess_task(
             task=request.task,
             page_data=page_data_dict,
-            chat_history=chat_history
+            chat_history=chat_history,
+            page_ref=page_ref,
+            pipeline_mode=request.pipeline_mode
         )
+        with request_deadline(Config.ADMISSION_REQUEST_DEADLINE):
+            if task_flights is None:
+                result = await run()
+            else:
+                # Same task, page and model already running (another tab, a retry): wait for it
+                key = task_flight_key(request, page_ref, agent_system)
+                result, coalesced = await task_flights.do(key, run)
+                if coalesced:
+                    result = agent_system.record_shared_result(request.task, result)
+        PIPELINE_SECONDS.observe(time.perf_counter() - started, endpoint="task")
+        await persist_session(request.session_id, agent_system)
         
         # Return response
         return TaskResponse(
@@ -197,13 +435,154 @@ async def process_task(request: TaskRequest):
             result=result["result"],
             agent_insights=result["agent_insights"],
             timestamp=datetime.now().isoformat(),
-            session_id=request.session_id
+            session_id=request.session_id,
+            page_ref=page_ref
         )
     
+    except Overloaded as e:
+        raise overloaded_error(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Task processing failed: {str(e)}")
 
 
+@app.post("/api/task/stream")
+async def stream_task(request: TaskRequest):
+    """
+    Stream a task through the multi-agent pipeline as Server-Sent Events
+    
+    Emits stage_start/stage_end events for Planner, Analyzer and Executor
+    (a single Navigator stage in fused mode), token events while the result
+    is generated, and a final result event carrying the same payload as /api/task.
+    """
+    page_data_dict, page_ref = resolve_page(request)
+    agent_system = await get_or_create_agent_system(request.session_id, request.config)
+    chat_history = [msg.model_dump() for msg in request.chat_history]
+    
+    async def event_stream():
+        started = time.perf_counter()
+        try:
+            with request_deadline(Config.ADMISSION_REQUEST_DEADLINE):
+                async for event in agent_system.astream_task(
+                    task=request.task,
+                    page_data=page_data_dict,
+                    chat_history=chat_history,
+                    page_ref=page_ref,
+                    pipeline_mode=request.pipeline_mode
+                ):
+                    name = event.pop("event")
+                    if name == "result":
+                        result = event["data"]
+                        event = TaskResponse(
+                            understanding=result["understanding"],
+                            actions=result["actions"],
+                            result=result["result"],
+                            agent_insights=result["agent_insights"],
+                            timestamp=datetime.now().isoformat(),
+                            session_id=request.session_id,
+                            page_ref=page_ref
+                        ).model_dump()
+                        PIPELINE_SECONDS.observe(time.perf_counter() - started, endpoint="task_stream")
+                        await persist_session(request.session_id, agent_system)
+                    yield format_sse(name, event)
+        except Overloaded as e:
+            yield format_sse("error", {"detail": str(e), "status": e.status_code,
+                                       "reason": e.reason, "retry_after": e.retry_after})
+        except Exception as e:
+            yield format_sse("error", {"detail": f"Task processing failed: {str(e)}"})
+    
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.post("/api/task/batch")
+async def process_task_batch(request: BatchTaskRequest):
+    """
+    Process many tasks through the multi-agent pipeline
+    
+    Items run concurrently up to max_concurrency, each with its own timeout,
+    sharing LLM clients and the response cache. Results stream back as
+    NDJSON in completion order, followed by a summary line.
+    """
+    max_concurrency = min(request.max_concurrency or Config.BATCH_MAX_CONCURRENCY, Config.BATCH_MAX_CONCURRENCY)
+    item_timeout = request.item_timeout or Config.BATCH_ITEM_TIMEOUT
+    semaphore = asyncio.Semaphore(max_concurrency)
+    
+    async def run_item(index: int, item: BatchTaskItem) -> Dict[str, Any]:
+        async with semaphore:
+            started = time.perf_counter()
+            line: Dict[str, Any] = {"index": index, "id": item.id}
+            try:
+                # Each item gets its own agent system so histories never mix;
+                # the LLM client and cache behind it are shared
+                agent_system = create_hybrid_system(
+                    api_key=request.config.api_key,
+                    model=request.config.chat_model,
+                    base_url=request.config.base_url,
+                    pipeline_mode=Config.PIPELINE_MODE,
+                    context_token_budget=Config.CONTEXT_TOKEN_BUDGET,
+                    cache=response_cache,
+                    router=intent_router,
+                    json_mode=Config.LLM_JSON_MODE,
+                    preprocessor=page_preprocessor,
+                    stage_models={
+                        "planner": resolve_model(Config.PLANNER_MODEL, request.config),
+                        "analyzer": resolve_model(Config.ANALYZER_MODEL, request.config),
+                        "executor": resolve_model(Config.EXECUTOR_MODEL, request.config),
+                        "navigator": resolve_model(Config.NAVIGATOR_MODEL, request.config),
+                        "summarizer": resolve_model(Config.SUMMARIZER_MODEL, request.config)
+                    },
+                    escalation_model=resolve_model(Config.ESCALATION_MODEL, request.config),
+                    text_window=page_text_window,
+                    summary_chunk_tokens=Config.SUMMARY_CHUNK_TOKENS,
+                    summary_max_concurrency=Config.SUMMARY_MAX_CONCURRENCY,
+                    action_validation=Config.ACTION_VALIDATION,
+                    validator_model=resolve_model(Config.VALIDATOR_MODEL, request.config),
+                    validation_max_concurrency=Config.ACTION_VALIDATION_MAX_CONCURRENCY
+                )
+                result = await asyncio.wait_for(
+                    agent_system.aprocess_task(task=item.task, page_data=item.page_data.model_dump(),
+                                               pipeline_mode=request.pipeline_mode),
+                    timeout=item_timeout
+                )
+                line.update({"status": "ok", **result})
+            except asyncio.TimeoutError:
+                line.update({"status": "timeout", "detail": f"Item exceeded {item_timeout}s"})
+            except Overloaded as e:
+                line.update({"status": "overloaded", "detail": str(e), "retry_after": e.retry_after})
+            except Exception as e:
+                line.update({"status": "error", "detail": f"Task processing failed: {str(e)}"})
+            elapsed = time.perf_counter() - started
+            line["elapsed_ms"] = round(elapsed * 1000, 1)
+            PIPELINE_SECONDS.observe(elapsed, endpoint="task_batch")
+            return line
+    
+    async def ndjson_stream():
+        started = time.perf_counter()
+        pending = [asyncio.create_task(run_item(i, item)) for i, item in enumerate(request.items)]
+        counts = {"ok": 0, "error": 0, "timeout": 0, "overloaded": 0}
+        try:
+            for finished in asyncio.as_completed(pending):
+                line = await finished
+                counts[line["status"]] += 1
+                yield json.dumps(line, default=str) + "\n"
+        finally:
+            for task in pending:
+                task.cancel()
+        elapsed = time.perf_counter() - started
+        yield json.dumps({"summary": {
+            "items": len(request.items),
+            **counts,
+            "max_concurrency": max_concurrency,
+            "elapsed_ms": round(elapsed * 1000, 1),
+            "items_per_second": round(len(request.items) / elapsed, 2) if elapsed > 0 else None
+        }}) + "\n"
+    
+    return StreamingResponse(ndjson_stream(), media_type="application/x-ndjson")
+
+
 @app.post("/api/analyze", response_model=AnalyzeResponse)
 async def analyze_problem(request: AnalyzeRequest):
     """
@@ -216,7 +595,7 @@ async def analyze_problem(request: AnalyzeRequest):
         chains = get_or_create_reasoning_chains("analysis", request.config)
         
         # Analyze problem
-        analysis = chains.analyze_problem(request.problem, request.context)
+        analysis = await chains.aanalyze_problem(request.problem, request.context)
         
         return AnalyzeResponse(
             analysis=analysis,
@@ -230,22 +609,43 @@ async def analyze_problem(request: AnalyzeRequest):
 @app.get("/api/history/{session_id}")
 async def get_conversation_history(session_id: str):
     """Get conversation history for a session"""
-    if session_id not in agent_systems:
+    agent_system = agent_systems.get(session_id)
+    if session_backend is not None:
+        state = await asyncio.to_thread(session_backend.load, session_id)
+        if state is None:
+            return {"history": [], "session_id": session_id}
+        if agent_system is not None:
+            if state.get("version", 0) > agent_system.state_version:
+                agent_system.load_state(state)
+        else:
+            history = state.get("conversation_history", [])
+            return {
+                "history": history,
+                "session_id": session_id,
+                "message_count": len(history),
+                "summary": state.get("conversation_memory", {}).get("summary", "")
+            }
+    if agent_system is None:
         return {"history": [], "session_id": session_id}
     
-    history = agent_systems[session_id].get_conversation_history()
+    history = agent_system.get_conversation_history()
     return {
         "history": history,
         "session_id": session_id,
-        "message_count": len(history)
+        "message_count": len(history),
+        "summary": agent_system.conversation_memory.summary,
+        "memory": agent_system.conversation_memory.stats()
     }
 
 
 @app.delete("/api/history/{session_id}")
 async def clear_conversation_history(session_id: str):
     """Clear conversation history for a session"""
-    if session_id in agent_systems:
-        agent_systems[session_id].clear_history()
+    agent_system = agent_systems.get(session_id)
+    if agent_system is not None:
+        agent_system.clear_history()
+    if session_backend is not None:
+        await asyncio.to_thread(session_backend.delete, session_id)
     
     return {
         "message": "History cleared",
@@ -256,10 +656,10 @@ async def clear_conversation_history(session_id: str):
 @app.delete("/api/session/{session_id}")
 async def delete_session(session_id: str):
     """Delete a session and its agent system"""
-    if session_id in agent_systems:
-        del agent_systems[session_id]
-    if session_id in reasoning_chains:
-        del reasoning_chains[session_id]
+    agent_systems.pop(session_id)
+    reasoning_chains.pop(session_id)
+    if session_backend is not None:
+        await asyncio.to_thread(session_backend.delete, session_id)
     
     return {
         "message": "Session deleted",
@@ -270,9 +670,13 @@ async def delete_session(session_id: str):
 @app.get("/api/sessions")
 async def list_sessions():
     """List all active sessions"""
+    if session_backend is not None:
+        sessions = await asyncio.to_thread(session_backend.keys)
+    else:
+        sessions = agent_systems.keys()
     return {
-        "sessions": list(agent_systems.keys()),
-        "count": len(agent_systems)
+        "sessions": sessions,
+        "count": len(sessions)
     }
 
 
@@ -299,7 +703,7 @@ async def test_multi_agent_system(config: AgentConfig):
             ]
         }
         
-        result = agent_system.process_task(
+        result = await agent_system.aprocess_task(
             task="Search for 'AI agents'",
             page_data=sample_page
         )
@@ -313,6 +717,29 @@ async def test_multi_agent_system(config: AgentConfig):
         raise HTTPException(status_code=500, detail=f"Test failed: {str(e)}")
 
 
+@app.middleware("http")
+async def track_model_activity(request: Request, call_next):
+    """API requests keep the warmed models loaded"""
+    if model_warmer is not None and request.url.path.startswith("/api/"):
+        model_warmer.touch()
+    return await call_next(request)
+
+
+@app.on_event("startup")
+async def warm_models():
+    """Load the configured models in the background so the first request finds them ready"""
+    if model_warmer is not None:
+        model_warmer.start()
+
+
+@app.on_event("shutdown")
+async def close_llm_clients():
+    """Close pooled connections to the model servers"""
+    if model_warmer is not None:
+        await model_warmer.stop()
+    await get_llm_registry().aclose()
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
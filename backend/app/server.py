@@ -0,0 +1,36 @@
+"""
+Backend entry point
+Serves the full multi-agent backend or the simple extraction backend,
+chosen by BACKEND_MODE. Only the selected app is imported.
+
+Usage:
+    BACKEND_MODE=simple uvicorn app.server:app --port 8001
+"""
+
+import os
+import sys
+
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config import Config
+
+BACKEND_MODES = ("full", "simple")
+
+
+def load_app(mode: str = Config.BACKEND_MODE):
+    """The ASGI app for a backend mode"""
+    if mode == "simple":
+        from app.simple_main import app
+    elif mode == "full":
+        from app.main import app
+    else:
+        raise ValueError(f"Unknown backend mode: {mode} (expected one of {', '.join(BACKEND_MODES)})")
+    return app
+
+
+app = load_app()
+
+
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host=Config.HOST, port=Config.PORT)
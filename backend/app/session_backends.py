@@ -0,0 +1,187 @@
+"""
+Session state backends
+Serialized conversation history and agent memory kept outside the worker
+process, so several uvicorn workers (or hosts) can serve the same session
+"""
+
+from typing import Any, Dict, List, Optional
+import json
+import sqlite3
+import threading
+import time
+
+
+class SessionBackend:
+    """
+    Interface for stores of serialized session state (JSON-compatible dicts)
+    
+    Methods block on disk or network I/O; async callers run them in a thread.
+    """
+    
+    name = "base"
+    
+    def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        """Return the saved state, or None when the session is unknown"""
+        raise NotImplementedError
+    
+    def save(self, session_id: str, state: Dict[str, Any]):
+        """Store the session's state, replacing what was there"""
+        raise NotImplementedError
+    
+    def delete(self, session_id: str):
+        """Forget the session"""
+        raise NotImplementedError
+    
+    def keys(self) -> List[str]:
+        """Session IDs with saved state"""
+        raise NotImplementedError
+    
+    def stats(self) -> Dict[str, Any]:
+        return {"backend": self.name}
+
+
+class SQLiteSessionBackend(SessionBackend):
+    """
+    Session state in a SQLite file
+    
+    Uses WAL mode so workers on the same host can share the file; sessions
+    not saved for ttl seconds are dropped.
+    """
+    
+    name = "sqlite"
+    
+    def __init__(self, path: str, ttl: Optional[float] = 1800):
+        self.path = path
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, timeout=10)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS session_state ("
+            "session_id TEXT PRIMARY KEY, state TEXT NOT NULL, updated_at REAL NOT NULL)"
+        )
+        self._db.commit()
+    
+    def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT state, updated_at FROM session_state WHERE session_id = ?", (session_id,)
+            ).fetchone()
+        if row is None or self._expired(row[1]):
+            return None
+        return json.loads(row[0])
+    
+    def save(self, session_id: str, state: Dict[str, Any]):
+        raw = json.dumps(state, default=str)
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO session_state (session_id, state, updated_at) VALUES (?, ?, ?)",
+                (session_id, raw, now)
+            )
+            if self.ttl:
+                self._db.execute("DELETE FROM session_state WHERE updated_at <= ?", (now - self.ttl,))
+            self._db.commit()
+    
+    def delete(self, session_id: str):
+        with self._lock:
+            self._db.execute("DELETE FROM session_state WHERE session_id = ?", (session_id,))
+            self._db.commit()
+    
+    def keys(self) -> List[str]:
+        cutoff = time.time() - self.ttl if self.ttl else 0
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT session_id FROM session_state WHERE updated_at > ? ORDER BY updated_at", (cutoff,)
+            ).fetchall()
+        return [row[0] for row in rows]
+    
+    def stats(self) -> Dict[str, Any]:
+        cutoff = time.time() - self.ttl if self.ttl else 0
+        with self._lock:
+            count = self._db.execute(
+                "SELECT COUNT(*) FROM session_state WHERE updated_at > ?", (cutoff,)
+            ).fetchone()[0]
+        return {"backend": self.name, "path": self.path, "sessions": count}
+    
+    def _expired(self, updated_at: float) -> bool:
+        return bool(self.ttl) and updated_at <= time.time() - self.ttl
+
+
+class RedisSessionBackend(SessionBackend):
+    """
+    Session state in Redis or a Redis-compatible server (Valkey, KeyDB, ...)
+    
+    Keys expire after ttl seconds without a save. A sorted set of session
+    IDs scored by last save time indexes them, so listing and counting
+    sessions never scans the keyspace. Needs the optional redis package,
+    imported only when this backend is selected.
+    """
+    
+    name = "redis"
+    
+    def __init__(self, url: str = "redis://localhost:6379/0", ttl: Optional[float] = 1800,
+                 prefix: str = "extendai:session:"):
+        try:
+            import redis
+        except ImportError as e:
+            raise RuntimeError("SESSION_BACKEND=redis needs the redis package: pip install redis") from e
+        self.url = url
+        self.ttl = ttl
+        self.prefix = prefix
+        # Outside the prefix so no session ID can collide with it
+        self.index_key = prefix.rstrip(":") + "-index"
+        self._client = redis.Redis.from_url(url)
+    
+    def load(self, session_id: str) -> Optional[Dict[str, Any]]:
+        raw = self._client.get(self.prefix + session_id)
+        return json.loads(raw) if raw is not None else None
+    
+    def save(self, session_id: str, state: Dict[str, Any]):
+        raw = json.dumps(state, default=str)
+        pipe = self._client.pipeline()
+        if self.ttl:
+            pipe.set(self.prefix + session_id, raw, ex=int(self.ttl))
+        else:
+            pipe.set(self.prefix + session_id, raw)
+        pipe.zadd(self.index_key, {session_id: time.time()})
+        pipe.execute()
+    
+    def delete(self, session_id: str):
+        pipe = self._client.pipeline()
+        pipe.delete(self.prefix + session_id)
+        pipe.zrem(self.index_key, session_id)
+        pipe.execute()
+    
+    def keys(self) -> List[str]:
+        self._drop_expired()
+        return [
+            key.decode() if isinstance(key, bytes) else key
+            for key in self._client.zrange(self.index_key, 0, -1)
+        ]
+    
+    def stats(self) -> Dict[str, Any]:
+        self._drop_expired()
+        return {"backend": self.name, "url": self.url, "sessions": self._client.zcard(self.index_key)}
+    
+    def _drop_expired(self):
+        """Remove index entries whose keys Redis has already expired"""
+        if self.ttl:
+            self._client.zremrangebyscore(self.index_key, "-inf", time.time() - self.ttl)
+
+
+def create_session_backend(kind: str, url: Optional[str] = None, ttl: Optional[float] = 1800) -> Optional[SessionBackend]:
+    """
+    Backend for a SESSION_BACKEND setting
+    
+    "memory" returns None: state then lives only in the worker's own
+    agent systems, which is fine for a single worker.
+    """
+    kind = (kind or "memory").lower()
+    if kind == "memory":
+        return None
+    if kind == "sqlite":
+        return SQLiteSessionBackend(url or "sessions.db", ttl=ttl)
+    if kind == "redis":
+        return RedisSessionBackend(url or "redis://localhost:6379/0", ttl=ttl)
+    raise ValueError(f"Unknown session backend: {kind}")
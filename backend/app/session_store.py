@@ -0,0 +1,137 @@
+"""
+Bounded session store for per-tab agent state
+LRU + idle-TTL eviction with a per-session memory cap
+"""
+
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+import threading
+import time
+
+
+class SessionStore:
+    """
+    Maps session IDs to live objects (agent systems, reasoning chains)
+    
+    Sessions idle for longer than idle_ttl seconds are evicted, and once
+    max_sessions is reached the least recently used session makes room for
+    a new one. Values exposing set_memory_cap() are capped at memory_cap
+    messages when they are stored.
+    """
+    
+    def __init__(self, max_sessions: int = 100, idle_ttl: float = 1800,
+                 memory_cap: Optional[int] = 50, name: str = "sessions"):
+        self.max_sessions = max_sessions
+        self.idle_ttl = idle_ttl
+        self.memory_cap = memory_cap
+        self.name = name
+        self._sessions: "OrderedDict[str, Any]" = OrderedDict()
+        self._last_access: Dict[str, float] = {}
+        self._lock = threading.Lock()
+        self._metrics = {
+            "hits": 0,
+            "misses": 0,
+            "created": 0,
+            "deleted": 0,
+            "evicted_lru": 0,
+            "evicted_ttl": 0
+        }
+    
+    def get(self, session_id: str) -> Optional[Any]:
+        """Return the session's value and mark it as recently used"""
+        with self._lock:
+            self._evict_expired()
+            value = self._sessions.get(session_id)
+            if value is None:
+                self._metrics["misses"] += 1
+                return None
+            self._metrics["hits"] += 1
+            self._touch(session_id)
+            return value
+    
+    def get_or_create(self, session_id: str, factory: Callable[[], Any]) -> Any:
+        """Return the session's value, creating it with factory() if needed"""
+        value = self.get(session_id)
+        if value is not None:
+            return value
+        
+        value = factory()
+        with self._lock:
+            # Another request may have created it while the factory ran
+            existing = self._sessions.get(session_id)
+            if existing is not None:
+                self._touch(session_id)
+                return existing
+            self._insert(session_id, value)
+            self._metrics["created"] += 1
+        return value
+    
+    def put(self, session_id: str, value: Any):
+        """Store a value for the session"""
+        with self._lock:
+            self._evict_expired()
+            self._insert(session_id, value)
+    
+    def pop(self, session_id: str) -> Optional[Any]:
+        """Remove and return the session's value"""
+        with self._lock:
+            self._last_access.pop(session_id, None)
+            value = self._sessions.pop(session_id, None)
+            if value is not None:
+                self._metrics["deleted"] += 1
+            return value
+    
+    def keys(self) -> List[str]:
+        """Active session IDs, least recently used first"""
+        with self._lock:
+            self._evict_expired()
+            return list(self._sessions.keys())
+    
+    def __contains__(self, session_id: str) -> bool:
+        with self._lock:
+            self._evict_expired()
+            return session_id in self._sessions
+    
+    def __len__(self) -> int:
+        return len(self._sessions)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Session count, limits and eviction metrics"""
+        with self._lock:
+            return {
+                "active": len(self._sessions),
+                "max_sessions": self.max_sessions,
+                "idle_ttl_seconds": self.idle_ttl,
+                "memory_cap": self.memory_cap,
+                **self._metrics
+            }
+    
+    def _insert(self, session_id: str, value: Any):
+        """Insert under the lock, evicting the LRU session when full"""
+        if self.memory_cap is not None and hasattr(value, "set_memory_cap"):
+            value.set_memory_cap(self.memory_cap)
+        self._sessions[session_id] = value
+        self._touch(session_id)
+        while len(self._sessions) > self.max_sessions:
+            evicted, _ = self._sessions.popitem(last=False)
+            self._last_access.pop(evicted, None)
+            self._metrics["evicted_lru"] += 1
+            print(f"[{self.name}] Evicted least recently used session {evicted}")
+    
+    def _touch(self, session_id: str):
+        self._sessions.move_to_end(session_id)
+        self._last_access[session_id] = time.monotonic()
+    
+    def _evict_expired(self):
+        """Drop idle sessions; they sit at the front since the dict is kept in access order"""
+        if not self.idle_ttl:
+            return
+        cutoff = time.monotonic() - self.idle_ttl
+        while self._sessions:
+            oldest = next(iter(self._sessions))
+            if self._last_access.get(oldest, 0) > cutoff:
+                break
+            self._sessions.popitem(last=False)
+            self._last_access.pop(oldest, None)
+            self._metrics["evicted_ttl"] += 1
+            print(f"[{self.name}] Evicted idle session {oldest}")
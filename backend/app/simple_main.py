@@ -3,26 +3,26 @@ Simple FastAPI backend for AI Agent Browser Extension
 Focuses on content extraction and delivery
 """
 
-from fastapi import FastAPI, HTTPException
-from fastapi.middleware.cors import CORSMiddleware
+from fastapi import HTTPException
 from pydantic import BaseModel
 from typing import List, Dict, Any, Optional
 import json
+import os
 import re
+import sys
 
-app = FastAPI(
+# Add parent directory to path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from agents.page_text import TextWindow
+from app.core import create_app
+
+# Opening plus task-relevant sentences of the page text
+summary_window = TextWindow(token_budget=80, passage_tokens=40)
+
+app = create_app(
     title="AI Agent Simple Backend",
     description="Lightweight backend for content extraction",
-    version="1.0.0"
-)
-
-# CORS middleware - allow Chrome extension
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=["*"],
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    version="1.0.0",
     expose_headers=["*"]
 )
 
@@ -73,13 +73,13 @@ def extract_headlines(page_data: Dict) -> str:
     
     return "No headlines found on this page."
 
-def extract_summary(page_data: Dict) -> str:
+def extract_summary(page_data: Dict, task: str = "") -> str:
     """Extract a simple summary from page data"""
     title = page_data.get('title', '')
-    text = page_data.get('text', '')
     
-    # Take first 200 characters as summary
-    summary_text = text[:200] + "..." if len(text) > 200 else text
+    # Whole sentences within a small token budget: the opening, then those matching the task
+    summary_page, _ = summary_window.apply(page_data, task)
+    summary_text = summary_page['text']
     
     return f"This page is about: {title}\n\nSummary: {summary_text}"
 
@@ -104,7 +104,7 @@ def process_task_simple(task: str, page_data: Dict) -> Dict[str, Any]:
         result = extract_headlines(page_data)
         understanding = "User wants to see the top headlines from this page"
     elif any(keyword in task_lower for keyword in ['summar', 'about', 'what is']):
-        result = extract_summary(page_data)
+        result = extract_summary(page_data, task)
         understanding = "User wants a summary of this page"
     else:
         # Check if we have meaningful page data
@@ -0,0 +1,405 @@
+"""
+Load driver for the backend
+Replays page fixtures against /api/task, /api/analyze or the simple backend
+at a fixed concurrency and reports latency percentiles, throughput,
+server memory growth, answer quality against the fixtures' expected
+keywords and, against the mock model server, the prompt cache hit ratio and
+mean time to first token
+
+Usage (from backend/):
+    # Everything local: mock LLM server + backend started by the driver
+    python benchmarks/load_driver.py --target task --spawn --mock --requests 200 --concurrency 8
+    
+    # Fused single-call mode against the three-stage pipeline, same load for each
+    python benchmarks/load_driver.py --target task --spawn --pipeline-mode sequential --pipeline-mode fused
+    
+    # Against servers that are already running
+    python benchmarks/load_driver.py --target task --base-url http://localhost:8000 \\
+        --llm-url http://localhost:11500/v1 --server-pid 12345
+"""
+
+from typing import Any, Dict, List, Optional
+import argparse
+import asyncio
+import glob
+import itertools
+import json
+import math
+import os
+import subprocess
+import sys
+import time
+
+import httpx
+
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURES_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures")
+
+# target → (uvicorn app, endpoint path)
+TARGETS = {
+    "task": ("app.main:app", "/api/task"),
+    "analyze": ("app.main:app", "/api/analyze"),
+    "simple": ("app.simple_main:app", "/api/task"),
+}
+
+
+def load_fixtures(pattern: str) -> List[Dict[str, Any]]:
+    """Fixture files: {"tasks": [...], "expected": {task: [keyword, ...]}, "page_data": {...}}"""
+    fixtures = []
+    for path in sorted(glob.glob(pattern)):
+        with open(path) as f:
+            fixture = json.load(f)
+        fixture["name"] = os.path.splitext(os.path.basename(path))[0]
+        fixtures.append(fixture)
+    if not fixtures:
+        raise SystemExit(f"No fixtures match {pattern}")
+    return fixtures
+
+
+def build_request(target: str, fixture: Dict[str, Any], task: str, index: int, args,
+                  pipeline_mode: Optional[str] = None) -> Dict[str, Any]:
+    """Request body for one call"""
+    session_id = f"bench-{index % args.sessions}"
+    if target == "simple":
+        return {
+            "task": task,
+            "page_data": fixture["page_data"],
+            "config": {"api_key": "benchmark", "model": args.model, "base_url": args.llm_url,
+                       "personality": "a helpful assistant"},
+            "session_id": session_id
+        }
+    config = {"api_key": "benchmark", "chat_model": args.model, "reasoning_model": args.model,
+              "base_url": args.llm_url}
+    if target == "analyze":
+        page = fixture["page_data"]
+        return {"problem": task, "context": {"url": page["url"], "title": page["title"]}, "config": config}
+    body = {"task": task, "page_data": fixture["page_data"], "session_id": session_id, "config": config}
+    if pipeline_mode:
+        body["pipeline_mode"] = pipeline_mode
+    return body
+
+
+def score_answer(response: Dict[str, Any], keywords: Optional[List[str]]) -> Dict[str, bool]:
+    """
+    Quality checks for one /api/task response
+    
+    valid: no stage's JSON stayed invalid after its retry (fallbacks that only
+        format the result, such as result:generic_enhancement, do not count)
+    answered: a result or at least one action came back
+    keywords: every expected keyword appears in the result or actions (None without expectations)
+    """
+    insights = response.get("agent_insights") or {}
+    result = response.get("result") or ""
+    actions = response.get("actions") or []
+    scores = {
+        "valid": "failed" not in (insights.get("json_parse") or {}).values(),
+        "answered": bool(actions) or bool(result.strip()),
+        "keywords": None
+    }
+    if keywords:
+        haystack = (result + " " + json.dumps(actions)).lower()
+        scores["keywords"] = all(keyword.lower() in haystack for keyword in keywords)
+    return scores
+
+
+def quality_report(scores: List[Dict[str, bool]]) -> Optional[Dict[str, Any]]:
+    """Share of responses passing each quality check"""
+    if not scores:
+        return None
+    rate = lambda values: round(sum(values) / len(values), 3) if values else None
+    return {
+        "valid_rate": rate([score["valid"] for score in scores]),
+        "answered_rate": rate([score["answered"] for score in scores]),
+        "keyword_rate": rate([score["keywords"] for score in scores if score["keywords"] is not None])
+    }
+
+
+def percentile(values: List[float], pct: float) -> Optional[float]:
+    """Nearest-rank percentile"""
+    if not values:
+        return None
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def rss_mb(pid: Optional[int]) -> Optional[float]:
+    """Resident memory of a process and its children (workers), in MB"""
+    if pid is None:
+        return None
+    try:
+        import psutil
+        process = psutil.Process(pid)
+        total = process.memory_info().rss + sum(c.memory_info().rss for c in process.children(recursive=True))
+        return total / 1024 / 1024
+    except ImportError:
+        pass
+    except Exception:
+        return None
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        return None
+    return None
+
+
+async def llm_stats(llm_url: str) -> Optional[Dict[str, Any]]:
+    """Counters of the mock model server, or None for servers without /stats"""
+    root = llm_url.rstrip("/")
+    if root.endswith("/v1"):
+        root = root[:-3]
+    try:
+        async with httpx.AsyncClient() as client:
+            response = await client.get(f"{root}/stats", timeout=5)
+        stats = response.json() if response.status_code == 200 else None
+    except (httpx.HTTPError, ValueError):
+        return None
+    return stats if isinstance(stats, dict) and "cached_prompt_tokens" in stats else None
+
+
+def llm_report(before: Optional[Dict[str, Any]], after: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """Model server counters over the measured phase"""
+    if before is None or after is None:
+        return None
+    delta = {key: after[key] - before.get(key, 0) for key in
+             ("requests", "prompt_tokens", "cached_prompt_tokens", "first_token_seconds")}
+    return {
+        "calls": delta["requests"],
+        "prompt_tokens": delta["prompt_tokens"],
+        "cached_prompt_tokens": delta["cached_prompt_tokens"],
+        "cache_hit_ratio": round(delta["cached_prompt_tokens"] / delta["prompt_tokens"], 3)
+                           if delta["prompt_tokens"] else None,
+        "mean_ttft_ms": round(delta["first_token_seconds"] / delta["requests"] * 1000, 1)
+                        if delta["requests"] else None
+    }
+
+
+async def wait_until_up(url: str, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    async with httpx.AsyncClient() as client:
+        while time.monotonic() < deadline:
+            try:
+                if (await client.get(url, timeout=2)).status_code < 500:
+                    return
+            except httpx.HTTPError:
+                pass
+            await asyncio.sleep(0.25)
+    raise SystemExit(f"{url} did not come up within {timeout}s")
+
+
+def spawn(command: List[str], env: Dict[str, str]) -> subprocess.Popen:
+    return subprocess.Popen(command, cwd=BACKEND_DIR, env={**os.environ, **env},
+                            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+
+
+async def run_load(args, fixtures: List[Dict[str, Any]], server_pid: Optional[int],
+                   pipeline_mode: Optional[str] = None) -> Dict[str, Any]:
+    """Send requests at the configured concurrency and collect results"""
+    path = TARGETS[args.target][1]
+    calls = itertools.cycle([(fixture, task) for fixture in fixtures for task in fixture["tasks"]])
+    counter = itertools.count()
+    latencies: List[float] = []
+    errors: Dict[str, int] = {}
+    scores: List[Dict[str, bool]] = []
+    speculation: Dict[str, int] = {}
+    memory: List[float] = []
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=args.timeout, limits=limits) as client:
+        async def one(index: int, record: bool):
+            fixture, task = next(calls)
+            body = build_request(args.target, fixture, task, index, args, pipeline_mode)
+            started = time.perf_counter()
+            try:
+                response = await client.post(path, json=body)
+                outcome = "ok" if response.status_code == 200 else f"http_{response.status_code}"
+            except httpx.HTTPError as e:
+                outcome = type(e).__name__
+            elapsed = time.perf_counter() - started
+            if record:
+                if outcome == "ok":
+                    latencies.append(elapsed)
+                    if args.target == "task":
+                        data = response.json()
+                        scores.append(score_answer(data, fixture.get("expected", {}).get(task)))
+                        outcome = ((data.get("agent_insights") or {}).get("speculation") or {}).get("outcome")
+                        if outcome:
+                            speculation[outcome] = speculation.get(outcome, 0) + 1
+                else:
+                    errors[outcome] = errors.get(outcome, 0) + 1
+        
+        # Warm-up requests are not measured
+        await asyncio.gather(*(one(i, False) for i in range(args.warmup)))
+        memory_start = rss_mb(server_pid)
+        llm_before = await llm_stats(args.llm_url)
+        
+        stop_at = time.monotonic() + args.duration if args.duration else None
+        
+        async def worker():
+            while True:
+                index = next(counter)
+                if stop_at is None and index >= args.requests:
+                    return
+                if stop_at is not None and time.monotonic() >= stop_at:
+                    return
+                await one(index, True)
+        
+        async def sample_memory():
+            while True:
+                value = rss_mb(server_pid)
+                if value is not None:
+                    memory.append(value)
+                await asyncio.sleep(0.5)
+        
+        sampler = asyncio.create_task(sample_memory())
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        wall = time.perf_counter() - started
+        sampler.cancel()
+    
+    llm_after = await llm_stats(args.llm_url)
+    memory_end = rss_mb(server_pid)
+    completed = len(latencies) + sum(errors.values())
+    ms = lambda value: round(value * 1000, 1) if value is not None else None
+    return {
+        "target": args.target,
+        "pipeline_mode": pipeline_mode,
+        "concurrency": args.concurrency,
+        "requests": completed,
+        "ok": len(latencies),
+        "errors": errors,
+        "wall_seconds": round(wall, 2),
+        "rps": round(len(latencies) / wall, 2) if wall else None,
+        "latency_ms": {
+            "p50": ms(percentile(latencies, 50)),
+            "p95": ms(percentile(latencies, 95)),
+            "p99": ms(percentile(latencies, 99)),
+            "mean": ms(sum(latencies) / len(latencies)) if latencies else None,
+            "max": ms(max(latencies)) if latencies else None
+        },
+        "memory_mb": {
+            "start": round(memory_start, 1) if memory_start is not None else None,
+            "end": round(memory_end, 1) if memory_end is not None else None,
+            "peak": round(max(memory), 1) if memory else None,
+            "growth": round(memory_end - memory_start, 1) if None not in (memory_start, memory_end) else None
+        },
+        "quality": quality_report(scores),
+        "speculation": speculation or None,
+        "llm": llm_report(llm_before, llm_after)
+    }
+
+
+def print_report(report: Dict[str, Any]):
+    latency = report["latency_ms"]
+    memory = report["memory_mb"]
+    mode = f" ({report['pipeline_mode']})" if report["pipeline_mode"] else ""
+    print(f"\n=== {report['target']}{mode} @ concurrency {report['concurrency']} ===")
+    print(f"requests   {report['requests']} ({report['ok']} ok, errors: {report['errors'] or 'none'})")
+    print(f"throughput {report['rps']} req/s over {report['wall_seconds']} s")
+    print(f"latency    p50 {latency['p50']} ms | p95 {latency['p95']} ms | p99 {latency['p99']} ms | max {latency['max']} ms")
+    if memory["start"] is not None:
+        print(f"memory     {memory['start']} → {memory['end']} MB (peak {memory['peak']}, growth {memory['growth']})")
+    quality = report["quality"]
+    if quality is not None:
+        print(f"quality    valid JSON {quality['valid_rate']} | answered {quality['answered_rate']} | "
+              f"expected keywords {quality['keyword_rate']}")
+    speculation = report["speculation"]
+    if speculation is not None:
+        surveys = sum(speculation.values())
+        print(f"speculation {surveys} surveys | hit {speculation.get('hit', 0)} | partial {speculation.get('partial', 0)} | "
+              f"rerun {speculation.get('rerun', 0)} (hit rate {round(speculation.get('hit', 0) / surveys, 3)})")
+    llm = report["llm"]
+    if llm is not None:
+        print(f"llm        {llm['calls']} calls | prompt cache hit {llm['cache_hit_ratio']} "
+              f"({llm['cached_prompt_tokens']}/{llm['prompt_tokens']} tokens) | mean TTFT {llm['mean_ttft_ms']} ms")
+
+
+def print_comparison(reports: List[Dict[str, Any]]):
+    """Latency and quality of each pipeline mode relative to the first one"""
+    baseline = reports[0]
+    print(f"\n=== compared with {baseline['pipeline_mode']} ===")
+    for report in reports[1:]:
+        p50, base_p50 = report["latency_ms"]["p50"], baseline["latency_ms"]["p50"]
+        speedup = round(base_p50 / p50, 2) if p50 and base_p50 else None
+        quality, base_quality = report["quality"] or {}, baseline["quality"] or {}
+        deltas = " | ".join(
+            f"{name} {quality.get(name)} vs {base_quality.get(name)}"
+            for name in ("valid_rate", "keyword_rate")
+        )
+        print(f"{report['pipeline_mode']:<12}p50 speedup {speedup}x | {deltas}")
+
+
+async def main_async(args):
+    fixtures = load_fixtures(args.fixtures)
+    processes: List[subprocess.Popen] = []
+    server_pid = args.server_pid
+    try:
+        if args.mock:
+            processes.append(spawn([sys.executable, "benchmarks/mock_llm_server.py", "--port", str(args.mock_port),
+                                    "--latency", str(args.mock_latency),
+                                    "--tokens-per-second", str(args.mock_tokens_per_second)], {}))
+            await wait_until_up(f"http://127.0.0.1:{args.mock_port}/v1/models")
+        if args.spawn:
+            env = dict(item.split("=", 1) for item in args.env)
+            env.setdefault("BASE_URL", args.llm_url)
+            server = spawn([sys.executable, "-m", "uvicorn", TARGETS[args.target][0],
+                            "--port", str(args.port), "--workers", str(args.workers), "--log-level", "warning"], env)
+            processes.append(server)
+            server_pid = server.pid
+            await wait_until_up(f"{args.base_url}/health")
+        
+        reports = []
+        for pipeline_mode in args.pipeline_mode or [None]:
+            reports.append(await run_load(args, fixtures, server_pid, pipeline_mode))
+            print_report(reports[-1])
+        if len(reports) > 1:
+            print_comparison(reports)
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump(reports[0] if len(reports) == 1 else reports, f, indent=2)
+    finally:
+        for process in reversed(processes):
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backend load driver")
+    parser.add_argument("--target", choices=sorted(TARGETS), default="task")
+    parser.add_argument("--base-url", help="Backend URL (default: http://127.0.0.1:<port>)")
+    parser.add_argument("--port", type=int, default=8000, help="Port of the backend started with --spawn")
+    parser.add_argument("--spawn", action="store_true", help="Start the backend for the target")
+    parser.add_argument("--workers", type=int, default=1, help="uvicorn workers for --spawn")
+    parser.add_argument("--env", action="append", default=[], help="KEY=VALUE for the spawned backend (repeatable)")
+    parser.add_argument("--server-pid", type=int, help="PID of an already running backend, for memory sampling")
+    parser.add_argument("--mock", action="store_true", help="Start the mock LLM server")
+    parser.add_argument("--mock-port", type=int, default=11500)
+    parser.add_argument("--mock-latency", type=float, default=0.2)
+    parser.add_argument("--mock-tokens-per-second", type=float, default=50)
+    parser.add_argument("--llm-url", help="Model server base URL (default: the mock server)")
+    parser.add_argument("--model", default="mock")
+    parser.add_argument("--pipeline-mode", action="append", choices=["sequential", "speculative", "fused"],
+                        help="Pipeline mode sent with /api/task requests; repeat to compare modes in one run")
+    parser.add_argument("--fixtures", default=os.path.join(FIXTURES_DIR, "*.json"))
+    parser.add_argument("--requests", type=int, default=100, help="Measured requests (ignored with --duration)")
+    parser.add_argument("--duration", type=float, help="Run for this many seconds instead of a request count")
+    parser.add_argument("--concurrency", type=int, default=4)
+    parser.add_argument("--warmup", type=int, default=4)
+    parser.add_argument("--sessions", type=int, default=8, help="Distinct session IDs to spread requests over")
+    parser.add_argument("--timeout", type=float, default=120)
+    parser.add_argument("--json", help="Also write the report to this file")
+    args = parser.parse_args()
+    args.base_url = args.base_url or f"http://127.0.0.1:{args.port}"
+    args.llm_url = args.llm_url or f"http://127.0.0.1:{args.mock_port}/v1"
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
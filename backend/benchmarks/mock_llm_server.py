@@ -0,0 +1,235 @@
+"""
+Mock OpenAI-compatible chat completions server for benchmarks
+Answers /v1/chat/completions (plain and streamed) with canned or recorded
+responses after a configurable time to first token and token rate, so the
+backend can be load tested without a real model. Prompt prefixes are cached
+in blocks the way vLLM and Ollama reuse their KV cache: only the uncached
+part of a prompt adds prefill time to the first token.
+
+Usage:
+    python benchmarks/mock_llm_server.py --port 11500 --latency 0.3 --tokens-per-second 40
+"""
+
+from typing import Any, Dict, List, Optional, Tuple
+from collections import OrderedDict
+import argparse
+import asyncio
+import hashlib
+import json
+import random
+import re
+import time
+import uuid
+
+from fastapi import FastAPI, Request
+from fastapi.responses import StreamingResponse
+import uvicorn
+
+
+# Canned responses by agent, matched against the prompt in order
+CANNED_RESPONSES = [
+    (r"You are Planner", json.dumps({
+        "understanding": "User wants the main content of the page",
+        "approach": "Find the elements that hold the requested content and read them",
+        "steps": ["Locate the main headings", "Read their text", "Summarize for the user"],
+        "risks": ["Content may be loaded dynamically"]
+    })),
+    (r"You are Analyzer", json.dumps({
+        "analysis": "The page lists its main content as headings and links",
+        "element_mapping": [
+            {"step": "Locate the main headings", "element": {"type": "h2"}, "action": "extract",
+             "value": "", "selector": "h2"},
+            {"step": "Read the heading text", "element": {"type": "h2"}, "action": "extract",
+             "value": "", "selector": "h2"}
+        ]
+    })),
+    (r"You are Executor", json.dumps({
+        "actions": [{"type": "extract", "selector": "h2", "value": "", "description": "Read the headings"}],
+        "result": "Here is what the page contains: the main headings and their linked stories."
+    })),
+    (r"You are Navigator", json.dumps({
+        "understanding": "User wants the main content of the page",
+        "approach": "Find the elements that hold the requested content and read them",
+        "steps": ["Locate the main headings", "Read their text", "Summarize for the user"],
+        "risks": ["Content may be loaded dynamically"],
+        "analysis": "The page lists its main content as headings and links",
+        "element_mapping": [
+            {"step": "Locate the main headings", "element": {"type": "h2"}, "action": "extract",
+             "value": "", "selector": "h2"},
+            {"step": "Read the heading text", "element": {"type": "h2"}, "action": "extract",
+             "value": "", "selector": "h2"}
+        ],
+        "actions": [{"type": "extract", "selector": "h2", "value": "", "description": "Read the headings"}],
+        "result": "Here is what the page contains: the main headings and their linked stories."
+    })),
+    (r"Validate these proposed browser actions", json.dumps({"verdicts": []})),
+    (r"Validate this proposed action", "The action is safe and targets an element on the page.\nVERDICT: VALID"),
+    (r"Update the running summary", "The user has been asking about the content of the current page."),
+    (r".", "Analysis: the request is straightforward. Identify the relevant element, act on it, "
+           "and confirm the page changed as expected."),
+]
+
+
+class MockLLM:
+    """Response selection, timing and counters for the mock server"""
+    
+    def __init__(self, latency: float = 0.2, tokens_per_second: float = 50, jitter: float = 0.1,
+                 responses: Optional[List[Dict[str, str]]] = None, prefill_tokens_per_second: float = 2000,
+                 cache_block_tokens: int = 16, cache_blocks: int = 4096):
+        self.latency = latency
+        self.tokens_per_second = tokens_per_second
+        self.jitter = jitter
+        self.prefill_tokens_per_second = prefill_tokens_per_second
+        self.cache_block_tokens = cache_block_tokens
+        self.cache_blocks = cache_blocks
+        self.prefix_cache: "OrderedDict[str, None]" = OrderedDict()  # chained block hash → None, LRU order
+        recorded = [(item["match"], item["response"]) for item in responses or []]
+        self.responses = [(re.compile(pattern), text) for pattern, text in recorded + CANNED_RESPONSES]
+        self.stats = {"requests": 0, "streamed": 0, "in_flight": 0, "max_in_flight": 0,
+                      "prompt_tokens": 0, "cached_prompt_tokens": 0, "completion_tokens": 0,
+                      "first_token_seconds": 0.0, "warmups": 0}
+    
+    def respond(self, prompt: str) -> str:
+        for pattern, text in self.responses:
+            if pattern.search(prompt):
+                return text
+        return ""
+    
+    def prefill(self, prompt: str) -> Tuple[int, float]:
+        """
+        Look the prompt up in the prefix cache and add its blocks
+        
+        Returns:
+            (cached prompt tokens, seconds to prefill the rest)
+        """
+        pieces = self.tokens(prompt)
+        block_size = self.cache_block_tokens
+        cached_blocks = 0
+        matching = True
+        digest = hashlib.sha256()
+        for start in range(0, len(pieces) - len(pieces) % block_size, block_size):
+            digest.update("".join(pieces[start:start + block_size]).encode())
+            key = digest.hexdigest()
+            if matching and key in self.prefix_cache:
+                self.prefix_cache.move_to_end(key)
+                cached_blocks += 1
+                continue
+            matching = False
+            self.prefix_cache[key] = None
+            if len(self.prefix_cache) > self.cache_blocks:
+                self.prefix_cache.popitem(last=False)
+        
+        cached = cached_blocks * block_size
+        return cached, (len(pieces) - cached) / self.prefill_tokens_per_second
+    
+    def delay(self, seconds: float) -> float:
+        return max(0.0, seconds * (1 + random.uniform(-self.jitter, self.jitter)))
+    
+    @staticmethod
+    def tokens(text: str) -> List[str]:
+        """Split text into ~4 character pieces, roughly one token each"""
+        return [text[i:i + 4] for i in range(0, len(text), 4)] or [""]
+
+
+def create_app(mock: MockLLM) -> FastAPI:
+    app = FastAPI(title="Mock LLM server")
+    
+    @app.get("/v1/models")
+    async def models():
+        return {"object": "list", "data": [{"id": "mock", "object": "model", "owned_by": "benchmark"}]}
+    
+    @app.get("/stats")
+    async def stats():
+        return mock.stats
+    
+    @app.post("/api/generate")
+    async def generate(request: Request):
+        # Ollama's native endpoint, used by the backend's model warm-up (empty prompt: load only)
+        body = await request.json()
+        mock.stats["warmups"] += 1
+        return {"model": body.get("model", "mock"), "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+                "response": "", "done": True, "done_reason": "load", "load_duration": 0}
+    
+    @app.post("/v1/chat/completions")
+    async def chat_completions(request: Request):
+        body = await request.json()
+        prompt = "\n".join(str(m.get("content", "")) for m in body.get("messages", []))
+        text = mock.respond(prompt)
+        pieces = mock.tokens(text)
+        cached, prefill_seconds = mock.prefill(prompt)
+        first_token = mock.delay(mock.latency + prefill_seconds)
+        usage = {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(pieces),
+                 "total_tokens": len(prompt) // 4 + len(pieces),
+                 "prompt_tokens_details": {"cached_tokens": cached}}
+        completion_id = f"chatcmpl-{uuid.uuid4().hex[:12]}"
+        model = body.get("model", "mock")
+        
+        mock.stats["requests"] += 1
+        mock.stats["prompt_tokens"] += usage["prompt_tokens"]
+        mock.stats["cached_prompt_tokens"] += cached
+        mock.stats["first_token_seconds"] += first_token
+        mock.stats["completion_tokens"] += usage["completion_tokens"]
+        mock.stats["in_flight"] += 1
+        mock.stats["max_in_flight"] = max(mock.stats["max_in_flight"], mock.stats["in_flight"])
+        
+        if not body.get("stream"):
+            try:
+                await asyncio.sleep(first_token + mock.delay(len(pieces) / mock.tokens_per_second))
+            finally:
+                mock.stats["in_flight"] -= 1
+            return {
+                "id": completion_id, "object": "chat.completion", "created": int(time.time()), "model": model,
+                "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+                "usage": usage
+            }
+        
+        mock.stats["streamed"] += 1
+        
+        async def stream():
+            def chunk(delta: Dict[str, Any], finish_reason: Optional[str] = None) -> str:
+                payload = {"id": completion_id, "object": "chat.completion.chunk", "created": int(time.time()),
+                           "model": model, "choices": [{"index": 0, "delta": delta, "finish_reason": finish_reason}]}
+                return f"data: {json.dumps(payload)}\n\n"
+            
+            try:
+                await asyncio.sleep(first_token)
+                yield chunk({"role": "assistant", "content": ""})
+                for piece in pieces:
+                    await asyncio.sleep(mock.delay(1 / mock.tokens_per_second))
+                    yield chunk({"content": piece})
+                yield chunk({}, "stop")
+                yield "data: [DONE]\n\n"
+            finally:
+                mock.stats["in_flight"] -= 1
+        
+        return StreamingResponse(stream(), media_type="text/event-stream")
+    
+    return app
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock OpenAI-compatible LLM server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--latency", type=float, default=0.2, help="Seconds before the first token")
+    parser.add_argument("--tokens-per-second", type=float, default=50, help="Generation speed")
+    parser.add_argument("--prefill-tokens-per-second", type=float, default=2000,
+                        help="Prompt processing speed for the uncached part of a prompt")
+    parser.add_argument("--cache-block-tokens", type=int, default=16, help="Prefix cache block size")
+    parser.add_argument("--cache-blocks", type=int, default=4096, help="Prefix cache capacity in blocks")
+    parser.add_argument("--jitter", type=float, default=0.1, help="Random +/- fraction applied to delays")
+    parser.add_argument("--responses", help="JSON file with recorded responses: [{\"match\": regex, \"response\": text}]")
+    args = parser.parse_args()
+    
+    responses = None
+    if args.responses:
+        with open(args.responses) as f:
+            responses = json.load(f)
+    
+    mock = MockLLM(args.latency, args.tokens_per_second, args.jitter, responses,
+                   args.prefill_tokens_per_second, args.cache_block_tokens, args.cache_blocks)
+    uvicorn.run(create_app(mock), host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
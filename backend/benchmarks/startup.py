@@ -0,0 +1,143 @@
+"""
+Startup benchmark for the backend
+Measures, per backend mode, how long importing the app takes (with the
+heaviest packages from python -X importtime), whether LangChain was loaded,
+and how long a fresh uvicorn worker takes until /health answers
+
+Usage (from backend/):
+    python benchmarks/startup.py --runs 5
+    python benchmarks/startup.py --mode simple --json startup.json
+"""
+
+from typing import Any, Dict, List, Optional
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+import httpx
+
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Run in a fresh interpreter: seconds to import the app and the heavy packages it pulled in
+IMPORT_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import app.server
+elapsed = time.perf_counter() - started
+print(json.dumps({"seconds": elapsed, "loaded": sorted(
+    name for name in ("langchain", "langchain_core", "langchain_openai", "openai", "tiktoken") if name in sys.modules
+)}))
+"""
+
+
+def run_python(args: List[str], mode: str) -> subprocess.CompletedProcess:
+    env = {**os.environ, "BACKEND_MODE": mode}
+    return subprocess.run([sys.executable] + args, cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+
+
+def measure_import(mode: str) -> Dict[str, Any]:
+    """Import time of app.server in a fresh interpreter"""
+    probe = run_python(["-c", IMPORT_PROBE], mode)
+    if probe.returncode != 0:
+        raise SystemExit(f"Importing the {mode} app failed:\n{probe.stderr[-2000:]}")
+    return json.loads(probe.stdout.strip().splitlines()[-1])
+
+
+def heaviest_imports(mode: str, top: int) -> List[Dict[str, Any]]:
+    """Top-level packages by cumulative import time, from -X importtime"""
+    trace = run_python(["-X", "importtime", "-c", "import app.server"], mode)
+    packages: Dict[str, int] = {}
+    for line in trace.stderr.splitlines():
+        parts = line[len("import time:"):].split("|")
+        if not line.startswith("import time:") or len(parts) != 3 or not parts[1].strip().isdigit():
+            continue
+        # Nested imports are indented further; top-level ones carry their whole subtree
+        if parts[2][1:2] == " ":
+            continue
+        cumulative, package = parts[1].strip(), parts[2].strip().split(".")[0]
+        packages[package] = max(packages.get(package, 0), int(cumulative))
+    ranked = sorted(packages.items(), key=lambda item: item[1], reverse=True)[:top]
+    return [{"package": name, "ms": round(us / 1000, 1)} for name, us in ranked]
+
+
+def measure_ready(mode: str, port: int, timeout: float = 60) -> Optional[float]:
+    """Seconds from spawning uvicorn until /health returns 200"""
+    env = {**os.environ, "BACKEND_MODE": mode}
+    started = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.server:app", "--port", str(port), "--log-level", "warning"],
+        cwd=BACKEND_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        with httpx.Client() as client:
+            while time.perf_counter() - started < timeout:
+                if process.poll() is not None:
+                    return None
+                try:
+                    if client.get(f"http://127.0.0.1:{port}/health", timeout=1).status_code == 200:
+                        return time.perf_counter() - started
+                except httpx.HTTPError:
+                    pass
+                time.sleep(0.01)
+        return None
+    finally:
+        process.terminate()
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+
+
+def benchmark(mode: str, args) -> Dict[str, Any]:
+    imports = [measure_import(mode) for _ in range(args.runs)]
+    ready = [measure_ready(mode, args.port) for _ in range(args.runs)] if not args.skip_ready else []
+    ready_ok = [seconds for seconds in ready if seconds is not None]
+    ms = lambda values, fn: round(fn(values) * 1000, 1) if values else None
+    return {
+        "mode": mode,
+        "runs": args.runs,
+        "import_ms": {"min": ms([i["seconds"] for i in imports], min),
+                      "median": ms([i["seconds"] for i in imports], statistics.median)},
+        "heavy_modules_loaded": imports[-1]["loaded"],
+        "ready_ms": {"min": ms(ready_ok, min), "median": ms(ready_ok, statistics.median),
+                     "failed": len(ready) - len(ready_ok)},
+        "heaviest_imports": heaviest_imports(mode, args.top)
+    }
+
+
+def print_report(report: Dict[str, Any]):
+    print(f"\n=== {report['mode']} ===")
+    print(f"import     min {report['import_ms']['min']} ms | median {report['import_ms']['median']} ms")
+    print(f"loaded     {', '.join(report['heavy_modules_loaded']) or 'no LangChain / model client modules'}")
+    ready = report["ready_ms"]
+    if ready["min"] is not None or ready["failed"]:
+        print(f"/health    min {ready['min']} ms | median {ready['median']} ms (failed starts: {ready['failed']})")
+    print("heaviest   " + ", ".join(f"{item['package']} {item['ms']} ms" for item in report["heaviest_imports"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backend import and startup benchmark")
+    parser.add_argument("--mode", action="append", choices=["full", "simple"],
+                        help="Backend mode to measure (repeatable; default: both)")
+    parser.add_argument("--runs", type=int, default=3, help="Fresh interpreters / workers per measurement")
+    parser.add_argument("--port", type=int, default=8090, help="Port for the uvicorn workers")
+    parser.add_argument("--top", type=int, default=8, help="Heaviest imported packages to list")
+    parser.add_argument("--skip-ready", action="store_true", help="Only measure imports, do not start uvicorn")
+    parser.add_argument("--json", help="Also write the reports to this file")
+    args = parser.parse_args()
+
+    reports = [benchmark(mode, args) for mode in args.mode or ["full", "simple"]]
+    for report in reports:
+        print_report(report)
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(reports, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -5,7 +5,11 @@ LangChain reasoning chains for enhanced analysis
 from langchain.prompts import PromptTemplate
 from langchain.chains import LLMChain
 from langchain.llms.base import BaseLLM
-from typing import Dict, Any
+from typing import Dict, Any, List
+import time
+
+from agents.context_encoder import count_tokens
+from agents.metrics import LLM_ERRORS, record_llm_call
 
 
 class ReasoningChains:
@@ -73,6 +77,30 @@ Is this action:
 3. The best approach?
 
 If not, suggest improvements.
+End with a last line reading exactly "VERDICT: VALID" or "VERDICT: INVALID".
+
+Validation:"""
+            )
+        )
+        
+        # Batched action validation chain (one call for many actions)
+        self.batch_validation_chain = LLMChain(
+            llm=self.llm,
+            prompt=PromptTemplate(
+                input_variables=["actions", "context"],
+                template="""Validate these proposed browser actions:
+
+Actions (by index):
+{actions}
+
+Context: {context}
+
+An action is invalid if it is unsafe to execute, unlikely to succeed on this
+page (for example its selector matches none of the elements), or does not
+serve the task.
+
+Respond in JSON format, with one verdict per action:
+{{"verdicts": [{{"index": 0, "valid": true, "reason": "..."}}]}}
 
 Validation:"""
             )
@@ -97,29 +125,116 @@ Understanding:"""
             )
         )
     
+    def _run(self, name: str, chain: LLMChain, **inputs: str) -> str:
+        """Run a chain, recording wall time and token usage under chain_<name>"""
+        started = time.perf_counter()
+        try:
+            output = chain.run(**inputs)
+        except Exception:
+            LLM_ERRORS.inc(stage=f"chain_{name}")
+            raise
+        self._record(name, chain, inputs, output, started)
+        return output
+    
+    async def _arun(self, name: str, chain: LLMChain, **inputs: str) -> str:
+        """Async variant of _run"""
+        started = time.perf_counter()
+        try:
+            output = await chain.arun(**inputs)
+        except Exception:
+            LLM_ERRORS.inc(stage=f"chain_{name}")
+            raise
+        self._record(name, chain, inputs, output, started)
+        return output
+    
+    @staticmethod
+    def _record(name: str, chain: LLMChain, inputs: Dict[str, str], output: str, started: float):
+        record_llm_call(
+            f"chain_{name}",
+            time.perf_counter() - started,
+            count_tokens(chain.prompt.format(**inputs)),
+            count_tokens(output)
+        )
+    
     def analyze_problem(self, problem: str, context: Dict[str, Any]) -> str:
         """Analyze a problem with context"""
-        return self.problem_analysis_chain.run(
+        return self._run(
+            "analyze_problem", self.problem_analysis_chain,
             problem=problem,
             context=str(context)
         )
     
     def select_element(self, task: str, elements: list) -> str:
         """Select best element for task"""
-        return self.element_selection_chain.run(
+        return self._run(
+            "select_element", self.element_selection_chain,
             task=task,
             elements=str(elements)
         )
     
     def validate_action(self, action: Dict[str, Any], context: Dict[str, Any]) -> str:
         """Validate an action before execution"""
-        return self.action_validation_chain.run(
+        return self._run(
+            "validate_action", self.action_validation_chain,
             action=str(action),
             context=str(context)
         )
     
+    def validate_actions(self, actions: List[Dict[str, Any]], context: Dict[str, Any]) -> str:
+        """Validate several actions in one call"""
+        return self._run(
+            "validate_actions", self.batch_validation_chain,
+            actions=_indexed(actions),
+            context=str(context)
+        )
+    
     def understand_context(self, page_data: Dict[str, Any]) -> str:
         """Deep understanding of page context"""
-        return self.context_understanding_chain.run(
+        return self._run(
+            "understand_context", self.context_understanding_chain,
             page_data=str(page_data)
         )
+    
+    async def aanalyze_problem(self, problem: str, context: Dict[str, Any]) -> str:
+        """Async variant of analyze_problem"""
+        return await self._arun(
+            "analyze_problem", self.problem_analysis_chain,
+            problem=problem,
+            context=str(context)
+        )
+    
+    async def aselect_element(self, task: str, elements: list) -> str:
+        """Async variant of select_element"""
+        return await self._arun(
+            "select_element", self.element_selection_chain,
+            task=task,
+            elements=str(elements)
+        )
+    
+    async def avalidate_action(self, action: Dict[str, Any], context: Dict[str, Any]) -> str:
+        """Async variant of validate_action"""
+        return await self._arun(
+            "validate_action", self.action_validation_chain,
+            action=str(action),
+            context=str(context)
+        )
+    
+    async def avalidate_actions(self, actions: List[Dict[str, Any]], context: Dict[str, Any]) -> str:
+        """Async variant of validate_actions"""
+        return await self._arun(
+            "validate_actions", self.batch_validation_chain,
+            actions=_indexed(actions),
+            context=str(context)
+        )
+    
+    async def aunderstand_context(self, page_data: Dict[str, Any]) -> str:
+        """Async variant of understand_context"""
+        return await self._arun(
+            "understand_context", self.context_understanding_chain,
+            page_data=str(page_data)
+        )
+
+
+def _indexed(actions: List[Dict[str, Any]]) -> str:
+    """One "index: action" line per action"""
+    return "\n".join(f"{index}: {action}" for index, action in enumerate(actions))
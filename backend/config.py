@@ -7,6 +7,9 @@ from typing import Optional
 class Config:
     """Configuration class with environment variables"""
     
+    # Backend served by app.server: "full" (multi-agent pipeline) or "simple" (extraction only)
+    BACKEND_MODE: str = os.getenv('BACKEND_MODE', 'full')
+    
     # API Configuration
     API_KEY: str = os.getenv('OPENAI_API_KEY', 'ollama')
     
@@ -14,9 +17,124 @@ class Config:
     CHAT_MODEL: str = os.getenv('CHAT_MODEL', 'qwen2.5:0.5b')
     REASONING_MODEL: str = os.getenv('REASONING_MODEL', 'qwen2.5:7b')
     
+    # Per-stage models: "chat", "reasoning" or a model name (default: chat model everywhere)
+    PLANNER_MODEL: str = os.getenv('PLANNER_MODEL', 'chat')
+    ANALYZER_MODEL: str = os.getenv('ANALYZER_MODEL', 'chat')
+    EXECUTOR_MODEL: str = os.getenv('EXECUTOR_MODEL', 'chat')
+    NAVIGATOR_MODEL: str = os.getenv('NAVIGATOR_MODEL', 'chat')  # fused pipeline mode
+    VALIDATOR_MODEL: str = os.getenv('VALIDATOR_MODEL', 'chat')  # action validation
+    SUMMARIZER_MODEL: str = os.getenv('SUMMARIZER_MODEL', 'chat')
+    
+    # Retry a stage on a bigger model when its JSON output fails to parse or validate.
+    # Empty disables escalation (the same model is asked to repair its output instead)
+    ESCALATION_MODEL: str = os.getenv('ESCALATION_MODEL', '')
+    
     # Base URL for API (for local models like Ollama)
     BASE_URL: Optional[str] = os.getenv('BASE_URL', 'http://localhost:11434/v1')
     
+    # LLM Client Pooling (per model server)
+    LLM_MAX_CONNECTIONS: int = int(os.getenv('LLM_MAX_CONNECTIONS', '20'))
+    LLM_MAX_KEEPALIVE_CONNECTIONS: int = int(os.getenv('LLM_MAX_KEEPALIVE_CONNECTIONS', '10'))
+    LLM_KEEPALIVE_EXPIRY: float = float(os.getenv('LLM_KEEPALIVE_EXPIRY', '30'))  # seconds
+    LLM_TIMEOUT: float = float(os.getenv('LLM_TIMEOUT', '120'))  # seconds
+    
+    # Ask OpenAI-compatible servers for JSON output (response_format=json_object)
+    LLM_JSON_MODE: bool = os.getenv('LLM_JSON_MODE', 'false').lower() == 'true'
+    
+    # Pipeline Configuration
+    # "sequential" runs Planner → Analyzer → Executor; "speculative" starts
+    # the Analyzer alongside the Planner and reconciles once the plan arrives;
+    # "fused" asks one Navigator call for plan, element mapping and actions.
+    # Requests may override it with their own pipeline_mode
+    PIPELINE_MODE: str = os.getenv('PIPELINE_MODE', 'sequential')
+    
+    # Action validation before actions are returned: "off", "precheck" (deterministic
+    # checks only), "batch" (ambiguous actions checked in one model call) or
+    # "concurrent" (one validate_action call per ambiguous action, capped)
+    ACTION_VALIDATION: str = os.getenv('ACTION_VALIDATION', 'off')
+    ACTION_VALIDATION_MAX_CONCURRENCY: int = int(os.getenv('ACTION_VALIDATION_MAX_CONCURRENCY', '4'))
+    
+    # Token budget for the compact page context sent with each agent prompt
+    CONTEXT_TOKEN_BUDGET: int = int(os.getenv('CONTEXT_TOKEN_BUDGET', '1200'))
+    
+    # Conversation Memory Configuration
+    # Recent messages go to the Planner verbatim, older ones as a running summary
+    MEMORY_TOKEN_BUDGET: int = int(os.getenv('MEMORY_TOKEN_BUDGET', '600'))
+    MEMORY_RECENT_MESSAGES: int = int(os.getenv('MEMORY_RECENT_MESSAGES', '6'))
+    MEMORY_SUMMARIZE: bool = os.getenv('MEMORY_SUMMARIZE', 'true').lower() == 'true'  # false = extractive digest
+    
+    # Intent Router Configuration
+    # Intents listed here are answered straight from page data without LLM calls
+    ROUTER_ENABLED: bool = os.getenv('ROUTER_ENABLED', 'true').lower() == 'true'
+    ROUTER_INTENTS: list = [i.strip() for i in os.getenv('ROUTER_INTENTS', 'headlines,summary').split(',') if i.strip()]
+    
+    # Page Preprocessing Configuration
+    # Dedupes and prunes interactiveElements and keeps the top-k ranked by relevance to the task
+    PAGE_PREPROCESSING: bool = os.getenv('PAGE_PREPROCESSING', 'true').lower() == 'true'
+    PAGE_TOP_K: int = int(os.getenv('PAGE_TOP_K', '20'))
+    
+    # Page Text Configuration
+    # Agents get the passages of the page text most relevant to the task, within a token budget
+    PAGE_TEXT_WINDOW: bool = os.getenv('PAGE_TEXT_WINDOW', 'true').lower() == 'true'
+    PAGE_TEXT_BUDGET: int = int(os.getenv('PAGE_TEXT_BUDGET', '300'))
+    # Summaries of pages longer than one chunk are map-reduced: chunks summarized in parallel, then merged
+    SUMMARY_CHUNK_TOKENS: int = int(os.getenv('SUMMARY_CHUNK_TOKENS', '800'))  # 0 disables
+    SUMMARY_MAX_CONCURRENCY: int = int(os.getenv('SUMMARY_MAX_CONCURRENCY', '4'))
+    
+    # Page Snapshot Configuration
+    # Uploaded pages are kept under their content hash so follow-ups can send page_ref instead
+    SNAPSHOT_MAX_ENTRIES: int = int(os.getenv('SNAPSHOT_MAX_ENTRIES', '200'))
+    SNAPSHOT_TTL: float = float(os.getenv('SNAPSHOT_TTL', '1800'))  # seconds since last use
+    
+    # Response Cache Configuration
+    CACHE_ENABLED: bool = os.getenv('CACHE_ENABLED', 'true').lower() == 'true'
+    CACHE_MAX_ENTRIES: int = int(os.getenv('CACHE_MAX_ENTRIES', '1000'))
+    CACHE_TTL: float = float(os.getenv('CACHE_TTL', '3600'))  # seconds
+    CACHE_SQLITE_PATH: Optional[str] = os.getenv('CACHE_SQLITE_PATH') or None  # unset = in-memory
+    
+    # Session Configuration
+    MAX_SESSIONS: int = int(os.getenv('MAX_SESSIONS', '100'))
+    SESSION_IDLE_TTL: float = float(os.getenv('SESSION_IDLE_TTL', '1800'))  # seconds
+    SESSION_MEMORY_CAP: int = int(os.getenv('SESSION_MEMORY_CAP', '50'))  # messages per agent
+    # Where session state lives: "memory" (this process only), "sqlite" or "redis".
+    # Use sqlite or redis when running several workers; URL is the file path or redis:// URL
+    SESSION_BACKEND: str = os.getenv('SESSION_BACKEND', 'memory')
+    SESSION_BACKEND_URL: Optional[str] = os.getenv('SESSION_BACKEND_URL') or None
+    
+    # Admission Control for LLM calls
+    # Calls beyond the global / per-model caps queue (bounded); calls that cannot start
+    # before their deadline are shed with 429 (queue full) or 503 (deadline) and Retry-After
+    ADMISSION_ENABLED: bool = os.getenv('ADMISSION_ENABLED', 'true').lower() == 'true'
+    ADMISSION_MAX_CONCURRENCY: int = int(os.getenv('ADMISSION_MAX_CONCURRENCY', '8'))
+    ADMISSION_MAX_PER_MODEL: int = int(os.getenv('ADMISSION_MAX_PER_MODEL', '4'))  # 0 = global cap only
+    # Per-model overrides, e.g. "qwen2.5:7b=2,qwen2.5:0.5b=6"
+    ADMISSION_MODEL_LIMITS: dict = {
+        name.strip(): int(limit)
+        for name, limit in (item.rsplit('=', 1) for item in os.getenv('ADMISSION_MODEL_LIMITS', '').split(',') if '=' in item)
+    }
+    ADMISSION_MAX_QUEUE: int = int(os.getenv('ADMISSION_MAX_QUEUE', '64'))
+    ADMISSION_QUEUE_TIMEOUT: float = float(os.getenv('ADMISSION_QUEUE_TIMEOUT', '30'))  # seconds per call
+    ADMISSION_REQUEST_DEADLINE: float = float(os.getenv('ADMISSION_REQUEST_DEADLINE', '60'))  # seconds per request, 0 = none
+    # Adapt the global cap to observed call latency (AIMD between min and max concurrency)
+    ADMISSION_ADAPTIVE: bool = os.getenv('ADMISSION_ADAPTIVE', 'false').lower() == 'true'
+    ADMISSION_TARGET_LATENCY: float = float(os.getenv('ADMISSION_TARGET_LATENCY', '10'))  # seconds
+    ADMISSION_MIN_CONCURRENCY: int = int(os.getenv('ADMISSION_MIN_CONCURRENCY', '1'))
+    
+    # Identical concurrent /api/task requests (same task, page and model) share one pipeline run
+    SINGLE_FLIGHT_ENABLED: bool = os.getenv('SINGLE_FLIGHT_ENABLED', 'true').lower() == 'true'
+    
+    # Batch Configuration
+    BATCH_MAX_CONCURRENCY: int = int(os.getenv('BATCH_MAX_CONCURRENCY', '8'))
+    BATCH_ITEM_TIMEOUT: float = float(os.getenv('BATCH_ITEM_TIMEOUT', '120'))  # seconds
+    
+    # Model warm-up (Ollama): load the chat, reasoning and stage models at startup and
+    # refresh them every interval while requests come in; after MODEL_WARMUP_IDLE_AFTER
+    # seconds without requests the refreshes stop and Ollama unloads the models
+    MODEL_WARMUP_ENABLED: bool = os.getenv('MODEL_WARMUP_ENABLED', 'true').lower() == 'true'
+    MODEL_WARMUP_INTERVAL: float = float(os.getenv('MODEL_WARMUP_INTERVAL', '240'))  # seconds
+    MODEL_WARMUP_IDLE_AFTER: float = float(os.getenv('MODEL_WARMUP_IDLE_AFTER', '900'))  # seconds
+    MODEL_WARMUP_TIMEOUT: float = float(os.getenv('MODEL_WARMUP_TIMEOUT', '120'))  # seconds per model load
+    
     # Server Configuration
     HOST: str = os.getenv('HOST', '0.0.0.0')
     PORT: int = int(os.getenv('PORT', '8001'))
@@ -0,0 +1,39 @@
+"""
+Response cache keys
+Stage outputs are only reused for the same stage, model, page, task and inputs
+"""
+
+from agents.multi_agent import create_hybrid_system
+from agents.response_cache import ResponseCache
+
+
+def make_system(model: str, cache: ResponseCache, base_url: str = "http://127.0.0.1:1/v1"):
+    return create_hybrid_system(api_key="key", model=model, base_url=base_url, cache=cache)
+
+
+def test_make_key_includes_model():
+    assert (ResponseCache.make_key("planner", "Find the price", "page", model="model-a")
+            != ResponseCache.make_key("planner", "Find the price", "page", model="model-b"))
+
+
+def test_two_models_do_not_share_an_entry():
+    cache = ResponseCache()
+    small, large = make_system("model-small", cache), make_system("model-large", cache)
+    
+    key, value = small._cache_lookup("planner", "Find the price", "page")
+    assert value is None
+    small._cache_store(key, {"plan": "from the small model"})
+    
+    assert small._cache_lookup("planner", "Find the price", "page")[1] == {"plan": "from the small model"}
+    assert large._cache_lookup("planner", "Find the price", "page")[1] is None
+
+
+def test_two_endpoints_do_not_share_an_entry():
+    cache = ResponseCache()
+    local = make_system("model-a", cache, base_url="http://127.0.0.1:1/v1")
+    remote = make_system("model-a", cache, base_url="http://127.0.0.1:2/v1")
+    
+    key, _ = local._cache_lookup("navigator", "Open the menu", "page")
+    local._cache_store(key, {"actions": []})
+    
+    assert remote._cache_lookup("navigator", "Open the menu", "page")[1] is None
@@ -0,0 +1,59 @@
+"""
+Single-flight keys for /api/task
+Requests may only coalesce when the pipeline would see the same input
+"""
+
+import asyncio
+
+from app.main import AgentConfig, TaskRequest, get_or_create_agent_system, task_flight_key
+
+
+PAGE = {"url": "https://example.com", "title": "Example", "text": "Hello", "interactiveElements": []}
+
+
+def make_request(session_id: str, api_key: str = "key-a", **kwargs) -> TaskRequest:
+    return TaskRequest(
+        task="What is this page about?",
+        page_data=PAGE,
+        session_id=session_id,
+        config=AgentConfig(api_key=api_key, chat_model="model-a", base_url="http://127.0.0.1:1/v1"),
+        **kwargs
+    )
+
+
+def agent_system_for(session_id: str):
+    return asyncio.run(get_or_create_agent_system(session_id, make_request(session_id).config))
+
+
+def test_sessions_with_different_histories_do_not_coalesce():
+    first = agent_system_for("flight-history-1")
+    second = agent_system_for("flight-history-2")
+    first.conversation_memory.add_turn("Find flights to Paris", "Here are three flights to Paris")
+    second.conversation_memory.add_turn("Find flights to Tokyo", "Here are two flights to Tokyo")
+    
+    assert (task_flight_key(make_request("flight-history-1"), "ref", first)
+            != task_flight_key(make_request("flight-history-2"), "ref", second))
+
+
+def test_sessions_without_history_coalesce():
+    first = agent_system_for("flight-empty-1")
+    second = agent_system_for("flight-empty-2")
+    
+    assert (task_flight_key(make_request("flight-empty-1"), "ref", first)
+            == task_flight_key(make_request("flight-empty-2"), "ref", second))
+
+
+def test_client_chat_history_is_part_of_the_key():
+    agent_system = agent_system_for("flight-client")
+    with_history = make_request("flight-client", chat_history=[{"role": "user", "content": "Compare prices"}])
+    
+    assert task_flight_key(with_history, "ref", agent_system) != task_flight_key(make_request("flight-client"), "ref", agent_system)
+
+
+def test_api_keys_do_not_coalesce():
+    agent_system = agent_system_for("flight-keys")
+    
+    key_a = task_flight_key(make_request("flight-keys", api_key="key-a"), "ref", agent_system)
+    key_b = task_flight_key(make_request("flight-keys", api_key="key-b"), "ref", agent_system)
+    assert key_a != key_b
+    assert "key-a" not in key_a
@@ -118,10 +118,29 @@ async function handleAgentExecution(task, tabId) {
   }
 }
 
+// Page snapshots the backend already has: digest of page_data -> page_ref.
+// Follow-up tasks on an unchanged page send the ref instead of the page.
+const pageRefs = new Map();
+const MAX_PAGE_REFS = 20;
+
+async function digestPageData(page_data) {
+  const bytes = new TextEncoder().encode(JSON.stringify(page_data));
+  const hash = await crypto.subtle.digest('SHA-256', bytes);
+  return Array.from(new Uint8Array(hash)).map(b => b.toString(16).padStart(2, '0')).join('');
+}
+
+function rememberPageRef(digest, pageRef) {
+  pageRefs.delete(digest);
+  pageRefs.set(digest, pageRef);
+  if (pageRefs.size > MAX_PAGE_REFS) {
+    pageRefs.delete(pageRefs.keys().next().value);
+  }
+}
+
 // Call backend API for agent processing
 async function callBackendAPI(task, page_data, config) {
   try {
-    // The backend expects the format: { task, page_data, config, session_id }
+    // The backend expects the format: { task, page_data | page_ref, config, session_id }
     const requestBody = {
       task: task,
       page_data: page_data,
@@ -129,6 +148,9 @@ async function callBackendAPI(task, page_data, config) {
       session_id: 'default'
     };
     
+    const digest = await digestPageData(page_data);
+    const knownRef = pageRefs.get(digest);
+    
     // Get settings to use the correct backend URL
     const settings = await getSettings();
     // Use the user-configured API endpoint for custom provider
@@ -146,22 +168,20 @@ async function callBackendAPI(task, page_data, config) {
     console.log('AI Agent - Backend Request:', requestBody);
     console.log('AI Agent - Using Backend URL:', backendUrl);
     
-    // Add timeout to prevent hanging requests
-    const controller = new AbortController();
-    const timeoutId = setTimeout(() => controller.abort(), 30000); // 30 second timeout
-    
-    const response = await fetch(backendUrl, {
-      method: 'POST',
-      headers: {
-        'Content-Type': 'application/json',
-      },
-      body: JSON.stringify(requestBody),
-      signal: controller.signal
-    });
-    
-    clearTimeout(timeoutId);
-    
-    clearTimeout(timeoutId);
+    let response;
+    if (knownRef) {
+      const { page_data: _, ...refBody } = requestBody;
+      response = await postTask(backendUrl, { ...refBody, page_ref: knownRef });
+      if (response.status === 404) {
+        // The backend dropped the snapshot (restart or eviction): upload the page again
+        console.log('AI Agent - Page snapshot unknown to backend, re-uploading page');
+        pageRefs.delete(digest);
+        response = null;
+      }
+    }
+    if (!response) {
+      response = await postTask(backendUrl, requestBody);
+    }
     
     if (!response.ok) {
       const errorText = await response.text();
@@ -172,6 +192,10 @@ async function callBackendAPI(task, page_data, config) {
     const result = await response.json();
     console.log('AI Agent - Backend Response:', result);
     
+    if (result.page_ref) {
+      rememberPageRef(digest, result.page_ref);
+    }
+    
     return result;
   } catch (error) {
     console.error('Error calling backend API:', error);
@@ -182,6 +206,25 @@ async function callBackendAPI(task, page_data, config) {
   }
 }
 
+async function postTask(backendUrl, requestBody) {
+  // Add timeout to prevent hanging requests
+  const controller = new AbortController();
+  const timeoutId = setTimeout(() => controller.abort(), 30000); // 30 second timeout
+  
+  try {
+    return await fetch(backendUrl, {
+      method: 'POST',
+      headers: {
+        'Content-Type': 'application/json',
+      },
+      body: JSON.stringify(requestBody),
+      signal: controller.signal
+    });
+  } finally {
+    clearTimeout(timeoutId);
+  }
+}
+
 // Legacy analyzePageContent function (kept for compatibility but not used in new flow)
 async function analyzePageContent(pageData, task, settings) {
   if (!settings) {